@@ -1,6 +1,7 @@
 from uasyncio import gather, sleep, create_task
 from pyb import RTC, USB_VCP, Pin, LED
 from time import time, ticks_us
+from ubinascii import b2a_base64, crc32
 
 from main.hardware import  battery, mmc, xb
 from main.utilities import config, timers
@@ -35,8 +36,15 @@ class RSDeviceController:
         self.rtc = RTC()
         self.utc = None
 
+        # Host synchronized clock for synchronized starts
+        self.clock = timers.SyncClock()
+
         # Trial
         self.trial_running = False
+
+        # Data records are numbered so the host can spot lost and duplicated ones, the last few are kept to resend
+        self.dta_seq = 0
+        self.dta_sent = [None] * 64
         
     async def run_controller(self):
         await gather(self._handle_serial_com())
@@ -83,6 +91,23 @@ class RSDeviceController:
 
             elif cmd == 'set_rtc':
                 self.update_rtc(val)
+
+            # Synchronized start
+            elif cmd == 'syn':
+                self.sync_clock(val)
+            elif cmd == 'sst':
+                create_task(self.synchronized_start(int(val)))
+            elif cmd == 'tsq':
+                self.time_sync(val)
+            elif cmd == 'rtx':
+                self.retransmit(val)
+
+            # Memory card offload
+            elif cmd == 'mls':
+                self.mmc_list()
+            elif cmd == 'mrd':
+                self.mmc_read(val)
+
             elif cmd == 'get_bat':
                 self.get_battery()
 
@@ -128,6 +153,78 @@ class RSDeviceController:
         r = self.rtc.datetime()
         self.broadcast(f"rtc>{(',').join([str(v) for v in r])}")
 
+    def retransmit(self, val):
+        """
+        Method to send data records again that the host did not receive. Receives their sequence numbers separated
+        by ','. Records no longer in the buffer are skipped.
+        """
+        if self._debug: print(f'{ticks_us()} RSDeviceController.retransmit got:{val}')
+
+        for seq in val.split(','):
+            seq = int(seq)
+            sent = self.dta_sent[seq % len(self.dta_sent)]
+            if sent and sent[0] == seq:
+                create_task(self.xb.transmit(sent[1]))
+
+    def mmc_list(self):
+        """
+        Method to send the names and sizes of the files on the memory card over USB so the host can offload them.
+        """
+        if self._debug: print(f'{ticks_us()} RSDeviceController.mmc_list')
+
+        files = ','.join([f'{name}:{size}' for name, size in self.mmc.listing()])
+        USB_VCP().write(f'mls>{files}\n')
+
+    def mmc_read(self, val):
+        """
+        Method to send one chunk of a memory card file over USB. Receives 'name,offset,length' and answers with the
+        offset, the CRC32 of the chunk and the chunk in base64, or 'err' if the file can not be read.
+        """
+        if self._debug: print(f'{ticks_us()} RSDeviceController.mmc_read got:{val}')
+
+        name, offset, length = val.split(',')
+        try:
+            data = self.mmc.read(name, int(offset), min(int(length), 1024))
+            USB_VCP().write(f'mrd>{name},{offset},{crc32(data):08x},{b2a_base64(data).decode().strip()}\n')
+        except OSError:
+            USB_VCP().write(f'mrd>{name},{offset},err\n')
+
+    def time_sync(self, val):
+        """
+        Method to answer a host clock synchronization query. Echoes the host's send time with the RTC times the
+        query was received and answered at.
+        """
+        received_ms = timers.rtc_unix_ms(self.rtc)
+        if self._debug: print(f'{ticks_us()} RSDeviceController.time_sync got:{val}')
+
+        self.broadcast(f'tsr>{val},{received_ms},{timers.rtc_unix_ms(self.rtc)}')
+
+    def sync_clock(self, val):
+        """
+        Method to set the synchronized clock to the host's unix time in milliseconds.
+        """
+        if self._debug: print(f'{ticks_us()} RSDeviceController.sync_clock got:{val}')
+
+        self.clock.set(int(val))
+        self.broadcast(f'syn>{self.clock.now()}')
+
+    async def synchronized_start(self, start_ms):
+        """
+        Method to start a trial at the given unix time in milliseconds on the synchronized clock. Reports the time the
+        trial actually started at, or 'nosync' without starting if the clock was never set.
+        """
+        if self._debug: print(f'{ticks_us()} RSDeviceController.synchronized_start got:{start_ms}')
+
+        if not self.clock.synced:
+            self.broadcast('sst>nosync')
+            return
+
+        if self.mmc.mmc_present:
+            self.mmc.init(self.headers)
+        actual_ms = await self.clock.wait_until(start_ms)
+        self.device.handle_msg('trl', '1')
+        self.broadcast(f'sst>{actual_ms}')
+
     def get_battery(self):
         """
         Method to broadcast the current battery state of charge.
@@ -143,8 +240,11 @@ class RSDeviceController:
         if msg.startswith('dta>'):
             msg = f'{msg},{self.battery.percent()},{time() + 946684800}\n'
             m = f"{self.xb.name_NI},,,{msg.strip('dta>')}"
+            self.dta_seq += 1
             if self.mmc.mmc_present:
                 self.mmc.write(m)
+            msg = f'{msg[:-1]}#{self.dta_seq}\n'
+            self.dta_sent[self.dta_seq % len(self.dta_sent)] = (self.dta_seq, msg)
         else:
             msg = f"{msg}\n"
         create_task(self.xb.transmit(msg))
@@ -104,3 +104,30 @@ class MMC:
             else:
                 print(f'filename is None')
 
+    def listing(self):
+        """
+        Lists the files on the memory card.
+
+        Returns:
+            list: (name, size in bytes) of every file in /mmc.
+        """
+        if self._debug: print(f'{ticks_us()} MMC.listing')
+
+        if not self.mmc_present:
+            return []
+        return [(name, os.stat(f'/mmc/{name}')[6]) for name in os.listdir('/mmc')]
+
+    def read(self, name, offset, length):
+        """
+        Reads part of a file on the memory card.
+
+        Args:
+            name (str): The name of the file in /mmc.
+            offset (int): The byte to start reading at.
+            length (int): The most bytes to read.
+        """
+        if self._debug: print(f'{ticks_us()} MMC.read:{name},{offset},{length}')
+
+        with open(f'/mmc/{name}', 'rb') as infile:
+            infile.seek(offset)
+            return infile.read(length)
@@ -1,4 +1,4 @@
-from utime import ticks_ms, ticks_us, ticks_diff
+from utime import ticks_ms, ticks_us, ticks_diff, mktime
 import uasyncio as asyncio
 
 
@@ -262,3 +262,77 @@ class ABTimeAccumulator:
         self._data[2] = ticks_diff(now, self._start_ms)
 
         return self._data
+
+
+class SyncClock:
+    """
+    Unix time in milliseconds, set from the host and kept as an offset from ticks_ms. The RTC only resolves whole
+    seconds, which is too coarse to line up trial starts across devices.
+    """
+
+    def __init__(self, debug=False):
+        self._debug = debug
+        if self._debug: print(f'{ticks_us()} SyncClock.__init__')
+
+        self._base_ms = None
+        self._base_ticks = 0
+
+    @property
+    def synced(self):
+        return self._base_ms is not None
+
+    def set(self, unix_ms):
+        """
+        Set the clock.
+
+        Args:
+            unix_ms (int): The host's unix time in milliseconds.
+        """
+        if self._debug: print(f'{ticks_us()} SyncClock.set {unix_ms}')
+
+        self._base_ticks = ticks_ms()
+        self._base_ms = unix_ms
+
+    def now(self):
+        """
+        Returns:
+            int: The current unix time in milliseconds, or None if the clock was never set.
+        """
+        if self._base_ms is None:
+            return None
+        return self._base_ms + ticks_diff(ticks_ms(), self._base_ticks)
+
+    async def wait_until(self, unix_ms):
+        """
+        Sleep until the given unix time. Yields to other tasks until the last few milliseconds, then spins.
+
+        Args:
+            unix_ms (int): The time to wake at.
+
+        Returns:
+            int: The unix time in milliseconds at which it woke.
+        """
+        if self._debug: print(f'{ticks_us()} SyncClock.wait_until {unix_ms}')
+
+        remaining = unix_ms - self.now()
+        if remaining > 5:
+            await asyncio.sleep_ms(remaining - 5)
+        while self.now() < unix_ms:
+            pass
+        return self.now()
+
+
+def rtc_unix_ms(rtc):
+    """
+    Read the RTC as unix time in milliseconds. This is the clock behind the "Device Unix time in UTC" column.
+
+    Args:
+        rtc: The pyb.RTC instance.
+
+    Returns:
+        int: The RTC time in milliseconds since 1970, to the RTC's 1/256 s resolution.
+    """
+    year, month, day, weekday, hours, minutes, seconds, subseconds = rtc.datetime()
+    # Subseconds count down from 255
+    return (mktime((year, month, day, hours, minutes, seconds, 0, 0)) + 946684800) * 1000 + \
+        (255 - subseconds) * 1000 // 256
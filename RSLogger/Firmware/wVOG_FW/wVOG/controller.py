@@ -2,6 +2,7 @@ import uasyncio as asyncio
 from wVOG import xb, config, lenses, battery, mmc, experiments, timers
 from pyb import RTC, USB_VCP, Pin, LED
 from time import time, sleep, ticks_us
+from ubinascii import b2a_base64, crc32
 
 cfg_template = {"clr": "100", "cls": "1500", "dbc": "20", "srt": "1", "opn": "1500", "dta": "0", "drk": "0", "typ": "cycle"}
 
@@ -47,6 +48,9 @@ class WirelessVOG:
         self.rtc = RTC()
         self.utc = None
 
+        # Host synchronized clock for synchronized starts
+        self.clock = timers.SyncClock()
+
         # Config
         self.cfg = config.Configurator('wVOG/config.jsn')
         self.verify_cfg()
@@ -57,6 +61,10 @@ class WirelessVOG:
 
         # Trial
         self.trial_running = False
+
+        # Data records are numbered so the host can spot lost and duplicated ones, the last few are kept to resend
+        self.dta_seq = 0
+        self.dta_sent = [None] * 64
         
         asyncio.create_task(self.handle_serial_msg())
         
@@ -113,6 +121,22 @@ class WirelessVOG:
         elif cmd == 'bat':
             self.get_battery()
 
+        # Synchronized start
+        elif cmd == 'syn':
+            self.sync_clock(val)
+        elif cmd == 'sst':
+            asyncio.create_task(self.synchronized_start(int(val)))
+        elif cmd == 'tsq':
+            self.time_sync(val)
+        elif cmd == 'rtx':
+            self.retransmit(val)
+
+        # Memory card offload
+        elif cmd == 'mls':
+            self.mmc_list()
+        elif cmd == 'mrd':
+            self.mmc_read(val)
+
         else:
             self.broadcast("Unknown command")
             
@@ -168,6 +192,80 @@ class WirelessVOG:
         r = self.rtc.datetime()
         self.broadcast(f"rtc>{(',').join([str(v) for v in r])}")
 
+    def retransmit(self, val):
+        """
+        Method to send data records again that the host did not receive. Receives their sequence numbers separated
+        by ','. Records no longer in the buffer are skipped.
+        """
+        if self._debug: print(f'{ticks_us()} WirlessVOG.retransmit got:{val}')
+
+        for seq in val.split(','):
+            seq = int(seq)
+            sent = self.dta_sent[seq % len(self.dta_sent)]
+            if sent and sent[0] == seq:
+                asyncio.create_task(self.xb.transmit(sent[1]))
+
+    def mmc_list(self):
+        """
+        Method to send the names and sizes of the files on the memory card over USB so the host can offload them.
+        """
+        if self._debug: print(f'{ticks_us()} WirlessVOG.mmc_list')
+
+        files = ','.join([f'{name}:{size}' for name, size in self.mmc.listing()])
+        USB_VCP().write(f'mls>{files}\n')
+
+    def mmc_read(self, val):
+        """
+        Method to send one chunk of a memory card file over USB. Receives 'name,offset,length' and answers with the
+        offset, the CRC32 of the chunk and the chunk in base64, or 'err' if the file can not be read.
+        """
+        if self._debug: print(f'{ticks_us()} WirlessVOG.mmc_read got:{val}')
+
+        name, offset, length = val.split(',')
+        try:
+            data = self.mmc.read(name, int(offset), min(int(length), 1024))
+            USB_VCP().write(f'mrd>{name},{offset},{crc32(data):08x},{b2a_base64(data).decode().strip()}\n')
+        except OSError:
+            USB_VCP().write(f'mrd>{name},{offset},err\n')
+
+    def time_sync(self, val):
+        """
+        Method to answer a host clock synchronization query. Echoes the host's send time with the RTC times the
+        query was received and answered at.
+        """
+        received_ms = timers.rtc_unix_ms(self.rtc)
+        if self._debug: print(f'{ticks_us()} WirlessVOG.time_sync got:{val}')
+
+        self.broadcast(f'tsr>{val},{received_ms},{timers.rtc_unix_ms(self.rtc)}')
+
+    def sync_clock(self, val):
+        """
+        Method to set the synchronized clock to the host's unix time in milliseconds.
+        """
+        if self._debug: print(f'{ticks_us()} WirlessVOG.sync_clock got:{val}')
+
+        self.clock.set(int(val))
+        self.broadcast(f'syn>{self.clock.now()}')
+
+    async def synchronized_start(self, start_ms):
+        """
+        Method to start a trial at the given unix time in milliseconds on the synchronized clock. Reports the time the
+        trial actually started at, or without starting 'nosync' if the clock was never set and 'noexp' if no experiment
+        is configured.
+        """
+        if self._debug: print(f'{ticks_us()} WirlessVOG.synchronized_start got:{start_ms}')
+
+        if not self.clock.synced:
+            self.broadcast('sst>nosync')
+            return
+        if not self.exp:
+            self.broadcast('sst>noexp')
+            return
+
+        actual_ms = await self.clock.wait_until(start_ms)
+        self.exp.handle_exp_msg('trl', '1')
+        self.broadcast(f'sst>{actual_ms}')
+
     def get_battery(self):
         """
         Method to broadcast the current battery state of charge.
@@ -197,7 +295,10 @@ class WirelessVOG:
         if msg.startswith('dta>'):
             msg = f'{msg},{self.battery.percent()},{time() + 946684800}\n'
             m = f"{self.xb.name_NI},,,{msg.strip('dta>')}"
+            self.dta_seq += 1
             self.mmc.write(m)
+            msg = f'{msg[:-1]}#{self.dta_seq}\n'
+            self.dta_sent[self.dta_seq % len(self.dta_sent)] = (self.dta_seq, msg)
         else:
             msg = f"{msg}\n"
         asyncio.create_task(self.xb.transmit(msg))
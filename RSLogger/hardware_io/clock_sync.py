@@ -0,0 +1,159 @@
+import asyncio
+from threading import Lock
+from time import time
+from typing import NamedTuple, Optional
+
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
+
+_ESTIMATE = trace.register('ClockSync.estimate')
+
+
+class ClockEstimate(NamedTuple):
+    """ Device clock relative to the host clock: device time = host time + offset. """
+    offset_ms: float
+    drift_ppm: float
+    uncertainty_ms: float
+    round_trip_ms: float
+    samples: int
+    reference: float  # host unix time offset_ms applies at; drift_ppm moves it from there
+
+    def offset_at(self, host_s):
+        return self.offset_ms + self.drift_ppm * (host_s - self.reference) / 1000
+
+
+class ClockSync:
+    """
+    Estimates each wDRT/wVOG clock's offset and drift from the host clock with NTP style round trips.
+
+    The host sends 'tsq>' stamped with its send time t1, the device answers 'tsr>t1,t2,t3' with the RTC times it
+    received and answered the query at, and the host receive time t4 is the reply's timestamp. Each exchange gives
+        offset = ((t2 - t1) + (t3 - t4)) / 2      delay = (t4 - t1) - (t3 - t2)
+    and the offset is only off by half the difference between the two directions, so at most delay / 2.
+
+    A device is queried burst times, interval_s apart for new devices and then every interval_s * burst. The last
+    window exchanges are kept; the ones with the shortest round trips are fitted with a line to get the offset and
+    its drift. Every new estimate is written to clock_sync.txt in the session folder, so the device time column of
+    wDRT.txt / wVOG.txt can be put on the host clock with to_host_time() or by hand.
+
+    Replies normally reach report() on the HWRoot loop, but the samples and estimates are guarded by a lock so
+    report(), forget() and the queries are safe from any thread, e.g. the Digi reader thread.
+    """
+    DEVICES = ('wDRT', 'wVOG')
+    LOG_FILE = 'clock_sync.txt'
+    LOG_HEADER = 'Unix time in UTC, Device ID, Offset ms, Drift ppm, Uncertainty ms, Round trip ms, Samples'
+
+    # RTC subseconds are 1/256 s
+    RESOLUTION_MS = 1000 / 256
+
+    def __init__(self, device_controllers, devices, interval_s=2.0, burst=5, window=32, debug=False):
+        self._debug = debug
+
+        self._controllers = device_controllers
+        self._devices = devices
+        self.interval_s = interval_s
+        self.burst = burst
+        self.window = window
+
+        self.file_path = ''
+
+        # (device type, port) -> [(host midpoint s, offset ms, delay ms), ...]
+        self._lock = Lock()
+        self._samples = dict()
+        self._estimates = dict()
+        self._queries = dict()
+
+    ####################################################################################################################
+    # Queries
+
+    async def run(self, get_tx=lambda: None):
+        while True:
+            # Disconnected devices get their RTC set again when they come back, start those over
+            for dev, port in [k for k in list(self._queries) if k[1] not in self._devices.get(k[0], {})]:
+                self.forget(dev, port)
+
+            for dev in self.DEVICES:
+                for port, socket in list(self._devices.get(dev, {}).items()):
+                    n = self._queries.get((dev, port), 0)
+                    # A burst for a new device, then one query every burst intervals
+                    if n < self.burst or n % self.burst == 0:
+                        self._controllers[dev].parse_command(socket, new_message(dev, port, 'time_sync'), get_tx())
+                    self._queries[(dev, port)] = n + 1
+            await asyncio.sleep(self.interval_s)
+
+    def forget(self, dev, port):
+        """ Drops everything known about a device, e.g. after it was reconnected and its RTC set again. """
+        with self._lock:
+            self._samples.pop((dev, port), None)
+            self._estimates.pop((dev, port), None)
+            self._queries.pop((dev, port), None)
+
+    ####################################################################################################################
+    # Replies
+
+    def report(self, msg: Message):
+        """ Handles a device's 'tsr>t1,t2,t3' reply; msg.timestamp is t4. """
+        try:
+            t1, t2, t3 = (int(v) for v in msg.payload.split(','))
+        except ValueError:
+            return
+        t4 = msg.timestamp * 1000
+
+        delay = (t4 - t1) - (t3 - t2)
+        offset = ((t2 - t1) + (t3 - t4)) / 2
+        if delay < 0:
+            # Device answered before it was asked: a stale reply from before an RTC change
+            return
+
+        with self._lock:
+            samples = self._samples.setdefault((msg.device, msg.port), [])
+            samples.append(((t1 + t4) / 2000, offset, delay))
+            del samples[:-self.window]
+
+            estimate = self._estimate(samples)
+            self._estimates[(msg.device, msg.port)] = estimate
+        trace.event(_ESTIMATE, (msg.device, msg.port, estimate))
+
+        if self.file_path:
+            unit_id = msg.port if msg.device in msg.port else f'{msg.device}_{msg.port}'
+            get_log_writer().write(f"{self.file_path}/{self.LOG_FILE}",
+                                   f"{time()},{unit_id},{estimate.offset_ms:.1f},{estimate.drift_ppm:.2f},"
+                                   f"{estimate.uncertainty_ms:.1f},{estimate.round_trip_ms:.1f},{estimate.samples}",
+                                   self.LOG_HEADER)
+
+    def _estimate(self, samples):
+        # Clock filter: the shortest round trips have the least room for asymmetry
+        min_delay = min(s[2] for s in samples)
+        best = [s for s in samples if s[2] <= 2 * min_delay + self.RESOLUTION_MS]
+
+        reference = best[-1][0]
+        offset = sum(s[1] for s in best) / len(best)
+        drift = 0.0
+
+        span = best[-1][0] - best[0][0]
+        if len(best) >= 3 and span >= 10:
+            # Least squares line through (host time, offset), drift in ms per s is 1000 ppm
+            mean_t = sum(s[0] for s in best) / len(best)
+            mean_o = offset
+            s_tt = sum((s[0] - mean_t) ** 2 for s in best)
+            slope = sum((s[0] - mean_t) * (s[1] - mean_o) for s in best) / s_tt
+            offset = mean_o + slope * (reference - mean_t)
+            drift = slope * 1000
+
+        uncertainty = min_delay / 2 + self.RESOLUTION_MS
+        return ClockEstimate(offset, drift, uncertainty, min_delay, len(samples), reference)
+
+    ####################################################################################################################
+    # Estimates
+
+    def estimate(self, dev, port) -> Optional[ClockEstimate]:
+        with self._lock:
+            return self._estimates.get((dev, port))
+
+    def to_host_time(self, dev, port, device_s):
+        """ Returns (host unix time, uncertainty in s) for a device clock time, or (device_s, None) if unknown. """
+        estimate = self.estimate(dev, port)
+        if estimate is None:
+            return device_s, None
+        return device_s - estimate.offset_at(device_s) / 1000, estimate.uncertainty_ms / 1000
@@ -0,0 +1,186 @@
+import asyncio
+from collections import OrderedDict
+from threading import Lock
+from time import time
+from typing import Optional
+
+from serial import Serial
+
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
+
+_DUPLICATE = trace.register('DataSequencer.duplicate')
+_RESET = trace.register('DataSequencer.reset')
+_REQUEST = trace.register('DataSequencer.request')
+
+
+class _Stream:
+    """ What is known about one device's numbered data records. """
+    def __init__(self, seq):
+        self.highest = seq
+        self.seen = OrderedDict()  # seq -> payload of the last history records
+        self.missing = dict()  # seq -> [requests sent, host time of the last one]
+
+
+class DataSequencer:
+    """
+    Detects lost and duplicated wDRT/wVOG data records and asks the device to send the lost ones again.
+
+    The firmware numbers every 'dta>' record it sends by appending '#seq' and keeps the last 64 to resend on an
+    'rtx>' request. receive() strips the number before the record is logged, so data files are unchanged, and:
+        - drops a record it has already passed on (XBee retries can deliver a frame twice),
+        - notes the numbers skipped when a record arrives ahead of the expected one and requests them with 'rtx>',
+          or gives them up straight away once they are more than history behind, as the firmware no longer has them,
+        - starts a device over when a number comes back with different data, i.e. the device was reset.
+    Missing records are requested again every timeout_s up to retries times and then given up on. Recovered and
+    lost records are written to data_gaps.txt in the session folder.
+
+    Records from the digi reader thread and run() on the HWRoot loop share the state, so it is guarded by a lock.
+    """
+    DEVICES = ('wDRT', 'wVOG')
+    LOG_FILE = 'data_gaps.txt'
+    LOG_HEADER = 'Unix time in UTC, Device ID, Sequence, Status'
+
+    def __init__(self, device_controllers, devices, timeout_s=1.0, retries=3, max_request=16, history=64,
+                 debug=False):
+        self._debug = debug
+
+        self._controllers = device_controllers
+        self._devices = devices
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.max_request = max_request
+        # The firmware's resend ring, dta_sent in wDRT_FW/main/controller.py and wVOG_FW/wVOG/controller.py
+        self.history = history
+
+        self.file_path = ''
+
+        self._lock = Lock()
+        self._streams = dict()
+        self._stats = {'received': 0, 'duplicates': 0, 'requested': 0, 'recovered': 0, 'lost': 0}
+
+    ####################################################################################################################
+    # Records
+
+    def receive(self, msg: Message, tx=None) -> Optional[Message]:
+        """ Returns the record without its sequence number, or None if it was a duplicate. """
+        if msg.device not in self.DEVICES:
+            return msg
+        payload, sep, seq = msg.payload.rpartition('#')
+        if not sep or not seq.isdigit():
+            # Firmware without numbered records
+            return msg
+        msg = msg._replace(payload=payload)
+        seq = int(seq)
+        key = (msg.device, msg.port)
+
+        with self._lock:
+            self._stats['received'] += 1
+            stream = self._streams.get(key)
+
+            if stream is not None and stream.seen.get(seq) == payload:
+                self._stats['duplicates'] += 1
+                trace.event(_DUPLICATE, (key, seq))
+                return None
+
+            if stream is None or seq in stream.seen or seq < stream.highest - self.history:
+                # New device, or an old number with other data: the device was reset and counts from 1 again
+                if stream is not None:
+                    trace.event(_RESET, (key, seq))
+                stream = self._streams[key] = _Stream(seq)
+            elif seq > stream.highest:
+                for skipped in range(stream.highest + 1, seq):
+                    stream.missing[skipped] = [0, 0.0]
+                stream.highest = seq
+            elif stream.missing.pop(seq, None) is not None:
+                self._stats['recovered'] += 1
+                self._log(msg.device, msg.port, seq, 'recovered')
+
+            stream.seen[seq] = payload
+            while len(stream.seen) > self.history:
+                stream.seen.popitem(last=False)
+
+            requests = self._due(stream, time())
+
+        if requests:
+            self._request(msg.device, msg.port, requests, tx)
+        return msg
+
+    def forget(self, dev, port):
+        with self._lock:
+            self._streams.pop((dev, port), None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    ####################################################################################################################
+    # Retransmit requests
+
+    async def run(self, get_tx=lambda: None):
+        while True:
+            await asyncio.sleep(self.timeout_s / 4)
+
+            due = list()
+            with self._lock:
+                for (dev, port), stream in list(self._streams.items()):
+                    if port not in self._devices.get(dev, {}):
+                        del self._streams[(dev, port)]
+                    elif stream.missing:
+                        due.append((dev, port, self._due(stream, time())))
+
+            for dev, port, requests in due:
+                if requests:
+                    self._request(dev, port, requests, get_tx())
+
+    def _due(self, stream, now):
+        """
+        Missing records to request now; the ones out of retries, or out of the firmware's ring, are given up on.
+        Called with the lock held.
+        """
+        requests = list()
+        asked = 0
+        for seq, request in list(stream.missing.items()):
+            if seq <= stream.highest - self.history:
+                # Overwritten on the device, asking for it would get no answer
+                del stream.missing[seq]
+                self._stats['lost'] += 1
+                requests.append((seq, None))
+                continue
+            if request[0] and now - request[1] < self.timeout_s:
+                continue
+            if request[0] >= self.retries:
+                del stream.missing[seq]
+                self._stats['lost'] += 1
+                requests.append((seq, None))
+            elif asked < self.max_request:
+                asked += 1
+                request[0] += 1
+                request[1] = now
+                requests.append((seq, request[0]))
+        return requests
+
+    def _request(self, dev, port, requests, tx):
+        lost = [seq for seq, n in requests if n is None]
+        for seq in lost:
+            self._log(dev, port, seq, 'lost')
+        if lost:
+            print(f"{dev} {port}: {len(lost)} data records lost")
+
+        seqs = [seq for seq, n in requests if n is not None]
+        socket = self._devices.get(dev, {}).get(port)
+        if not seqs or socket is None or isinstance(socket, Serial):
+            # USB does not lose records, so there is nothing to ask a wired device for
+            return
+
+        trace.event(_REQUEST, (dev, port, seqs))
+        with self._lock:
+            self._stats['requested'] += len(seqs)
+        self._controllers[dev].parse_command(socket, new_message(dev, port, 'retransmit', ','.join(map(str, seqs))), tx)
+
+    def _log(self, dev, port, seq, status):
+        if self.file_path:
+            unit_id = port if dev in port else f'{dev}_{port}'
+            get_log_writer().write(f"{self.file_path}/{self.LOG_FILE}", f"{time()},{unit_id},{seq},{status}",
+                                   self.LOG_HEADER)
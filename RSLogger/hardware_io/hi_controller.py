@@ -1,24 +1,27 @@
 import asyncio
-from time import time_ns
+from time import time
 from RSLogger.hardware_io.usb_connect import UsbPortScanner
 from RSLogger.hardware_io.remote_connect import RemoteConnectionManager
+from RSLogger.hardware_io.sync_start import SyncStart
+from RSLogger.hardware_io.clock_sync import ClockSync
+from RSLogger.hardware_io.data_sequencer import DataSequencer
+from RSLogger.hardware_io.mmc_offload import MMCOffload
 from RSLogger.hardware_io.sDRT_HI import sDRT_HIController
 from RSLogger.hardware_io.wDRT_HI import wDRT_HIController
 from RSLogger.hardware_io.wVOG_HI import wVOG_HIController
 from RSLogger.hardware_io.sVOG_HI import sVOG_HIController
-from queue import SimpleQueue
-import inspect
-import os
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+from RSLogger.utilities.message import Message
+from RSLogger.utilities import trace, metrics
 
 
 class HWRoot:
-    def __init__(self, queues, debug=False):
+    def __init__(self, queues, debug=False, autostart=True, sync_start=True, list_ports=None, xbee_factory=None,
+                 node_cache=None):
         self._debug = debug
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
 
-        self.q_2_ui: SimpleQueue = queues['q_2_ui']
-        self.q_2_hi: SimpleQueue = queues['q_2_hi']
+        self.q_2_ui: WakeupQueue = queues['q_2_ui']
+        self.q_2_hi: WakeupQueue = queues['q_2_hi']
 
         self.RS_devices = dict()
 
@@ -29,85 +32,120 @@ class HWRoot:
             'wVOG': wVOG_HIController.wVOGController(self.q_2_ui)
         }
 
-        # Connection Managers
-        self.XB = RemoteConnectionManager(self.RS_devices, self.distribute_message)
-        self.USB = UsbPortScanner(self.RS_devices, self.distribute_message)
+        # 'all' start commands begin every device's trial at one scheduled instant
+        self.SYNC = SyncStart(self._device_controllers, debug=debug) if sync_start else None
+
+        # Offset and drift of each wDRT/wVOG clock from the host clock
+        self.CLOCK = ClockSync(self._device_controllers, self.RS_devices, debug=debug)
+
+        # Lost and duplicated wDRT/wVOG data records
+        self.SEQ = DataSequencer(self._device_controllers, self.RS_devices, debug=debug)
 
-        self.launch()
+        # Copies wired wDRT/wVOG memory cards into the session folder
+        self.MMC = MMCOffload(self._device_controllers, self.RS_devices, debug=debug)
+
+        # Connection Managers
+        # list_ports, xbee_factory and node_cache stand in for the real ports, dongle and node cache, e.g. for the
+        # simulator
+        self.XB = RemoteConnectionManager(self.RS_devices, self.distribute_message, self.handle_device_message,
+                                          node_cache=node_cache, list_ports=list_ports, xbee_factory=xbee_factory)
+        self.USB = UsbPortScanner(self.RS_devices, self.distribute_message, self.handle_device_message,
+                                  list_ports=list_ports)
+
+        # Runtime metrics; lines are counted per port as they are handled, see metrics
+        self._port_lines = dict()
+        self._dispatch_ms = metrics.histogram('device_dispatch_ms')
+        metrics.gauge('q_2_ui_depth').set_function(self.q_2_ui.qsize)
+        metrics.gauge('q_2_hi_depth').set_function(self.q_2_hi.qsize)
+        metrics.gauge('xbee_tx_queued').set_function(lambda: self.XB.tx.stats()['queued'] if self.XB.tx else 0)
+        metrics.gauge('records_lost').set_function(lambda: self.SEQ.stats()['lost'])
+        metrics.gauge('devices_connected').set_function(
+            lambda: sum(len(ports) for ports in list(self.RS_devices.values())))
+
+        if autostart:
+            self.launch()
 
     def launch(self):
         if not __name__ == "__main__":
             asyncio.run(self.run())
 
     async def run(self):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
+        loop = asyncio.get_running_loop()
+        self.q_2_hi.set_waker(lambda: loop.call_soon_threadsafe(self._q_2_hi_messages_handler))
 
         await asyncio.gather(self.USB.run(),
                              self.XB.run(),
-                             self._q_2_hi_messages_listener())
-
-    async def _q_2_hi_messages_listener(self):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
-
-        while True:
-            if not self.q_2_hi.empty():
-                raw_packet = self.q_2_hi.get()
-                try:
-                    device, port, key, val = raw_packet.split('>')
-                    self.distribute_message(device, port, key, val)
-                    if key == 'net_scn':
-                        self.XB.clear_network()
-                except ValueError:
-                    if self._debug:
-                        print(f'{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}: {raw_packet}')
-            await asyncio.sleep(0.001)
-
-    def distribute_message(self, device, port, key, val):
-        if self._debug: print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}: {device} {port} {key} {val}")
-
-        if port == 'ui':
-            self._handle_message_for_ui(device, port, key, val)
+                             self.CLOCK.run(lambda: self.XB.tx),
+                             self.SEQ.run(lambda: self.XB.tx))
+
+    @trace.span
+    def _q_2_hi_messages_handler(self):
+        for msg in self.q_2_hi.drain():
+            self.distribute_message(msg)
+            if msg.key == 'net_scn':
+                self.XB.clear_network()
+
+    @trace.span
+    def distribute_message(self, msg: Message):
+        if msg.port == 'ui':
+            self._handle_message_for_ui(msg)
         else:
-            self._handle_message_for_all_hardware_communication(device, port, key, val)
-
-    def _handle_message_for_ui(self, device, port, key, val):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}: {device} {port} {key} {val}")
-
-        self.q_2_ui.put(f'{device}>{port}>{key}>{val}')
-
-    def _handle_message_for_all_hardware_communication(self, device, port, key, val):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
-
-        if device == 'all':
+            self._handle_message_for_all_hardware_communication(msg)
+
+    @trace.span
+    def handle_device_message(self, msg: Message):
+        if (lines := self._port_lines.get((msg.device, msg.port))) is None:
+            lines = self._port_lines[(msg.device, msg.port)] = metrics.counter('device_lines', device=msg.device,
+                                                                                port=msg.port)
+        lines.inc()
+        # From the line's arrival at the host to here, i.e. how far the hardware thread is behind
+        self._dispatch_ms.observe((time() - msg.timestamp) * 1000)
+
+        if msg.key == 'dta' and not (msg := self.SEQ.receive(msg, self.XB.tx)):
+            return
+
+        if msg.key in ('syn', 'sst') and self.SYNC:
+            self.SYNC.report(msg, self.XB.tx)
+        elif msg.key == 'tsr':
+            self.CLOCK.report(msg)
+        elif msg.key in ('mls', 'mrd'):
+            self.MMC.report(msg)
+        elif controller := self._device_controllers.get(msg.device):
+            controller.handle_device_message(self.RS_devices.get(msg.device, {}).get(msg.port), msg)
+
+    def _handle_message_for_ui(self, msg: Message):
+        self.q_2_ui.put(msg)
+
+    @trace.span
+    def _handle_message_for_all_hardware_communication(self, msg: Message):
+        if msg.key == 'fpath':
+            self.CLOCK.file_path = msg.payload
+            self.SEQ.file_path = msg.payload
+            self.MMC.file_path = msg.payload
+            if self.SYNC:
+                self.SYNC.file_path = msg.payload
+
+        if msg.key == 'mmc_pull':
+            self.MMC.pull(msg.device, msg.port)
+        elif msg.device == 'all' and msg.key == 'start' and self.SYNC:
+            self.SYNC.start(self.RS_devices, self.XB.tx)
+        elif msg.device == 'all':
             for dev, port_sockets in list(self.RS_devices.items()):  # All devices
                 for port in list(port_sockets.keys()):  # All ports of device
                     socket = self.RS_devices.get(dev, {}).get(port)
-                    self._device_controllers[dev].parse_command(socket, key, val, self.XB.xcvr)
+                    self._device_controllers[dev].parse_command(socket, msg, self.XB.tx)
         else:
-            if port == 'all':
-                for port in list(self.RS_devices[device].keys()):
-                    socket = self.RS_devices.get(device, {}).get(port)
-                    self._device_controllers[device].parse_command(socket, key, val, self.XB.xcvr)
+            if msg.port == 'all':
+                for port in list(self.RS_devices.get(msg.device, {}).keys()):
+                    socket = self.RS_devices.get(msg.device, {}).get(port)
+                    self._device_controllers[msg.device].parse_command(socket, msg, self.XB.tx)
             else:
-                if socket := self.RS_devices.get(device, {}).get(port):
-                    self._device_controllers[device].parse_command(socket, key, val, self.XB.xcvr)
-
-    def file_(self):
-        return os.path.basename(__file__)
-
-    def class_(self):
-        return self.__class__.__name__
-
-    def method_(self):
-        return  inspect.currentframe().f_back.f_code.co_name
+                if socket := self.RS_devices.get(msg.device, {}).get(msg.port):
+                    self._device_controllers[msg.device].parse_command(socket, msg, self.XB.tx)
 
 
 if __name__ == "__main__":
-    queues = {'q_2_ui': SimpleQueue(), 'q_2_hi': SimpleQueue()}
+    queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
     hw_root = HWRoot(queues, debug=True)
     asyncio.run(hw_root.run())
 
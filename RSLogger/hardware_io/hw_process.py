@@ -0,0 +1,207 @@
+"""
+HWRoot in a process of its own, so Tk and the plots never hold the GIL while serial lines arrive and are timestamped.
+
+Records for the UI go through a shared memory ring (see shm_ring) and are put on the UI's q_2_ui by a reader thread,
+so the UI side is unchanged. Commands go back over a pipe: q_2_hi is replaced by a CommandPipe. The UI's session
+files (controls, notes, key flags) are passed to the hardware process's LogWriter too, through a LogWriterProxy, so
+one writer owns the session folder and its journal. The hardware process's metrics are sent with the records and
+show up in the UI process's snapshots, and Ctrl+Shift+T traces both processes.
+
+    queues = {'q_2_hi': WakeupQueue(), 'q_2_ui': WakeupQueue()}
+    hw = HardwareProcess(queues)
+    hw.start()          # queues['q_2_hi'] is now the pipe
+    UIController(queues)
+    hw.stop()
+"""
+import json
+import multiprocessing
+import threading
+from time import strftime
+
+from RSLogger.utilities import metrics, trace
+from RSLogger.utilities.log_writer import get_log_writer, use_log_writer
+from RSLogger.utilities.message import new_message
+from RSLogger.utilities.shm_ring import ShmRing, RingReader, RingWriter
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+
+class CommandPipe:
+    """ Stands in for q_2_hi in the UI process. Only put() is offered, like the UI only ever puts commands. """
+    def __init__(self, conn):
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def put(self, item, block=True, timeout=None):
+        self.send(('msg', item))
+
+    def put_nowait(self, item):
+        self.put(item)
+
+    def trace(self, enable, path=''):
+        """ Starts tracing in the hardware process, or stops it there and writes its trace to path. """
+        self.send(('trace', enable, path))
+
+    def send(self, command):
+        with self._lock:
+            try:
+                self._conn.send(command)
+            except (OSError, ValueError):
+                # Hardware process has ended
+                pass
+
+
+class LogWriterProxy:
+    """
+    Process wide log writer of the UI process while the hardware runs in its own: every call is passed on to the
+    hardware process's LogWriter. flush() and close_all() do not wait for it.
+    """
+    def __init__(self, pipe: CommandPipe):
+        self._pipe = pipe
+
+    def write(self, path, line, header=None):
+        self._pipe.send(('log', 'write', (path, line, header)))
+
+    def open_session(self, folder):
+        self._pipe.send(('log', 'open_session', (folder, )))
+
+    def flush(self, wait=False):
+        self._pipe.send(('log', 'flush', ()))
+
+    def close_all(self, wait=False):
+        self._pipe.send(('log', 'close_all', ()))
+
+    def stats(self):
+        return dict()
+
+
+class HardwareProcess:
+    """
+    Starts and stops the hardware process. hw_options go to HWRoot and have to be picklable (e.g. a module level
+    list_ports function). binary_logs and trace switch those on in the hardware process.
+    """
+    METRICS_INTERVAL = 0.25
+
+    def __init__(self, queues, ring_size=1 << 22, binary_logs=False, trace_hw=False, debug=False, **hw_options):
+        self._debug = debug
+
+        self._queues = queues
+        self._q_2_ui: WakeupQueue = queues['q_2_ui']
+        self._ring_size = ring_size
+        self._options = {'binary_logs': binary_logs, 'trace': trace_hw, 'debug': debug, 'hw_options': hw_options}
+
+        self._ring = None
+        self._process = None
+        self._pipe = None
+        self._reader = None
+        self._hw_metrics = list()
+
+    def start(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._ring = ShmRing.create(self._ring_size)
+        wake_recv, wake_send = ctx.Pipe(duplex=False)
+        cmd_recv, cmd_send = ctx.Pipe(duplex=False)
+
+        self._process = ctx.Process(target=_hardware_main, args=(self._ring.name, wake_send, cmd_recv, self._options),
+                                    name='rs_hardware', daemon=True)
+        self._process.start()
+        # The child has its own copies now; closing these lets either side see the other end
+        wake_send.close()
+        cmd_recv.close()
+
+        self._pipe = CommandPipe(cmd_send)
+        self._queues['q_2_hi'] = self._pipe
+        use_log_writer(LogWriterProxy(self._pipe))
+        metrics.add_source(lambda: self._hw_metrics)
+
+        self._reader = threading.Thread(target=self._read_records, args=(RingReader(self._ring, wake_recv), ),
+                                        name='hw_ring_reader', daemon=True)
+        self._reader.start()
+
+    @trace.span
+    def stop(self, timeout=5.0):
+        """ Closes the hardware process's files and ends it. """
+        self._pipe.send(('stop', ))
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._reader.join(1)
+        self._ring.close()
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def _read_records(self, reader):
+        while True:
+            alive = reader.wait(1.0)
+            for msg in reader.drain():
+                if msg.device == 'hw' and msg.key == 'metrics':
+                    self._hw_metrics = json.loads(msg.payload)
+                else:
+                    self._q_2_ui.put(msg)
+            if not alive:
+                return
+
+
+########################################################################################################################
+# Hardware process
+
+def _hardware_main(ring_name, wake_conn, cmd_conn, options):
+    from RSLogger.hardware_io.hi_controller import HWRoot
+
+    if options['trace']:
+        trace.enable()
+    writer = get_log_writer()
+    writer.binary = options['binary_logs']
+
+    ring = ShmRing.attach(ring_name)
+    q_2_ui = RingWriter(ring, wake_conn)
+    queues = {'q_2_ui': q_2_ui, 'q_2_hi': WakeupQueue()}
+    metrics.gauge('ui_ring_dropped').set_function(lambda: q_2_ui.dropped)
+
+    hw = HWRoot(queues, autostart=False, debug=options['debug'], **options['hw_options'])
+    threading.Thread(target=hw.launch, name='hw_root', daemon=True).start()
+
+    stopped = threading.Event()
+    threading.Thread(target=_report_metrics, args=(q_2_ui, stopped), name='hw_metrics', daemon=True).start()
+
+    try:
+        while True:
+            try:
+                command = cmd_conn.recv()
+            except (EOFError, OSError):
+                # UI process has ended without stopping us
+                break
+            if command[0] == 'msg':
+                queues['q_2_hi'].put(command[1])
+            elif command[0] == 'log':
+                _, method, args = command
+                getattr(writer, method)(*args)
+            elif command[0] == 'trace':
+                _toggle_trace(*command[1:])
+            elif command[0] == 'stop':
+                break
+    finally:
+        stopped.set()
+        writer.close_all(wait=True)
+        if options['trace']:
+            trace.dump(f"rs_trace_hw_{strftime('%Y%m%d_%H%M%S')}.json")
+
+
+def _toggle_trace(enable, path):
+    if enable:
+        trace.clear()
+        trace.enable()
+        return
+
+    trace.disable()
+    try:
+        n_events = trace.dump(path)
+        print(f"{n_events} hardware process trace events written to {path}")
+    except OSError as e:
+        print(f"The hardware process trace could not be written: {e}")
+
+
+def _report_metrics(q_2_ui: RingWriter, stopped):
+    while not stopped.wait(HardwareProcess.METRICS_INTERVAL):
+        snap = metrics.snapshot()['metrics']
+        q_2_ui.put(new_message('hw', 'ui', 'metrics', json.dumps(snap)))
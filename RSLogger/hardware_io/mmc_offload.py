@@ -0,0 +1,217 @@
+import asyncio
+import os
+from base64 import b64decode
+from binascii import Error as Base64Error
+from time import time
+from zlib import crc32
+
+from serial import Serial
+
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
+
+
+class MMCOffload:
+    """
+    Copies the log files on the memory card of wired wDRT/wVOG units into the session folder and fills in any data
+    records that did not arrive live.
+
+    The files are listed with 'mls>' and read chunk by chunk with 'mrd>name,offset,length'. The device answers every
+    chunk with its offset, CRC32 and base64 data; a chunk that fails its check or does not arrive within timeout_s is
+    asked for again from the same offset, up to retries times. Files go to mmc/<Device ID>/ in the session folder and
+    a pull continues from the size of the local copy, so an interrupted pull picks up where it stopped. Every device
+    is pulled in its own task, so several can be pulled at the same time.
+
+    Once a device's files are copied, data records on the card from this session (device time at or after the
+    session folder was set) that are missing from wDRT.txt / wVOG.txt are added to it with the label 'mmc' and no
+    host time. A record counts as logged under the unit's USB Device ID or under its XBee node ID, which the card
+    lines start with, so records that already arrived over XBee are not added again. One line per file is written to
+    mmc_offload.txt.
+
+    The card is only read over USB: the chunks are too large for XBee frames.
+    """
+    DEVICES = ('wDRT', 'wVOG')
+    FOLDER = 'mmc'
+    LOG_FILE = 'mmc_offload.txt'
+    LOG_HEADER = 'Unix time in UTC, Device ID, File, Bytes, Records Filled'
+
+    def __init__(self, device_controllers, devices, chunk=1024, timeout_s=1.0, retries=3, debug=False):
+        self._debug = debug
+
+        self._controllers = device_controllers
+        self._devices = devices
+        self.chunk = chunk
+        self.timeout_s = timeout_s
+        self.retries = retries
+
+        self._file_path = ''
+        self._session_start = 0
+
+        self._waiting = dict()
+        self._pulling = dict()
+
+    @property
+    def file_path(self):
+        return self._file_path
+
+    @file_path.setter
+    def file_path(self, path):
+        self._file_path = path
+        self._session_start = int(time())
+
+    ####################################################################################################################
+    # Pulls
+
+    def pull(self, dev, port='all'):
+        """ Starts pulling the cards of one device, or of every wired wDRT/wVOG. Must run on the HWRoot loop. """
+        if not self._file_path:
+            print('Memory card offload needs a session folder')
+            return
+
+        for d in (self.DEVICES if dev == 'all' else (dev,)):
+            for p, socket in list(self._devices.get(d, {}).items()):
+                if port in ('all', p) and isinstance(socket, Serial) and (d, p) not in self._pulling:
+                    self._pulling[(d, p)] = asyncio.create_task(self._pull(d, p, socket))
+
+    def report(self, msg: Message):
+        """ Handles a device's 'mls' and 'mrd' replies. """
+        reply_key, future = self._waiting.get((msg.device, msg.port), (None, None))
+        if msg.key == reply_key and not future.done():
+            future.set_result(msg.payload)
+
+    @trace.span
+    async def _pull(self, dev, port, socket):
+        unit_id = port if dev in port else f'{dev}_{port}'
+        folder = f"{self._file_path}/{self.FOLDER}/{unit_id}"
+        try:
+            listing = await self._query(dev, port, socket, 'mmc_list', 'mls')
+            if listing is None:
+                print(f"{unit_id}: no answer to the memory card listing")
+                return
+
+            os.makedirs(folder, exist_ok=True)
+            copied = list()
+            for entry in filter(None, listing.split(',')):
+                name, _, size = entry.rpartition(':')
+                if await self._pull_file(dev, port, socket, name, int(size), f"{folder}/{name}"):
+                    copied.append(name)
+
+            await self._reconcile(dev, unit_id, folder, copied)
+        except (OSError, ValueError) as e:
+            print(f"{unit_id}: memory card offload failed: {e}")
+        finally:
+            self._pulling.pop((dev, port), None)
+            self._waiting.pop((dev, port), None)
+
+    @trace.span
+    async def _pull_file(self, dev, port, socket, name, size, local):
+        offset = os.path.getsize(local) if os.path.exists(local) else 0
+        if offset > size:
+            # The card was cleared since the last pull, start the copy over
+            offset = 0
+
+        with open(local, 'ab' if offset else 'wb') as outfile:
+            while offset < size:
+                for _ in range(self.retries):
+                    reply = await self._query(dev, port, socket, 'mmc_read',
+                                              'mrd', f'{name},{offset},{min(self.chunk, size - offset)}')
+                    if data := self._check_chunk(reply, name, offset):
+                        break
+                else:
+                    print(f"{dev} {port}: {name} stopped at {offset} of {size} bytes, pull again to resume")
+                    return False
+
+                outfile.write(data)
+                offset += len(data)
+
+        return True
+
+    @staticmethod
+    def _check_chunk(reply, name, offset):
+        """ Returns the chunk's data if the reply is for this chunk and its CRC matches, else None. """
+        try:
+            r_name, r_offset, crc, data = reply.split(',')
+            data = b64decode(data, validate=True)
+        except (AttributeError, ValueError, Base64Error):
+            return None
+        if r_name != name or int(r_offset) != offset or int(crc, 16) != crc32(data) or not data:
+            return None
+        return data
+
+    async def _query(self, dev, port, socket, key, reply_key, payload=''):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[(dev, port)] = (reply_key, future)
+
+        self._controllers[dev].parse_command(socket, new_message(dev, port, key, payload))
+        try:
+            return await asyncio.wait_for(future, self.timeout_s)
+        except asyncio.TimeoutError:
+            return None
+
+    ####################################################################################################################
+    # Reconcile
+
+    async def _reconcile(self, dev, unit_id, folder, copied):
+        data_path = f"{self._file_path}/{self._controllers[dev].LOG_FILE_PATH_TEMPLATE}"
+        loop = asyncio.get_running_loop()
+
+        # Everything logged live has to be in the file before it is compared
+        await loop.run_in_executor(None, get_log_writer().flush, True)
+        unit_ids = {unit_id} | await loop.run_in_executor(None, self._node_ids, [f"{folder}/{n}" for n in copied])
+        live = await loop.run_in_executor(None, self._live_records, data_path, unit_ids)
+
+        for name in copied:
+            filled = await loop.run_in_executor(None, self._fill_gaps, dev, unit_id, f"{folder}/{name}", live)
+            get_log_writer().write(f"{self._file_path}/{self.LOG_FILE}",
+                                   f"{time()},{unit_id},{name},{os.path.getsize(f'{folder}/{name}')},{filled}",
+                                   self.LOG_HEADER)
+            if filled:
+                print(f"{unit_id}: {filled} data records from {name} added to {data_path}")
+
+    @staticmethod
+    def _node_ids(card_paths):
+        """ The XBee node IDs the card lines were written under; the Device ID of records logged over XBee. """
+        node_ids = set()
+        for card_path in card_paths:
+            with open(card_path, 'r', errors='replace') as infile:
+                for line in infile:
+                    node_id, sep, _ = line.partition(',,,')
+                    if sep and node_id not in ('', 'None'):
+                        node_ids.add(node_id)
+        return node_ids
+
+    @staticmethod
+    def _live_records(data_path, unit_ids):
+        """
+        Data fields of the records logged live for any of unit_ids: Device ID, Label, Unix time, then the device's
+        data.
+        """
+        live = set()
+        if os.path.exists(data_path):
+            with open(data_path, 'r', errors='replace') as infile:
+                for line in infile:
+                    fields = line.rstrip('\r\n').split(',', 3)
+                    if len(fields) == 4 and fields[0] in unit_ids:
+                        live.add(fields[3])
+        return live
+
+    def _fill_gaps(self, dev, unit_id, card_path, live):
+        """ Logs records of this session in a card file that are not in live. Card lines are 'NI,,,<data>'. """
+        controller = self._controllers[dev]
+        filled = 0
+        with open(card_path, 'r', errors='replace') as infile:
+            for line in infile:
+                _, sep, record = line.rstrip('\r\n').partition(',,,')
+                if not sep or record in live:
+                    continue
+                try:
+                    if int(record.rsplit(',', 1)[1]) < self._session_start:
+                        continue
+                except (IndexError, ValueError):
+                    continue
+                get_log_writer().write(f"{self._file_path}/{controller.LOG_FILE_PATH_TEMPLATE}",
+                                       f"{unit_id},mmc,,{record}", controller.LOG_HEADER)
+                live.add(record)
+                filled += 1
+        return filled
@@ -1,9 +1,27 @@
 from digi.xbee.devices import XBeeNetwork, NetworkDiscoveryStatus, XBeeMessage, XBeeDevice
+from digi.xbee.models.address import XBee64BitAddress
 import re
 import asyncio
-from serial.tools.list_ports_windows import comports
+from serial.tools.list_ports import comports
 from asyncio import get_running_loop
-from time import time_ns, gmtime
+from time import gmtime, perf_counter
+
+from RSLogger.hardware_io.xbee_node_cache import XBeeNodeCache
+from RSLogger.hardware_io.xbee_tx import XBeeTransmitter
+from RSLogger.utilities.message import new_message, parse_device_line
+from RSLogger.utilities import trace
+
+_DONGLE = trace.register('RemoteConnectionManager.dongle')
+_OPENED = trace.register('RemoteConnectionManager.opened')
+_RECEIVED = trace.register('RemoteConnectionManager.received')
+_ROUTE_ERROR = trace.register('RemoteConnectionManager.route_error')
+_RESTORE = trace.register('RemoteConnectionManager.restore_cached_nodes')
+_CONFIRMED = trace.register('RemoteConnectionManager.confirmed_cached_node')
+_EXPIRE_ERROR = trace.register('RemoteConnectionManager.expire_error')
+_DISCOVERED = trace.register('RemoteConnectionManager.discovered')
+_DISCOVERY_ERROR = trace.register('RemoteConnectionManager.discovery_error')
+_READY = trace.register('RemoteConnectionManager.ready')
+_SET_RTC = trace.register('RemoteConnectionManager.set_rtc')
 
 
 class RemoteConnectionManager:
@@ -15,25 +33,49 @@ class RemoteConnectionManager:
     DONGLE_ID = {'pid': 0x6015, 'vid': 0x0403}
     BAUD = 921600
 
-    def __init__(self, remote_devices, distribute_cb=None, debug=False):
+    # How long a node restored from the cache has to answer its ping before it is taken off the network again
+    PING_TIMEOUT_S = 3.0
+
+    def __init__(self, remote_devices, distribute_cb=None, received_cb=None, node_cache=None, list_ports=None,
+                 xbee_factory=None, debug=False):
         self._debug = debug
 
-        self.xcvr = None
+        # Port listing and dongle constructor, replaceable e.g. by the simulator's
+        self._list_ports = list_ports if list_ports else comports
+        self._xbee_factory = xbee_factory if xbee_factory else XBeeDevice
 
-        self._distribute = distribute_cb if distribute_cb else lambda a, b, c, d: print(f'No distribute callback: {a}, {b}, {c}, {d}')
+        self.xcvr = None
+        self.tx = None
+
+        # Nodes from earlier runs are restored as soon as the dongle opens, discovery then only has to find new ones.
+        # They are provisional until they are heard from: 64-bit address -> (remote device, ping deadline)
+        self._node_cache = node_cache if node_cache is not None else XBeeNodeCache()
+        self._provisional = dict()
+        self._t_open = None
+        self._ready = False
+
+        # Routing cache for the receive path, so node IDs are only parsed once per remote device:
+        #   id(remote device) -> (remote device, device type, node ID, 64-bit address)
+        #   64-bit address    -> (device type, node ID, 64-bit address)
+        self._routes = dict()
+        self._routes_by_addr = dict()
+
+        self._distribute = distribute_cb if distribute_cb else lambda m: print(f'No distribute callback: {m}')
+        self._received = received_cb if received_cb else lambda m: print(f'No received callback: {m}')
         self._network = None
 
         self._remote_devices = remote_devices
 
+        # The HWRoot loop; records arrive on the Digi reader thread and are handed over to it
+        self._loop = None
+
+    @trace.span
     async def run(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager.run")
+        self._loop = get_running_loop()
         await asyncio.gather(self._scan_usb_ports())
 
     async def _scan_usb_ports(self):
         while True:
-            if self._debug:
-                print(f"{time_ns()} RemoteConnectionManager._scan_usb_ports")
             dongle = self._scan_for_dongle(await self._get_comports())
 
             if not dongle and self.xcvr:
@@ -41,117 +83,216 @@ class RemoteConnectionManager:
 
             if dongle == 'New':
                 self._xb_initialize()
+            elif self._provisional:
+                self._expire_provisional()
 
             await asyncio.sleep(.5)
 
+    @trace.span
     async def _get_comports(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._get_comports")
         loop = get_running_loop()
-        return await loop.run_in_executor(None, comports)
+        return await loop.run_in_executor(None, self._list_ports)
 
+    @trace.span
     def _scan_for_dongle(self, comports):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._scan_for_dongle")
-
         # Scan to make sure that no other RS devices are attached, if so then the dongle won't be connected.
         for comport in comports:
             for device in self.DEVICE_IDS:
                 if comport.pid == self.DEVICE_IDS[device]['pid'] and comport.vid == self.DEVICE_IDS[device]['vid']:
+                    self._stop_transmitter()
                     self.xcvr = None
                     # Notify UI that XBee is disconnected
-                    self._distribute('xbee', 'ui', 'conn_status', 'disconnected')
+                    self._distribute(new_message('xbee', 'ui', 'conn_status', 'disconnected'))
                     return 'Wired'
 
         for comport in comports:
             if comport.pid == self.DONGLE_ID['pid'] and comport.vid == self.DONGLE_ID['vid']:
                 if not self.xcvr:
-                    self.xcvr = XBeeDevice(comport.name, self.BAUD)
-                    if self._debug: print(f"{time_ns()} RemoteConnectionManager._scan_for_dongle FOUND DONGLE")
+                    self.xcvr = self._xbee_factory(comport.name, self.BAUD)
+                    trace.event(_DONGLE, comport.name)
                     # Notify UI that XBee is connected with port name
-                    self._distribute('xbee', 'ui', 'conn_status', f'connected|{comport.name}')
+                    self._distribute(new_message('xbee', 'ui', 'conn_status', f'connected|{comport.name}'))
                     return 'New'
                 else:
                     # Still connected
                     return 'Existing'
         # If we reach here, no dongle found - ensure UI shows disconnected
         if self.xcvr:
-            self._distribute('xbee', 'ui', 'conn_status', 'disconnected')
+            self._distribute(new_message('xbee', 'ui', 'conn_status', 'disconnected'))
         return None
 
+    @trace.span
     def _close_dongle_connection(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._close_dongle_connection")
         if self.xcvr is not None:
             try:
                 self.xcvr.close()
             except Exception as e:
                 print("Error while closing dongle: ", str(e))
             finally:
+                self._node_cache.save()
+                self._stop_transmitter()
                 self.xcvr = None
+                self._network = None
+                self._clear_routes()
+                self._provisional.clear()
                 # Notify UI that XBee is disconnected
-                self._distribute('xbee', 'ui', 'conn_status', 'disconnected')
+                self._distribute(new_message('xbee', 'ui', 'conn_status', 'disconnected'))
 
+    @trace.span
     def _xb_initialize(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._xb_initialize")
         if not self.xcvr.is_open():
             try:
+                self._t_open = perf_counter()
+                self._ready = False
                 self.xcvr.open()
                 self.xcvr.add_data_received_callback(self._msg_received)
-                if self._debug: print(f"{time_ns()} RemoteConnectionManager.update {self.xcvr.is_open()}")
+                self.tx = XBeeTransmitter(self.xcvr, debug=self._debug)
+                self.tx.start()
+                trace.event(_OPENED, self.xcvr.is_open())
                 
                 # Notify UI that XBee is connected with port name
                 port_name = self.xcvr.get_serial_port() if hasattr(self.xcvr, 'get_serial_port') else self.xcvr.serial_port.port
-                self._distribute('xbee', 'ui', 'conn_status', f'connected|{port_name}')
+                self._distribute(new_message('xbee', 'ui', 'conn_status', f'connected|{port_name}'))
                 
+                self._restore_cached_nodes()
                 self.start_network_scan()
             except Exception as e:
                 print(f"Error initializing XBee: {str(e)}")
+                self._stop_transmitter()
                 self.xcvr = None
-                self._distribute('xbee', 'ui', 'conn_status', 'disconnected')
+                self._distribute(new_message('xbee', 'ui', 'conn_status', 'disconnected'))
+
+    def _stop_transmitter(self):
+        if self.tx:
+            self.tx.stop()
+            self.tx = None
 
     def _msg_received(self, msg: XBeeMessage):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._msg_received {msg.data}")
+        trace.event(_RECEIVED, msg.data)
 
         if self.xcvr:
+            remote = msg.remote_device
+            route = self._routes.get(id(remote))
+            if route is None or route[0] is not remote:
+                route = self._learn_route(remote)
+                if route is None:
+                    return
+
+            _, dev, id_raw, addr = route
+            self._node_cache.seen(addr, id_raw)
+            if addr in self._provisional:
+                self._call_on_loop(self._confirm_cached_node, addr)
+            self._call_on_loop(self._received, parse_device_line(dev, id_raw, msg.data, msg.timestamp))
+
+    def _call_on_loop(self, fn, *args):
+        # Called from the Digi reader thread; the controllers, SyncStart, ClockSync etc. belong to the asyncio loop
+        if self._loop is None:
+            # Not running, e.g. driven directly by a benchmark
+            fn(*args)
+            return
+        try:
+            self._loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass  # Loop closed during shutdown
+
+    @staticmethod
+    def _parse_node_id(id_raw):
+        """ 'wDRT_1' -> 'wDRT' """
+        id_clean = re.sub(r'[_\s]', '', id_raw)
+        dev, num = re.match(r"([a-z]+)([0-9]+)", id_clean, re.I).groups()
+        return dev
+
+    def _learn_route(self, remote):
+        """ Slow path of _msg_received for a remote device object it has not seen yet. """
+        addr = str(remote.get_64bit_addr())
+        route = self._routes_by_addr.get(addr)
+        if route is None:
             try:
-                id_raw = msg.remote_device.get_node_id()
-                id_clean = re.sub(r'[_\s]', '', id_raw)
-                dev, num = re.match(r"([a-z]+)([0-9]+)", id_clean, re.I).groups()
-
-                self._distribute(dev, id_raw, msg.data, msg.timestamp)
-            except TypeError as e:
-                if self._debug: print(f"{time_ns()} RemoteConnectionManager._msg_received ERROR {e}")
-
+                id_raw = remote.get_node_id()
+                route = (self._parse_node_id(id_raw), id_raw, addr)
+            except (TypeError, AttributeError) as e:
+                trace.event(_ROUTE_ERROR, (addr, e))
+                return None
+            self._routes_by_addr[addr] = route
+
+        # The network hands back the same object for a known node; guard against one built per packet
+        if len(self._routes) > 1024:
+            self._routes.clear()
+        self._routes[id(remote)] = (remote, *route)
+        return self._routes[id(remote)]
+
+    def _clear_routes(self):
+        self._routes.clear()
+        self._routes_by_addr.clear()
+
+    @trace.span
     def start_network_scan(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager.start_network_scan")
+        if self._get_network() and not self._network.is_discovery_running():
+            self._network.start_discovery_process()
 
+    def _get_network(self):
         if not self._network and self.xcvr:
             self._network: XBeeNetwork = self.xcvr.get_network()
             self._network.add_discovery_process_finished_callback(self._add_devices)
-        if self._network:
-            self._network.start_discovery_process()
+        return self._network
+
+    def _restore_cached_nodes(self):
+        """
+        Puts the cached nodes back on the network and pings them. A node is only announced to the UI once a frame
+        from it arrives; one that stays quiet for PING_TIMEOUT_S is taken off the network again, and ages out of the
+        cache if it is not heard from for its max age.
+        """
+        trace.event(_RESTORE, len(self._node_cache))
 
+        if not self._get_network():
+            return
+
+        deadline = perf_counter() + self.PING_TIMEOUT_S
+        for addr, node_id in self._node_cache.nodes():
+            try:
+                remote = self._network.add_if_not_exist(XBee64BitAddress.from_hex_string(addr), node_id=node_id)
+            except ValueError as e:
+                print(f"Ignoring cached XBee node {addr}: {e}")
+                self._node_cache.forget(addr)
+                continue
+            if remote:
+                self._provisional[addr] = (remote, deadline)
+                # wDRT and wVOG both answer with their battery
+                if self.tx:
+                    self.tx.send(remote, 'get_bat>')
+
+    def _confirm_cached_node(self, addr):
+        if (entry := self._provisional.pop(addr, None)) is not None:
+            trace.event(_CONFIRMED, addr)
+            self._discovery_complete_callback([entry[0]], source='cache')
+
+    def _expire_provisional(self):
+        now = perf_counter()
+        for addr, (remote, deadline) in list(self._provisional.items()):
+            if deadline <= now and self._provisional.pop(addr, None):
+                print(f"Cached XBee node {addr} did not answer, not connecting it")
+                try:
+                    self._network.remove_device(remote)
+                except (AttributeError, ValueError) as e:
+                    trace.event(_EXPIRE_ERROR, e)
+
+    @trace.span
     def stop_network_scan(self):
-        if self._debug: print(f"{time_ns()} RemoteConnectionManager.stop_network_scan")
-        self._network.del_discovery_process_finished_callback(self._discovery_complete_callback)
+        self._network.del_discovery_process_finished_callback(self._add_devices)
         self._network.stop_discovery_process()
         self._network = None
 
+    @trace.span
     def clear_network(self):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager.clear_network")
         self.stop_network_scan()
+        self._clear_routes()
+        self._provisional.clear()
         self.start_network_scan()
         if self._network:
             self._network.clear()
 
+    @trace.span
     def _add_devices(self, e: NetworkDiscoveryStatus):
-        if self._debug:
-            print(f"{time_ns()} RemoteConnectionManager._add_devices")
         if e.value[1] == "Success":
             devices = self._network.get_devices()
             if devices:
@@ -159,30 +300,53 @@ class RemoteConnectionManager:
             else:
                 self.start_network_scan()
 
-    def _discovery_complete_callback(self, discovered_devices):
+    def _discovery_complete_callback(self, discovered_devices, source='discovery'):
         for device in discovered_devices:
-            if self._debug:
-                print(f"{time_ns()} RemoteConnectionManager._discovery_complete_callback")
+            trace.event(_DISCOVERED, source)
 
             try:
                 id_raw = device.get_node_id()
-                id_clean = re.sub(r'[_\s]', '', id_raw)
+                dev = self._parse_node_id(id_raw)
 
-                dev_num = re.match(r"([a-z]+)([0-9]+)", id_clean, re.I)
-                dev, num = dev_num.groups()
+                addr = str(device.get_64bit_addr())
+                self._routes_by_addr[addr] = (dev, id_raw, addr)
+                self._routes[id(device)] = (device, dev, id_raw, addr)
 
+                # The network lists restored nodes whether or not they are there, wait for them to be heard from
+                if addr in self._provisional:
+                    continue
+                self._node_cache.seen(addr, id_raw)
+
+                # Already announced, e.g. restored from the cache and found again by discovery
+                if self._remote_devices.get(dev, {}).get(id_raw) is device:
+                    continue
                 self._remote_devices.setdefault(dev, {})[id_raw] = device
 
                 device_d = ",".join(self._remote_devices[dev].keys())
-                self._distribute(dev, 'ui', 'devices', device_d)
+                self._distribute(new_message(dev, 'ui', 'devices', device_d))
                 self._set_rtc(dev, id_raw)
-            except TypeError as e:
-                if self._debug: print(f"{time_ns()} RemoteConnectionManager._discover_complete_callback ERROR {e}")
+            except (TypeError, AttributeError) as e:
+                trace.event(_DISCOVERY_ERROR, e)
+
+        self._node_cache.save()
+        self._report_ready(source)
+
+    def _report_ready(self, source):
+        """ Tells the UI how long the first remote devices took to become usable after the dongle was opened. """
+        n_devices = sum(1 for d in self._network.get_devices()
+                        if str(d.get_64bit_addr()) not in self._provisional) if self._network else 0
+        if self._ready or self._t_open is None or not n_devices:
+            return
+        self._ready = True
+
+        ms = (perf_counter() - self._t_open) * 1000
+        trace.event(_READY, (n_devices, round(ms), source))
+        self._distribute(new_message('xbee', 'ui', 'ready', f'{n_devices}|{ms:.0f}|{source}'))
 
     def _set_rtc(self, dev, id_raw):
-        if self._debug: print(f" RemoteConnectionManager._set_rtc {dev} {num}")
+        trace.event(_SET_RTC, (dev, id_raw))
         tt = gmtime()
-        self._distribute(dev, id_raw, 'set_rtc', f"{tt[0]},{tt[1]},{tt[2]},{tt[6]},{tt[3]},{tt[4]},{tt[5]},123")
+        self._distribute(new_message(dev, id_raw, 'set_rtc', f"{tt[0]},{tt[1]},{tt[2]},{tt[6]},{tt[3]},{tt[4]},{tt[5]},123"))
 
 
 if __name__ == "__main__":
@@ -1,26 +1,35 @@
 import asyncio
-from threading import Thread
 from queue import SimpleQueue
-from os.path import isfile
-from time import time_ns
+
+from RSLogger.hardware_io.serial_io import SerialWriter
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message
+from RSLogger.utilities import trace
+
+_SENT = trace.register('sDRTController.sent')
 
 
 class sDRTController:
+    LOG_HEADER = 'Device ID, Label, Unix time in UTC, Milliseconds Since Record, Trial Number, Responses, Reaction Time'
+
     def __init__(self, q_2_ui, debug=False):
         self._debug = debug
-        if self._debug: print(f"{time_ns()} sDRTController.__init__")
 
         self._q_2_ui: SimpleQueue = q_2_ui
 
         self._file_path = None
 
+        # One writer thread per port
+        self._writers = dict()
+
         # results
         self._clicks = dict()
         self._results = dict()
         self._cond_name = ""
         
-    def parse_command(self, serial_device, key, val=None, xcvr=None):
-        if self._debug: print(f"{time_ns()} sDRTController.parse_command {serial_device} {key} {val}")
+    @trace.span
+    def parse_command(self, serial_device, msg: Message, xcvr=None):
+        key, val = msg.key, msg.payload
 
         if   key == 'init'         : pass
         elif key == 'close'        : pass
@@ -45,57 +54,39 @@ class sDRTController:
         elif key == 'fpath'        : self._file_path = val
         elif key == 'cond'         : self._cond_name = val
 
-        # Data from device
-
-        elif isinstance(key, bytes):
-            key = key.decode('utf-8')
-            if   'clk' in key : self._handle_clicks_device_data(serial_device.port, key)
-            elif 'trl' in key : self._handle_trial_device_data(serial_device.port, key, val)
-            elif 'end' in key : self._handle_end_device_data(serial_device.port)
-            elif 'stm' in key : self._handle_stimulus_device_callback(serial_device.port, key)
-            elif 'cfg' in key : self._handle_config_device_data(serial_device.port, key)
+    # Data from device
+    @trace.span
+    def handle_device_message(self, serial_device, msg: Message):
+        if   msg.key == 'clk' : self._handle_clicks_device_data(msg)
+        elif msg.key == 'trl' : self._handle_trial_device_data(msg)
+        elif msg.key == 'end' : self._handle_end_device_data(msg.port)
+        elif msg.key == 'stm' : self._handle_stimulus_device_callback(msg)
+        elif msg.key == 'cfg' : self._handle_config_device_data(msg)
 
+    @trace.span
     def _stimulus_toggle(self, serial_device, val):
-        if self._debug: print(f"{time_ns()} sDRTController._stimulus_toggle {serial_device} {val}")
-
         if val == 'on'   : self._send(serial_device, 'stim_on')
         elif val == 'off': self._send(serial_device, 'stim_off')
 
-    def _handle_trial_device_data(self, port, key, val):
-        if self._debug: print(f"{time_ns()} sDRTController._handle_trial_device_data {port} {key} {val}")
-
-        k, v = key.strip().split('>')
-        v = f'{val},{v}'
-        self._results[port] = v
-        self._q_2_ui.put(f'sDRT>{port}>{k}>{v}')
+    def _handle_trial_device_data(self, msg: Message):
+        self._results[msg.port] = msg
+        self._q_2_ui.put(msg)
 
-    def _handle_clicks_device_data(self, port, key):
-        if self._debug: print(f"{time_ns()} sDRTController._handle_clicks_device_data {port} {key}")
-
-        k, v = key.strip().split('>')
-        self._clicks[port] = v
-        self._q_2_ui.put(f'sDRT>{port}>{k}>{v}')
+    def _handle_clicks_device_data(self, msg: Message):
+        self._clicks[msg.port] = msg.payload
+        self._q_2_ui.put(msg)
 
     def _handle_end_device_data(self, port):
-        if self._debug: print(f"{time_ns()} sDRTController._handle_end_device_data {port}")
-
         self._log_results(port)
 
-    def _handle_stimulus_device_callback(self, port, key):
-        if self._debug: print(f"{time_ns()} sDRTController._handle_stimulus_device_callback {port} {key}")
+    def _handle_stimulus_device_callback(self, msg: Message):
+        self._q_2_ui.put(msg)
 
-        k, v = key.strip().split('>')
-        self._q_2_ui.put(f'sDRT>{port}>{k}>{v}')
-
-    def _handle_config_device_data(self, port, key):
-        if self._debug: print(f"{time_ns()} sDRTController._handle_config_device_data {port} {key}")
-
-        k, v = key.strip().split('>')
-        self._q_2_ui.put(f'sDRT>{port}>{k}>{v}')
+    def _handle_config_device_data(self, msg: Message):
+        self._q_2_ui.put(msg)
 
+    @trace.span
     async def set_iso(self, serial):
-        if self._debug: print(f"{time_ns()} sDRTController.set_iso {serial}")
-
         self._send(serial, 'set_lowerISI', 3000)
         await asyncio.sleep(.05)
         self._send(serial, 'set_upperISI', 5000)
@@ -104,44 +95,38 @@ class sDRTController:
         await asyncio.sleep(.05)
         self._send(serial, 'set_intensity', 255)
 
+    @trace.span
     def _log_results(self, com):
-        if self._debug: print(f"{time_ns()} sDRTController._log_results: COM: {com} -- File Path:{self._file_path}")
-
-        if self._file_path:
-            d = self._results[com].split(',')
-            if d[3] == '-1':
+        # The unit also ends the wait before its first trial, with no results yet
+        if self._file_path and com in self._results:
+            result = self._results[com]
+            mills, trl_n, rt = result.payload.split(',')
+            if rt == '-1':
                 self._clicks[com] = 0
 
-            data = f'{d[0]},{d[1]},{d[2]},{self._clicks[com]},{d[3]}'
+            data = f'{result.timestamp},{mills},{trl_n},{self._clicks[com]},{rt}'
 
             packet = f'sDRT_{com},{self._cond_name},{data}'
 
-            def _write(_path, _results):
-                try:
-                    header = None
-                    if not isfile(_path):
-                        header = 'Device ID, Label, Unix time in UTC, Milliseconds Since Record, Trial Number, ' \
-                                 'Responses, Reaction Time'
-
-                    with open(_path, 'a') as writer:
-                        if header: writer.write(header + '\n')
-                        writer.write(_results + '\n')
-                except (PermissionError, FileNotFoundError) as e:
-                    if self._debug: print(f'{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}: {e}')
-
-            file_path = f"{self._file_path}/sDRT.txt"
-            t = Thread(target=_write, args=(file_path, packet))
-            t.start()
+            get_log_writer().write(f"{self._file_path}/sDRT.txt", packet, self.LOG_HEADER)
 
     def _send(self, serial_conn, cmd, val=None):
-        if self._debug: print(f"{time_ns()} sDRTController._send {serial_conn} {cmd} {val}")
-
-        def _send_2_com(_cmd):
-            serial_conn.write(_cmd)
-
         if val: cmd = f'{cmd} {val}\n\r'
         else  : cmd = f'{cmd}\n\r'
 
-        t = Thread(target=_send_2_com, args=(str.encode(cmd),))
-        t.start()
+        writer = self._get_writer(serial_conn)
+        writer.write(str.encode(cmd))
+        trace.event(_SENT, writer.depth)
+
+    def _get_writer(self, serial_conn):
+        writer = self._writers.get(serial_conn.port)
+        if writer is None or writer.serial is not serial_conn or not writer.is_alive():
+            if writer: writer.stop()
+            writer = SerialWriter(serial_conn.port, serial_conn, self._debug)
+            self._writers[serial_conn.port] = writer
+            writer.start()
+        return writer
+
+    def write_queue_depths(self):
+        return {port: writer.depth for port, writer in self._writers.items()}
 
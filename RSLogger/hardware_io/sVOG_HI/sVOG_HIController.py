@@ -1,21 +1,33 @@
-from threading import Thread
 from queue import SimpleQueue
 
-import serial.serialutil
-from os.path import isfile
+from RSLogger.hardware_io.serial_io import SerialWriter
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message
+from RSLogger.utilities import trace
 
 
 class sVOGController:
+    # Device keys forwarded to the UI
+    UI_KEYS = frozenset({'deviceVer', 'configName', 'configMaxOpen', 'configMaxClose',
+                         'configDebounce', 'configClickMode', 'configButtonControl', 'stm', 'data'})
+
+    LOG_HEADER = 'Device ID, Label, Unix time in UTC, Trial Number, Shutter Open, Shutter Closed'
+
     def __init__(self, q_2_ui):
         self._q_2_ui: SimpleQueue = q_2_ui
 
         self._file_path = None
 
+        # One writer thread per port
+        self._writers = dict()
+
         # results
         self._clicks = '0'
         self._cond_name = ''
 
-    def parse_command(self, serial_device, key, val=None, xcvr=None):
+    @trace.span
+    def parse_command(self, serial_device, msg: Message, xcvr=None):
+        key, val = msg.key, msg.payload
 
         if   key == 'init'            : self._send(serial_device, '>do_expStart|<<')
         elif key == 'close'           : self._send(serial_device, '>do_expStop|<<')
@@ -29,24 +41,18 @@ class sVOGController:
         elif key == 'get_config'      : self._get_cfg(serial_device)
 
         elif key == 'nhtsa'           : self._set_cfg_nhtsa(serial_device)
+        elif key == 'set_cfg'         : self._set_cfg(serial_device, val)
 
         elif key == 'cond'            : self._cond_name = val
 
         elif key == 'data'            : self._log_results(serial_device.port, val)
 
-        elif not isinstance(key, bytes):
-            if 'cfg' in key             : self._set_cfg(serial_device, key)
-
-        elif isinstance(key, bytes):
-            key = key.decode('utf-8')
-            for keyword in ['deviceVer', 'configName', 'configMaxOpen', 'configMaxClose',
-                            'configDebounce', 'configClickMode', 'configButtonControl', 'stm', 'data']:
-                if keyword in key:
-                    k, v = key.split('|')
-                    self._q_2_ui.put(f'sVOG>{serial_device.port}>{k}>{v}')
-                    if keyword == 'data':
-                        self._log_results(serial_device.port, f'{val},{v}')
-                    break
+    @trace.span
+    def handle_device_message(self, serial_device, msg: Message):
+        if msg.key in self.UI_KEYS:
+            self._q_2_ui.put(msg)
+            if msg.key == 'data':
+                self._log_results(msg.port, f'{msg.timestamp},{msg.payload}')
 
     def _get_cfg(self, serial_conn):
         for msg in ['get_deviceVer', 'get_configName', 'get_configMaxOpen', 'get_configMaxClose',
@@ -56,7 +62,7 @@ class sVOGController:
     def _set_cfg(self, serial_conn, cmd):
         cmds = ['set_configName', 'set_configMaxOpen', 'set_configMaxClose',
                 'set_configDebounce', 'set_configClickMode', 'set_configButtonControl']
-        cmd_split = cmd.split(',')[1:]
+        cmd_split = cmd.split(',')
         for i, msg in enumerate(cmd_split):
             packet = f'>{cmds[i]}|{msg}<<'
             self._send(serial_conn, packet)
@@ -65,36 +71,30 @@ class sVOGController:
         for msg in ['set_lowerISI 3000', 'set_upperISI 5000', 'set_stimDur 1000', 'set_intensity 255']:
             self._send(serial_conn, f'{msg}')
 
+    @trace.span
     def _log_results(self, com, data):
+        if not self._file_path:
+            return
+
         packet = f'sVOG_{com},{self._cond_name},{data}'
 
-        def _write(_path, _results):
-            try:
-                header = None
-                if not isfile(_path):
-                    header = 'Device ID, Label, Unix time in UTC, Trial Number, ' \
-                             'Shutter Open, Shutter Closed'
-                with open(_path, 'a') as writer:
-                    if header: writer.write(header + '\n')
-                    writer.write(_results)
-            except (PermissionError, FileNotFoundError):
-                print("Control write error")
-
-        file_path = f"{self._file_path}/sVOG.txt"
-        t = Thread(target=_write, args=(file_path, packet))
-        t.start()
-
-    @staticmethod
-    def _send(serial_conn, cmd, val=None):
-        def _send_2_com(_cmd):
-            try:
-                serial_conn.write(_cmd)
-            except serial.serialutil.SerialTimeoutException as e:
-                print(f'SVOG HIController: {e}')
+        get_log_writer().write(f"{self._file_path}/sVOG.txt", packet, self.LOG_HEADER)
 
+    def _send(self, serial_conn, cmd, val=None):
         if val: cmd = f'{cmd} {val}\n'
         else  : cmd = f'{cmd}\n'
 
-        t = Thread(target=_send_2_com, args=(str.encode(cmd),))
-        t.start()
+        self._get_writer(serial_conn).write(str.encode(cmd))
+
+    def _get_writer(self, serial_conn):
+        writer = self._writers.get(serial_conn.port)
+        if writer is None or writer.serial is not serial_conn or not writer.is_alive():
+            if writer: writer.stop()
+            writer = SerialWriter(serial_conn.port, serial_conn)
+            self._writers[serial_conn.port] = writer
+            writer.start()
+        return writer
+
+    def write_queue_depths(self):
+        return {port: writer.depth for port, writer in self._writers.items()}
 
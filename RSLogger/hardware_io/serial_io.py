@@ -0,0 +1,110 @@
+from queue import SimpleQueue, Empty
+from threading import Thread, Event
+from time import time
+
+from serial.serialutil import SerialException, SerialTimeoutException
+
+from RSLogger.utilities.message import parse_device_line
+from RSLogger.utilities import trace
+
+_READ = trace.register('SerialLineReader.read')
+_READER_STOPPED = trace.register('SerialLineReader.stopped')
+_WRITER_STOPPED = trace.register('SerialWriter.stopped')
+
+
+class SerialLineReader(Thread):
+    """
+    Dedicated reader for one open serial port. Blocks until the port is readable, bulk-reads everything that is
+    waiting, splits complete lines and hands each one to the deliver callback as a Message stamped with the time it
+    arrived.
+    """
+    def __init__(self, device, port, serial_conn, deliver_cb, debug=False):
+        super().__init__(name=f'{device}_{port}_reader', daemon=True)
+        self._debug = debug
+
+        self._device = device
+        self._port = port
+        self._serial = serial_conn
+        self._deliver_cb = deliver_cb
+
+        self._stop_event = Event()
+
+    def run(self):
+        buffer = bytearray()
+        try:
+            while not self._stop_event.is_set():
+                chunk = self._serial.read(1)  # Blocks until at least one byte arrives or the read is cancelled
+                if not chunk:
+                    continue
+                waiting = self._serial.in_waiting
+                if waiting:
+                    chunk += self._serial.read(waiting)
+                timestamp = time()
+                trace.event(_READ, len(chunk))
+
+                buffer += chunk
+                start = 0
+                while (end := buffer.find(b'\n', start)) != -1:
+                    self._deliver_cb(parse_device_line(self._device, self._port, buffer[start:end + 1], timestamp))
+                    start = end + 1
+                if start:
+                    del buffer[:start]
+        except (SerialException, OSError, TypeError) as e:
+            # Port closed or unplugged
+            trace.event(_READER_STOPPED, (self._port, e))
+
+    def stop(self):
+        self._stop_event.set()
+        try:
+            self._serial.cancel_read()
+        except (SerialException, OSError, AttributeError):
+            pass
+
+
+class SerialWriter(Thread):
+    """
+    Dedicated writer for one open serial port. Commands are queued in order; whatever has queued up while the previous
+    write was in progress goes out in a single write() call.
+    """
+    _STOP = None
+
+    def __init__(self, port, serial_conn, debug=False):
+        super().__init__(name=f'{port}_writer', daemon=True)
+        self._debug = debug
+
+        self.port = port
+        self.serial = serial_conn
+
+        self._q = SimpleQueue()
+
+    @property
+    def depth(self):
+        """ Number of commands waiting to be written. """
+        return self._q.qsize()
+
+    def write(self, data: bytes):
+        self._q.put(data)
+
+    def stop(self):
+        self._q.put(self._STOP)
+
+    def run(self):
+        while (data := self._q.get()) is not self._STOP:
+            batch = [data]
+            try:
+                while (data := self._q.get_nowait()) is not self._STOP:
+                    batch.append(data)
+            except Empty:
+                pass
+
+            try:
+                self.serial.write(b''.join(batch))
+            except SerialTimeoutException as e:
+                print(f'SerialWriter {self.port}: {e}')
+            except (SerialException, OSError, TypeError) as e:
+                # Port closed or unplugged
+                trace.event(_WRITER_STOPPED, (self.port, e))
+                return
+
+            if data is self._STOP:
+                return
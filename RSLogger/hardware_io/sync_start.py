@@ -0,0 +1,171 @@
+import asyncio
+from time import time
+
+from serial import Serial
+
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
+
+_START = trace.register('SyncStart.start')
+_REPORT = trace.register('SyncStart.report')
+
+
+class SyncStart:
+    """
+    Starts the trials of every connected device at one shared instant instead of one after the other.
+
+    The start instant is picked far enough ahead for the commands to reach every device. Wireless wDRT/wVOG units get
+    their synchronized clock set ('syn>') and are told to start at that instant on it ('sst>'); they report the clock
+    time they actually started at. Wired devices are sent their normal start command by the host at that instant.
+    Wireless units that answer 'nosync', or have not answered grace_s after the instant, are sent the normal start
+    command as a fallback. A wVOG without an experiment answers 'noexp' and is logged as failed.
+
+    A unit's clock is set to the host time the 'syn>' was sent at when it arrives, so it runs behind the host clock by
+    the one way delay of that command, which is somewhere between 0 and the round trip to its 'syn' reply. The
+    reported start is put on the host clock assuming half the round trip, give or take the other half plus the clock's
+    resolution and drift. That is the skew logged. Only device reported starts are measured: for wired devices and
+    fallbacks only the time the host sent the start command is known, and for units whose 'syn' reply never came the
+    reported time stays on their own clock. Those are logged without an actual start or skew and left out of the spread.
+
+    Once every device is accounted for, one line per device is written to sync_start.txt in the session folder.
+    """
+    LOG_FILE = 'sync_start.txt'
+    LOG_HEADER = ('Device ID, Method, Scheduled Start ms, Command Sent ms, Device Reported ms, Actual Start ms, '
+                  'Skew ms, Uncertainty ms, Session Spread ms, Spread Uncertainty ms')
+
+    # The device clock counts whole milliseconds off a crystal good to about 100 ppm
+    RESOLUTION_MS = 1
+    DRIFT_PPM = 100
+
+    def __init__(self, device_controllers, lead_s=0.3, per_remote_s=0.01, grace_s=0.5, debug=False):
+        self._debug = debug
+
+        self._controllers = device_controllers
+        self.lead_s = lead_s
+        self.per_remote_s = per_remote_s
+        self.grace_s = grace_s
+
+        self.file_path = ''
+
+        self._start_ms = None
+        self._expected = 0
+        self._pending = dict()
+        # (device type, port) -> host time the 'syn>' was sent, then (offset ms, uncertainty ms, set at ms)
+        self._syn_sent = dict()
+        self._offsets = dict()
+        self._results = dict()
+        self._finish_handle = None
+
+    def start(self, devices, tx=None):
+        """ Schedules a synchronized start for devices ({device type: {port: socket}}). Must run on the HWRoot loop. """
+        loop = asyncio.get_running_loop()
+        if self._finish_handle:
+            self._finish_handle.cancel()
+            self._finish()
+
+        sockets = [(dev, port, socket) for dev, ports in list(devices.items()) for port, socket in list(ports.items())
+                   if dev in self._controllers]
+        remotes = [s for s in sockets if not isinstance(s[2], Serial)]
+        start_s = time() + self.lead_s + self.per_remote_s * len(remotes)
+        self._start_ms = int(start_s * 1000)
+        self._expected = len(sockets)
+        self._pending = {(dev, port): socket for dev, port, socket in remotes}
+        self._syn_sent = dict()
+        self._offsets = dict()
+        self._results = dict()
+
+        trace.event(_START, (self._start_ms, len(sockets)))
+
+        for dev, port, socket in sockets:
+            controller = self._controllers[dev]
+            if isinstance(socket, Serial):
+                loop.call_later(start_s - time(), self._start_now, dev, port, socket, tx, 'host')
+            else:
+                # Read before the command is queued, so the round trip measured to the reply can only be longer
+                self._syn_sent[(dev, port)] = time()
+                controller.parse_command(socket, new_message(dev, port, 'set_clk'), tx)
+                controller.parse_command(socket, new_message(dev, port, 'sync_start', self._start_ms), tx)
+
+        self._finish_handle = loop.call_later(start_s - time() + self.grace_s, self._fallback, tx)
+
+    def report(self, msg: Message, tx=None):
+        """
+        Handles a device's 'syn' reply, which gives the round trip its clock was set over, and its 'sst' reply: the
+        clock time it started at, 'nosync' or 'noexp'. Runs on the HWRoot loop like start(); RemoteConnectionManager
+        hands XBee records over to it.
+        """
+        trace.event(_REPORT, msg)
+
+        if msg.key == 'syn':
+            sent = self._syn_sent.pop((msg.device, msg.port), None)
+            if sent is not None:
+                round_trip_ms = (msg.timestamp - sent) * 1000
+                self._offsets[(msg.device, msg.port)] = (-round_trip_ms / 2, round_trip_ms / 2, sent * 1000)
+            return
+
+        socket = self._pending.pop((msg.device, msg.port), None)
+        if socket is None:
+            return
+        try:
+            reported = int(msg.payload)
+        except ValueError:
+            if msg.payload == 'noexp':
+                # A wVOG without an experiment starts nothing, on its own clock or on the host's command
+                print(f"Synchronized start: {msg.device} {msg.port} has no experiment configured, not started")
+                self._results[(msg.device, msg.port)] = ('failed', None, None, None, None)
+            else:
+                # 'nosync' or garbled
+                self._start_now(msg.device, msg.port, socket, tx, 'fallback')
+        else:
+            actual = uncertainty = None
+            if (offset := self._offsets.get((msg.device, msg.port))) is not None:
+                offset_ms, offset_unc, set_ms = offset
+                actual = reported - offset_ms
+                uncertainty = offset_unc + self.RESOLUTION_MS + self.DRIFT_PPM * max(0, actual - set_ms) / 1e6
+            self._results[(msg.device, msg.port)] = ('device', None, reported, actual, uncertainty)
+
+        # Every device accounted for, no need to wait out the grace period
+        if len(self._results) == self._expected and self._finish_handle:
+            self._finish_handle.cancel()
+            self._finish()
+
+    def _start_now(self, dev, port, socket, tx, method):
+        self._controllers[dev].parse_command(socket, new_message(dev, port, 'start'), tx)
+        # When the command went out, not when the device started
+        self._results[(dev, port)] = (method, int(time() * 1000), None, None, None)
+
+    def _fallback(self, tx):
+        for (dev, port), socket in list(self._pending.items()):
+            self._start_now(dev, port, socket, tx, 'fallback')
+        self._pending.clear()
+        self._finish()
+
+    def _finish(self):
+        self._finish_handle = None
+        if not self._results:
+            return
+
+        measured = [(actual, unc) for _, _, _, actual, unc in self._results.values() if actual is not None]
+        spread = spread_unc = None
+        if measured:
+            spread = max(a for a, _ in measured) - min(a for a, _ in measured)
+            # Each end of the spread can be off by its own uncertainty
+            spread_unc = sum(sorted(u for _, u in measured)[-2:]) if len(measured) > 1 else 0
+        fallbacks = sum(1 for r in self._results.values() if r[0] == 'fallback')
+        failed = sum(1 for r in self._results.values() if r[0] == 'failed')
+        print(f"Synchronized start: {len(self._results)} devices, {len(measured)} measured, "
+              f"{len(self._results) - len(measured)} unmeasured, {fallbacks} fallback, {failed} failed, spread "
+              + (f"{spread:.1f} ms +/- {spread_unc:.1f} ms" if measured else "unknown"))
+
+        if self.file_path:
+            blank = lambda v: '' if v is None else f'{v:.1f}'
+            for (dev, port), (method, sent, reported, actual, unc) in sorted(self._results.items()):
+                unit_id = port if dev in port else f'{dev}_{port}'
+                skew = None if actual is None else actual - self._start_ms
+                get_log_writer().write(f"{self.file_path}/{self.LOG_FILE}",
+                                       f"{unit_id},{method},{self._start_ms},{'' if sent is None else sent},"
+                                       f"{'' if reported is None else reported},{blank(actual)},{blank(skew)},"
+                                       f"{blank(unc)},{blank(spread)},{blank(spread_unc)}",
+                                       self.LOG_HEADER)
+        self._results = dict()
@@ -1,9 +1,17 @@
 import asyncio
 import serial
-from serial.tools.list_ports_windows import comports
+from serial.tools.list_ports import comports
 from asyncio import get_running_loop
 from serial.serialutil import SerialException
-from time import time_ns, gmtime, time
+from time import gmtime, time
+
+from RSLogger.hardware_io.serial_io import SerialLineReader
+from RSLogger.utilities.message import new_message, parse_device_line
+from RSLogger.utilities import trace
+
+_POLLED = trace.register('UsbPortScanner.polled')
+_START_READER = trace.register('UsbPortScanner.start_reader')
+_STOP_READER = trace.register('UsbPortScanner.stop_reader')
 
 BAUD = 921600
 
@@ -11,6 +19,14 @@ BAUD = 921600
 class UsbPortScanner:
     """
     Class to scan USB ports and listen for messages from devices.
+
+    reader='event' (default) gives every open port its own blocking reader thread. reader='poll' keeps the original
+    loop that checks in_waiting on every port.
+
+    Lines from devices are parsed once into a Message and handed to received_cb; messages the scanner creates itself
+    (device lists for the UI, RTC and configuration requests) go to distribute_cb.
+
+    list_ports replaces serial's comports() for finding devices, e.g. with the simulator's pty backed ports.
     """
     DEVICE_IDS = {'sftDRT': {'pid': 0xF055,  'vid': 0x9800},
                   'sDRT'  : {'pid': 0x801E,  'vid': 0x239A},
@@ -18,44 +34,58 @@ class UsbPortScanner:
                   'sVOG'  : {'pid': 0x0483,  'vid': 0x16C0},
                   'wVOG'  : {'pid': 0x08AE,  'vid': 0xf057}}
 
-    def __init__(self, devices: dict, distribute_cb=None, debug=False):
+    def __init__(self, devices: dict, distribute_cb=None, received_cb=None, debug=False, reader='event',
+                 list_ports=None):
         self._rs_devices = devices
         if not distribute_cb:
-            self._distribute_cb = lambda a, b, c, d: print(f'No distribute callback: {a}, {b}, {c}, {d}')
+            self._distribute_cb = lambda m: print(f'No distribute callback: {m}')
         else:
             self._distribute_cb = distribute_cb
+        if not received_cb:
+            self._received_cb = lambda m: print(f'No received callback: {m}')
+        else:
+            self._received_cb = received_cb
 
         self._debug = debug
         self._new_ports = set()
         self._old_ports = set()
         self._all_com_devices = dict()
 
+        self._reader_mode = reader
+        self._list_ports = list_ports if list_ports else comports
+        self._readers = dict()
+        # Ports this scanner opened, of those listed by list_ports; other entries of devices are e.g. XBee nodes
+        self._opened = set()
+        self._loop = None
+
     async def run(self):
-        await asyncio.gather(self.scan_usb_ports(),
-                             self.usb_message_listener()
-                             )
+        self._loop = get_running_loop()
+        if self._reader_mode == 'poll':
+            await asyncio.gather(self.scan_usb_ports(),
+                                 self.usb_message_listener()
+                                 )
+        else:
+            await self.scan_usb_ports()
 
     async def usb_message_listener(self):
         await asyncio.sleep(1)
-        if self._debug: print(f"{time_ns()} UsbPortScanner._usb_message_listener")
         while True:
             try:
                 for rs_devices in self._rs_devices:
                     for each_com in self._rs_devices[rs_devices]:
-                        if 'COM' in each_com:
+                        if each_com in self._opened:
                             if self._rs_devices[rs_devices][each_com].in_waiting:
                                 msg = self._rs_devices[rs_devices][each_com].readline()
                                 timestamp = time()
-                                if self._debug: print(f"{time_ns()} UsbPortScanner._usb_message_listener {msg}")
+                                trace.event(_POLLED, msg)
 
-                                self._distribute_cb(rs_devices, each_com, msg, timestamp)
+                                self._received_cb(parse_device_line(rs_devices, each_com, msg, timestamp))
 
             except (SerialException, KeyError, RuntimeError) as e:
                 if self._debug: print(f'Exception usb_connect.UsbPortScanner.usb_message_listener: {e}')
             await asyncio.sleep(0.00001)
 
     async def scan_usb_ports(self):
-        if self._debug: print(f"{time_ns()} UsbPortScanner.scan_usb_ports")
         while True:
             try:
                 self._all_com_devices: serial.tools.list_ports_windows = await self._get_comports()
@@ -73,14 +103,14 @@ class UsbPortScanner:
                 pass
             await asyncio.sleep(.5)
 
+    @trace.span
     async def _get_comports(self):
-        if self._debug: print(f"{time_ns()} UsbPortScanner._get_comports")
         loop = get_running_loop()
-        return await loop.run_in_executor(None, comports)
+        return await loop.run_in_executor(None, self._list_ports)
 
+    @trace.span
     async def _add_devices(self, to_add):
         await asyncio.sleep(.5)
-        if self._debug: print(f"{time_ns()} UsbPortScanner._add_devices")
         for d in to_add:  # Cycle through newly connected devices
             for rs_devices in self.DEVICE_IDS:  # Cycle through our device ID's and look for a match
                 if self.DEVICE_IDS[rs_devices]['pid'] == d.pid and self.DEVICE_IDS[rs_devices]['vid'] == d.vid:  # If a new device is one of ours
@@ -90,17 +120,20 @@ class UsbPortScanner:
                         except SerialException as e:
                             print(f'Serial Exception in usb_connect: {e}')
                         else:
+                            self._opened.add(d.name)
+                            if self._reader_mode == 'event':
+                                self._start_reader(rs_devices, d.name)
                             self._set_device_rtc(rs_devices, d.name)
                             # Request device configuration after setting RTC
-                            self._distribute_cb(rs_devices, d.name, 'get_cfg', '')
+                            self._distribute_cb(new_message(rs_devices, d.name, 'get_cfg'))
                             try:
                                 devices = ','.join(self._rs_devices[rs_devices])
-                                self._distribute_cb(rs_devices, 'ui', 'devices', devices)
+                                self._distribute_cb(new_message(rs_devices, 'ui', 'devices', devices))
                             except KeyError:
                                 print("PORT ALREADY IN USE")
 
+    @trace.span
     def _remove_devices(self, to_remove):
-        if self._debug: print(f"{time_ns()} UsbPortScanner._remove_devices")
         ours_removed = dict()
         for d in to_remove:  # cycle through devices that need to be removed
             for rs_devices in self._rs_devices:  # Cycle through each device type (e.g., 'VOG', 'DRT', etc)
@@ -108,15 +141,35 @@ class UsbPortScanner:
                     if port == d.name: ours_removed.update({rs_devices: {port: d}})
         for rs_devices in ours_removed:
             for port in ours_removed[rs_devices]:
+                self._stop_reader(port)
+                self._opened.discard(port)
                 del self._rs_devices[rs_devices][port]
                 devices = ','.join(self._rs_devices[rs_devices])
-                self._distribute_cb(rs_devices, 'ui', 'devices', devices)
-
+                self._distribute_cb(new_message(rs_devices, 'ui', 'devices', devices))
+
+    def _start_reader(self, device, port):
+        trace.event(_START_READER, (device, port))
+        reader = SerialLineReader(device, port, self._rs_devices[device][port], self._deliver_threadsafe, self._debug)
+        self._readers[port] = reader
+        reader.start()
+
+    def _stop_reader(self, port):
+        trace.event(_STOP_READER, port)
+        if reader := self._readers.pop(port, None):
+            reader.stop()
+
+    def _deliver_threadsafe(self, msg):
+        # Called from a reader thread; hand the parsed line over to the asyncio loop that owns the controllers
+        try:
+            self._loop.call_soon_threadsafe(self._received_cb, msg)
+        except RuntimeError:
+            pass  # Loop closed during shutdown
+
+    @trace.span
     def _set_device_rtc(self, device, port):
-        if self._debug: print(f"{time_ns()} UsbPortScanner._set_device_rtc")
         tt = gmtime()
         val = f'{tt[0]},{tt[1]},{tt[2]},{tt[6]},{tt[3]},{tt[4]},{tt[5]},123'
-        self._distribute_cb(device, port, 'set_rtc', val)
+        self._distribute_cb(new_message(device, port, 'set_rtc', val))
 
 
 if __name__ == "__main__":
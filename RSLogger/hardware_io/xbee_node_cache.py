@@ -0,0 +1,78 @@
+import json
+import os
+from time import time
+
+
+class XBeeNodeCache:
+    """
+    Remote XBee nodes seen on earlier runs, kept in a small JSON file so they can be put back on the network as soon
+    as the dongle is opened instead of waiting for a discovery process.
+
+        {"0013A20041B2C3D4": {"node_id": "wDRT_1", "last_seen": 1700000000.0}, ...}
+
+    Nodes not seen for max_age_days are dropped when the file is loaded.
+    """
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.rslogger', 'xbee_nodes.json')
+
+    def __init__(self, path=None, max_age_days=30):
+        self.path = path or self.DEFAULT_PATH
+        self._max_age = max_age_days * 86400
+        self._nodes = dict()
+        self._changed = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                nodes = json.load(f)
+        except (OSError, ValueError):
+            nodes = dict()
+
+        cutoff = time() - self._max_age
+        self._nodes = {addr: node for addr, node in nodes.items()
+                       if isinstance(node, dict) and node.get('node_id') and node.get('last_seen', 0) >= cutoff}
+        self._changed = len(self._nodes) != len(nodes)
+
+    def save(self):
+        """ Writes the table if it changed. The file is replaced in one step so a crash never leaves half of it. """
+        if not self._changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._nodes, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._changed = False
+        except OSError as e:
+            print(f"Error when saving XBee node cache {self.path}: {e}")
+
+    def nodes(self):
+        """ Returns [(64-bit address hex, node id), ...], most recently seen first. """
+        return [(addr, node['node_id'])
+                for addr, node in sorted(self._nodes.items(), key=lambda n: -n[1]['last_seen'])]
+
+    def seen(self, addr64, node_id=None, now=None):
+        """ Records that addr64 was heard from. node_id is only needed the first time or when it changes. """
+        node = self._nodes.get(addr64)
+        if node is None:
+            if not node_id:
+                return
+            node = self._nodes[addr64] = {'node_id': node_id, 'last_seen': 0}
+            self._changed = True
+        elif node_id and node['node_id'] != node_id:
+            node['node_id'] = node_id
+            self._changed = True
+
+        now = now or time()
+        # Only a change worth keeping marks the table dirty, not every message
+        if now - node['last_seen'] > 60:
+            self._changed = True
+        node['last_seen'] = now
+
+    def forget(self, addr64):
+        if self._nodes.pop(addr64, None):
+            self._changed = True
+
+    def __len__(self):
+        return len(self._nodes)
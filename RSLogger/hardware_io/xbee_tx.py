@@ -0,0 +1,185 @@
+from collections import deque
+from queue import SimpleQueue, Empty
+from threading import Thread, Lock
+from time import perf_counter
+
+from digi.xbee.devices import XBeeDevice
+from digi.xbee.exception import XBeeException
+from digi.xbee.models.address import XBee16BitAddress, XBee64BitAddress
+from digi.xbee.models.options import TransmitOptions
+from digi.xbee.models.protocol import XBeeProtocol
+from digi.xbee.models.status import TransmitStatus
+from digi.xbee.packets.aft import ApiFrameType
+from digi.xbee.packets.common import TransmitPacket
+from digi.xbee.packets.raw import TX64Packet
+
+from RSLogger.utilities import trace
+
+_SENT = trace.register('XBeeTransmitter.sent')
+_RETRY = trace.register('XBeeTransmitter.retry')
+
+
+class XBeeTransmitter(Thread):
+    """
+    Sends data to remote XBees without waiting for each transmit status.
+
+    send() only queues the data. This thread writes up to max_in_flight frames to the dongle back to back, each with
+    its own frame ID, and matches the transmit status frames the dongle returns against them. A frame that fails or
+    gets no status within status_timeout seconds is sent again, up to retries times. Only one frame per remote is in
+    flight at a time, so commands reach each device in the order they were sent. Fanning a command out to N devices
+    therefore takes about one radio round trip instead of N.
+    """
+    _STATUS_FRAMES = (ApiFrameType.TX_STATUS, ApiFrameType.TRANSMIT_STATUS)
+
+    def __init__(self, xcvr: XBeeDevice, retries=2, status_timeout=1.0, max_in_flight=16, debug=False):
+        super().__init__(name='xbee_tx', daemon=True)
+        self._debug = debug
+
+        self.xcvr = xcvr
+        self.retries = retries
+        self.status_timeout = status_timeout
+        self.max_in_flight = max_in_flight
+
+        self._q = SimpleQueue()
+        self._waiting = deque()
+        self._in_flight = dict()
+
+        self._raw_802 = xcvr.get_protocol() == XBeeProtocol.RAW_802_15_4
+
+        # Counters
+        self._stats_lock = Lock()
+        self._sent = 0
+        self._acked = 0
+        self._retried = 0
+        self._failed = 0
+        self._last_ack_ms = 0.0
+
+        self.xcvr.add_packet_received_callback(self._packet_received)
+
+    ####################################################################################################################
+    # Called from any thread
+
+    def send(self, remote, data):
+        """
+        Queues data (str or bytes) for the remote XBee and returns straight away. data can also be a callable that
+        returns it, called each time the frame is written so e.g. a timestamp is taken as late as possible.
+        """
+        self._q.put(('send', remote, data))
+
+    def stop(self):
+        self._q.put(('stop',))
+        try:
+            self.xcvr.del_packet_received_callback(self._packet_received)
+        except (ValueError, AttributeError):
+            pass
+
+    def stats(self):
+        with self._stats_lock:
+            return {'sent': self._sent,
+                    'acked': self._acked,
+                    'retried': self._retried,
+                    'failed': self._failed,
+                    'in_flight': len(self._in_flight),
+                    'queued': self._q.qsize() + len(self._waiting),
+                    'last_ack_ms': self._last_ack_ms}
+
+    def _packet_received(self, packet):
+        # Digi reader thread, hand the status over to the transmit thread
+        if packet.get_frame_type() in self._STATUS_FRAMES:
+            self._q.put(('status', packet.frame_id, packet.transmit_status))
+
+    ####################################################################################################################
+    # Transmit thread
+
+    def run(self):
+        while True:
+            timeout = None
+            if self._in_flight:
+                timeout = max(0.0, min(f[3] for f in self._in_flight.values()) - perf_counter())
+            try:
+                item = self._q.get(timeout=timeout)
+                if item[0] == 'stop':
+                    return
+                self._handle(item)
+                while True:
+                    item = self._q.get_nowait()
+                    if item[0] == 'stop':
+                        return
+                    self._handle(item)
+            except Empty:
+                pass
+
+            self._expire()
+            self._dispatch()
+
+    def _handle(self, item):
+        if item[0] == 'send':
+            self._waiting.append((item[1], item[2], 0, perf_counter()))
+        elif item[0] == 'status':
+            _, frame_id, status = item
+            if frame := self._in_flight.pop(frame_id, None):
+                if status == TransmitStatus.SUCCESS:
+                    with self._stats_lock:
+                        self._acked += 1
+                        self._last_ack_ms = (perf_counter() - frame[4]) * 1000
+                else:
+                    self._retry(frame, status)
+
+    def _dispatch(self):
+        busy = {id(frame[0]) for frame in self._in_flight.values()}
+        deferred = deque()
+        while self._waiting and len(self._in_flight) < self.max_in_flight:
+            item = self._waiting.popleft()
+            if id(item[0]) in busy:
+                deferred.append(item)
+            else:
+                busy.add(id(item[0]))
+                self._transmit(*item)
+        deferred.extend(self._waiting)
+        self._waiting = deferred
+
+    @trace.span
+    def _transmit(self, remote, data, attempt, t_queued):
+        addr = remote.get_64bit_addr()
+        frame_id = self.xcvr.get_next_frame_id()
+        payload = data() if callable(data) else data
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8', errors='ignore')
+        try:
+            if addr is None or not XBee64BitAddress.is_known_node_addr(addr):
+                # No 64-bit address to build our own frame, fall back to the library without status tracking
+                self.xcvr.send_data_async(remote, payload)
+                return
+            if self._raw_802:
+                packet = TX64Packet(frame_id, addr, TransmitOptions.NONE.value, rf_data=bytearray(payload))
+            else:
+                packet = TransmitPacket(frame_id, addr, XBee16BitAddress.UNKNOWN_ADDRESS, 0,
+                                        TransmitOptions.NONE.value, rf_data=bytearray(payload))
+            self.xcvr.send_packet(packet)
+        except XBeeException as e:
+            print(f"XBee transmit error: {e} with {payload} to {remote}")
+            with self._stats_lock:
+                self._failed += 1
+            return
+
+        self._in_flight[frame_id] = (remote, data, attempt, perf_counter() + self.status_timeout, t_queued)
+        with self._stats_lock:
+            self._sent += 1
+        trace.event(_SENT, (frame_id, payload, attempt))
+
+    def _expire(self):
+        now = perf_counter()
+        for frame_id in [f_id for f_id, f in self._in_flight.items() if f[3] <= now]:
+            self._retry(self._in_flight.pop(frame_id), 'no transmit status')
+
+    def _retry(self, frame, reason):
+        remote, data, attempt, _, t_queued = frame
+        if attempt < self.retries:
+            trace.event(_RETRY, (data, reason))
+            self._waiting.appendleft((remote, data, attempt + 1, t_queued))
+            with self._stats_lock:
+                self._retried += 1
+        else:
+            print(f" {reason} with {data} to {remote}, giving up after {attempt + 1} attempts")
+            with self._stats_lock:
+                self._failed += 1
@@ -0,0 +1,82 @@
+from multiprocessing import Process, Pipe
+
+from RSLogger.utilities import metrics
+
+
+class HeadlessCameras:
+    """
+    Records USB cameras without showing them. Every camera runs in a CamViewer process of its own, as it does for the
+    main window's camera widget, but its window is never opened.
+
+    cameras is a list of camera numbers, or of dicts with 'id' and optionally 'fps' (default 10) and 'res'
+    ('Low', 'Medium', 'High' or 'HD', default 'Low').
+    """
+    # Frame counts are counters in the camera process, here they are gauges holding its latest report
+    _METRICS = ('camera_frames_written', 'camera_frames_repeated', 'camera_frames_dropped', 'camera_fps')
+
+    def __init__(self, cameras, debug=False):
+        self._debug = debug
+
+        self._settings = dict()
+        for cam in cameras:
+            cam = cam if isinstance(cam, dict) else {'id': cam}
+            self._settings[f"CAMERA:{cam['id']}"] = {'fps': str(cam.get('fps', 10)), 'res': cam.get('res', 'Low')}
+
+        self._pipes = dict()
+        self._processes = dict()
+
+    def start(self):
+        # Only sessions with cameras need OpenCV
+        from RSLogger.user_interface.Logger.usb_cameras import cam_win
+
+        for cam_id, settings in self._settings.items():
+            cam = cam_id.split(':')[1]
+            self._pipes[cam_id], child_pipe = Pipe()
+            self._processes[cam_id] = Process(target=cam_win.CamViewer, args=(cam_id, child_pipe),
+                                              name=f'camera_{cam}', daemon=True)
+            self._processes[cam_id].start()
+            self._send(cam_id, f"{cam}-FPS>{settings['fps']}")
+            self._send(cam_id, f"{cam}-RES>{settings['res']}")
+
+    def set_file_path(self, file_path):
+        for cam_id in self._pipes:
+            self._send(cam_id, f"FNM>{file_path}")
+
+    def record(self, on: bool):
+        for cam_id in self._pipes:
+            self._send(cam_id, f"RCD>{1 if on else 0}")
+
+    def stop(self):
+        for cam_id in list(self._pipes):
+            self._send(cam_id, "USE>0")
+        for cam_id, process in self._processes.items():
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+            for name in self._METRICS:
+                metrics.remove(name, camera=cam_id)
+        self._pipes.clear()
+        self._processes.clear()
+
+    def poll(self):
+        """ Handles the frame counts the camera processes report. Returns the cameras that have stopped. """
+        stopped = list()
+        for cam_id, pipe in list(self._pipes.items()):
+            try:
+                while pipe.poll():
+                    msg: str = pipe.recv()
+                    cam, cmd = msg.split('-', 1)
+                    cmd, val = cmd.split(':')
+                    if cmd == 'MET':
+                        for name, value in zip(self._METRICS, val.split(',')):
+                            metrics.gauge(name, camera=cam).set(int(value))
+            except (BrokenPipeError, EOFError, OSError):
+                stopped.append(cam_id)
+                self._pipes.pop(cam_id)
+        return stopped
+
+    def _send(self, cam_id, msg):
+        try:
+            self._pipes[cam_id].send(msg)
+        except (BrokenPipeError, OSError):
+            print(f"Camera {cam_id} has stopped")
@@ -0,0 +1,335 @@
+"""
+Headless recording: HWRoot, the log writer and optionally cameras, without Tk, plots or the camera widget.
+
+A session is driven by a script of commands, one per line or separated by ';', given with --script, in a JSON
+config file or typed on stdin:
+
+    folder <path>           session folder for the following init (also --folder)
+    devices <n> [seconds]   wait until n devices are connected, for at most seconds (default 30)
+    init                    initialize the log
+    label <text>            label of the following trials
+    record                  start recording, initializing the log first if needed
+    pause                   pause recording; files are flushed to disk
+    note <text>             add a note to notes.txt
+    wait [seconds]          do nothing for seconds, or until Ctrl+C
+    close                   close the log; files are flushed and closed
+    quit                    close the log if it is open and exit
+
+A config file holds the same options as the command line:
+
+    {"folder": "/data/p01", "cameras": [0, {"id": 1, "fps": 30, "res": "High"}], "metrics": "9464",
+     "binary_logs": false, "script": ["devices 4", "init", "label baseline", "record", "wait 600", "close"]}
+
+When the script ends, or on Ctrl+C, an open log is closed before exiting.
+
+Run from the repository root:
+    python -m RSLogger.headless.session --folder /data/p01 --script "devices 2; init; record; wait 600; close"
+    python main.py --headless --config session.json
+"""
+import argparse
+import json
+import os
+import shlex
+import sys
+import threading
+from time import time, perf_counter, sleep
+
+from RSLogger.hardware_io.hi_controller import HWRoot
+from RSLogger.headless.cameras import HeadlessCameras
+from RSLogger.utilities import metrics, trace
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+_UNHANDLED = trace.register('HeadlessSession.unhandled')
+
+
+class HeadlessSession:
+    """
+    Stands in for UIController: sends the same control messages to HWRoot and writes the same controls, notes and
+    session files, and handles the messages HWRoot sends the UI on a thread of its own.
+    """
+    def __init__(self, queues, cameras=(), verbose=True, debug=False):
+        self._debug = debug
+        self._verbose = verbose
+
+        self._q_2_ui: WakeupQueue = queues['q_2_ui']
+        self._q_2_hi: WakeupQueue = queues['q_2_hi']
+
+        self.devices = dict()
+        self._xbee_status = 'disconnected'
+        self._devices_changed = threading.Condition()
+
+        self._file_path = None
+        self.log_running = False
+        self.record_running = False
+
+        self._cameras = HeadlessCameras(cameras, debug=debug) if cameras else None
+
+        # Messages from the hardware thread wake the listener instead of it polling the queue
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._listener = threading.Thread(target=self._q_2_ui_messages_listener, name='ui_listener', daemon=True)
+
+    def start(self):
+        self._q_2_ui.set_waker(self._wakeup.set)
+        self._listener.start()
+        if self._cameras:
+            self._cameras.start()
+
+    def stop(self):
+        if self.log_running:
+            self.close()
+        if self._cameras:
+            self._cameras.stop()
+        self._closing = True
+        self._wakeup.set()
+        self._listener.join(2)
+
+    ####################################################################################################################
+    # Controls
+
+    def set_folder(self, folder):
+        if self.log_running:
+            raise RuntimeError("Close the log before changing the session folder")
+        folder = os.path.abspath(folder)
+        os.makedirs(folder, exist_ok=True)
+        if os.listdir(folder):
+            self._print(f"{folder} is not empty, log files will be appended to and videos overwritten")
+
+        self._file_path = folder
+        self._q_2_hi.put(new_message('all', 'all', 'fpath', folder))
+        get_log_writer().open_session(folder)
+        if self._cameras:
+            self._cameras.set_file_path(folder)
+
+    def init(self):
+        if self.log_running:
+            return
+        if not self._file_path:
+            raise RuntimeError("Choose a session folder before initializing the log")
+
+        self.log_running = True
+        self._log_controls('initialize', time())
+        self._q_2_hi.put(new_message('all', 'all', 'init'))
+        if self._cameras:
+            self._cameras.set_file_path(self._file_path)
+            self._cameras.record(True)
+
+    def label(self, text):
+        self._q_2_hi.put(new_message('all', 'all', 'cond', text))
+
+    def record(self):
+        if not self.log_running:
+            self.init()
+        if self.record_running:
+            return
+
+        self.record_running = True
+        self._log_controls('record', time())
+        self._q_2_hi.put(new_message('all', 'all', 'start'))
+
+    def pause(self):
+        if not self.record_running:
+            return
+
+        self.record_running = False
+        self._log_controls('pause', time())
+        self._q_2_hi.put(new_message('all', 'all', 'stop'))
+        get_log_writer().flush()
+
+    def note(self, text):
+        if not self._file_path:
+            raise RuntimeError("Choose a session folder before adding notes")
+        get_log_writer().write(f"{self._file_path}/notes.txt", f"Note,{text},{time()}")
+
+    def close(self):
+        if not self.log_running:
+            return
+        if self.record_running:
+            self.pause()
+
+        self.log_running = False
+        self._log_controls('close', time())
+        self._q_2_hi.put(new_message('all', 'all', 'close'))
+        if self._cameras:
+            self._cameras.record(False)
+        get_log_writer().close_all(wait=True)
+
+    def wait_for_devices(self, n, timeout=30.0) -> bool:
+        """ Waits until at least n devices are connected. """
+        with self._devices_changed:
+            return self._devices_changed.wait_for(lambda: self.n_devices >= n, timeout)
+
+    @property
+    def n_devices(self):
+        return sum(len(units) for units in self.devices.values())
+
+    def _log_controls(self, state, timestamp):
+        get_log_writer().write(f"{self._file_path}/controls.txt", f"control,{state},{timestamp}")
+
+    ####################################################################################################################
+    # Messages from HWRoot
+
+    def _q_2_ui_messages_listener(self):
+        while not self._closing:
+            self._wakeup.wait(1.0)
+            self._wakeup.clear()
+            for msg in self._q_2_ui.drain():
+                self._handle_message(msg)
+            if self._cameras:
+                for cam_id in self._cameras.poll():
+                    self._print(f"Camera {cam_id} has stopped")
+
+    def _handle_message(self, msg: Message):
+        if msg.device == 'xbee' and msg.key == 'conn_status':
+            # Repeated while the dongle is left alone, only changes are worth printing
+            if msg.payload != self._xbee_status:
+                self._xbee_status = msg.payload
+                self._print(f"Wireless dongle {msg.payload.replace('|', ' on ')}")
+        elif msg.device == 'xbee' and msg.key == 'ready':
+            n_devices, ms, source = msg.payload.split('|')
+            self._print(f"{n_devices} wireless devices ready in {int(ms) / 1000:.2f} s ({source})")
+        elif msg.key == 'devices':
+            self._update_devices(msg.device, msg.payload)
+        else:
+            trace.event(_UNHANDLED, msg)
+
+    def _update_devices(self, device, payload):
+        units = set(payload.split(',')) if payload else set()
+        known = self.devices.get(device, set())
+
+        for id_ in sorted(units - known):
+            self._print(f"{device} {id_} connected")
+            # Like the device tabs, stop a newly connected unit so it starts out idle
+            if device == 'sDRT':
+                self._q_2_hi.put(new_message('sDRT', 'all', 'stop', '1'))
+            elif device == 'sVOG':
+                self._q_2_hi.put(new_message('sVOG', 'all', 'stop'))
+            elif device == 'wDRT':
+                self._q_2_hi.put(new_message('wDRT', id_, 'stop'))
+        for id_ in sorted(known - units):
+            self._print(f"{device} {id_} disconnected")
+
+        with self._devices_changed:
+            self.devices[device] = units
+            self._devices_changed.notify_all()
+
+    def _print(self, text):
+        if self._verbose:
+            print(text, flush=True)
+
+    ####################################################################################################################
+    # Scripts
+
+    def run_script(self, commands):
+        """ Runs commands in order. Returns False once a quit command has run. """
+        for command in commands:
+            if not self.run_command(command):
+                return False
+        return True
+
+    def run_command(self, command) -> bool:
+        words = shlex.split(command)
+        if not words:
+            return True
+        cmd, args = words[0].lower(), words[1:]
+        text = command.strip()[len(words[0]):].strip()
+        self._print(f"> {command.strip()}")
+
+        if cmd == 'folder':
+            self.set_folder(text)
+        elif cmd == 'devices':
+            n = int(args[0]) if args else 1
+            timeout = float(args[1]) if len(args) > 1 else 30.0
+            t_0 = perf_counter()
+            if self.wait_for_devices(n, timeout):
+                self._print(f"{self.n_devices} devices connected after {perf_counter() - t_0:.1f} s")
+            else:
+                self._print(f"Only {self.n_devices} of {n} devices connected after {timeout:.0f} s, continuing")
+        elif cmd == 'init':
+            self.init()
+        elif cmd == 'label':
+            self.label(text)
+        elif cmd == 'record':
+            self.record()
+        elif cmd == 'pause':
+            self.pause()
+        elif cmd == 'note':
+            self.note(text)
+        elif cmd == 'wait':
+            if args:
+                sleep(float(args[0]))
+            else:
+                threading.Event().wait()
+        elif cmd == 'close':
+            self.close()
+        elif cmd in ('quit', 'exit'):
+            return False
+        else:
+            raise ValueError(f"Unknown command: {command.strip()}")
+        return True
+
+
+def _split_script(script):
+    if isinstance(script, str):
+        return [line.strip() for line in script.replace(';', '\n').splitlines() if line.strip()]
+    return list(script)
+
+
+def main(argv=None, queues=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', help='JSON file with any of the options below')
+    parser.add_argument('--folder', help='Session folder')
+    parser.add_argument('--script', help="Commands separated by ';', otherwise they are read from stdin")
+    parser.add_argument('--camera', type=int, action='append', dest='cameras', help='Record this camera number')
+    parser.add_argument('--metrics', metavar='ADDRESS', help='Serve runtime metrics on this [host:]port or socket')
+    parser.add_argument('--binary-logs', action='store_true', default=None,
+                        help='Also write device trial data to binary .rsb session files')
+    parser.add_argument('--trace', metavar='PATH', help='Trace the session and write the Chrome trace to this file')
+    parser.add_argument('--quiet', action='store_true', help='Do not print device and session events')
+    args = parser.parse_args(argv)
+
+    config = dict()
+    if args.config:
+        with open(args.config) as infile:
+            config = json.load(infile)
+    options = {key: getattr(args, key) if getattr(args, key) is not None else config.get(key)
+               for key in ('folder', 'script', 'cameras', 'metrics', 'binary_logs', 'trace')}
+
+    if options['binary_logs']:
+        get_log_writer().binary = True
+    if options['metrics']:
+        print(f"Metrics served on {metrics.serve(options['metrics']).server_address}")
+    if options['trace']:
+        trace.enable()
+
+    queues = queues or {'q_2_hi': WakeupQueue(), 'q_2_ui': WakeupQueue()}
+    session = HeadlessSession(queues, cameras=options['cameras'] or (), verbose=not args.quiet)
+    session.start()
+
+    # Controller Thread - This is a newly spawned thread where an asyncio loop is used
+    threading.Thread(target=HWRoot, args=(queues, ), name='hw_root', daemon=True).start()
+
+    try:
+        if options['folder']:
+            session.set_folder(options['folder'])
+        if options['script']:
+            session.run_script(_split_script(options['script']))
+        else:
+            for line in sys.stdin:
+                try:
+                    if not session.run_command(line):
+                        break
+                except (RuntimeError, ValueError) as e:
+                    print(e)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.stop()
+        if options['trace']:
+            print(f"{trace.dump(options['trace'])} trace events written to {options['trace']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+import asyncio
+from random import Random
+from time import time, monotonic
+from typing import NamedTuple
+
+from RSLogger.utilities import trace
+
+_RECEIVED = trace.register('SimulatedDevice.receive')
+
+
+class Faults(NamedTuple):
+    """ Chances, per line a simulated device sends, of each fault. """
+    drop: float = 0.0       # the line never arrives
+    corrupt: float = 0.0    # one character is garbled; serial only, XBee frames that fail their checksum are dropped
+    duplicate: float = 0.0  # the line arrives twice
+
+
+class SimulatedDevice:
+    """
+    Base for the simulated devices. Speaks a device's line protocol through write, a callable taking the bytes of one
+    line, which the transport (a pty or the simulated XBee) sets with attach(). Lines from the host are handed to
+    receive().
+
+    Every simulated device runs on the simulator's asyncio loop. speed divides every delay, so speed=10 runs trials ten
+    times as fast. jitter_ms delays each line by up to that many ms without reordering them. rt_ms is the range of
+    reaction times and miss the chance of no response in a trial.
+    """
+    DEVICE = ''
+    SEPARATOR = '>'
+
+    def __init__(self, name, seed=None, speed=1.0, jitter_ms=0.0, faults=Faults(), rt_ms=(250, 900), miss=0.1,
+                 debug=False):
+        self._debug = debug
+
+        self.name = name
+        self.speed = speed
+        self.jitter_ms = jitter_ms
+        self.faults = faults
+        self.rt_ms = rt_ms
+        self.miss = miss
+
+        self._rng = Random(seed)
+        self._write = None
+        self._loop = None
+        self._next_out = 0.0
+        self._tasks = set()
+
+        self.stats = {'lines_in': 0, 'lines_out': 0, 'dropped': 0, 'corrupted': 0, 'duplicated': 0}
+
+    def attach(self, loop, write, corrupt=True):
+        self._loop = loop
+        self._write = write
+        if not corrupt:
+            self.faults = self.faults._replace(corrupt=0.0)
+
+    ####################################################################################################################
+    # Host to device
+
+    def receive(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        self.stats['lines_in'] += 1
+        trace.event(_RECEIVED, (self.name, line))
+
+        key, _, val = line.partition(self.SEPARATOR)
+        self.command(key, val)
+
+    def command(self, key, val):
+        pass
+
+    ####################################################################################################################
+    # Device to host
+
+    def send(self, line: str):
+        if self._write is None:
+            return
+        if self._rng.random() < self.faults.drop:
+            self.stats['dropped'] += 1
+            return
+        if self._rng.random() < self.faults.corrupt and line:
+            i = self._rng.randrange(len(line))
+            line = f'{line[:i]}?{line[i + 1:]}'
+            self.stats['corrupted'] += 1
+        copies = 1
+        if self._rng.random() < self.faults.duplicate:
+            copies = 2
+            self.stats['duplicated'] += 1
+
+        data = f'{line}\n'.encode()
+        for _ in range(copies):
+            self.stats['lines_out'] += 1
+            if self.jitter_ms:
+                # Later lines never overtake earlier ones
+                self._next_out = max(self._next_out, monotonic()) + self._rng.uniform(0, self.jitter_ms) / 1000
+                self._loop.call_at(self._loop.time() + self._next_out - monotonic(), self._write, data)
+            else:
+                self._write(data)
+
+    ####################################################################################################################
+    # Helpers
+
+    async def _sleep_ms(self, ms):
+        await asyncio.sleep(ms / 1000 / self.speed)
+
+    def _start(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _isi_ms(self, low, high):
+        return self._rng.randrange(int(low), int(high))
+
+    def _response_ms(self):
+        """ Reaction time of this trial's response, or None for a miss. """
+        if self._rng.random() < self.miss:
+            return None
+        return self._rng.randrange(*self.rt_ms)
+
+    def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+class SimulatedSDRT(SimulatedDevice):
+    """ Wired sDRT: 'exp_start' / 'exp_stop', 'stim_on' / 'stim_off', 'get_<setting>' and 'set_<setting> value'. """
+    DEVICE = 'sDRT'
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.cfg = {'lowerISI': 3000, 'upperISI': 5000, 'stimDur': 1000, 'intensity': 255}
+        self._exp = None
+
+    def receive(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        self.stats['lines_in'] += 1
+        key, _, val = line.partition(' ')
+        self.command(key, val)
+
+    def command(self, key, val):
+        if key == 'get_config':
+            self.send(f"cfg>name:sDRT,buildDate:2/23/2022,version:1.2,"
+                      f"{','.join(f'{k}:{v}' for k, v in self.cfg.items())}")
+        elif key.startswith('get_') and key[4:] in self.cfg:
+            self.send(f'cfg>{key}:{self.cfg[key[4:]]}')
+        elif key.startswith('set_') and key[4:] in self.cfg:
+            self.cfg[key[4:]] = int(val)
+            self.send(f'cfg>{key[4:]}:{val}')
+        elif key == 'exp_start':
+            if self._exp is None or self._exp.done():
+                self._exp = self._start(self._experiment())
+        elif key == 'exp_stop':
+            if self._exp:
+                self._exp.cancel()
+            self.send('stm>0')
+            self.send('end>')
+        elif key == 'stim_on':
+            self.send('stm>1')
+        elif key == 'stim_off':
+            self.send('stm>0')
+
+    async def _experiment(self):
+        start = monotonic()
+        await self._sleep_ms(4000)
+        trial = 0
+        while True:
+            trial += 1
+            trial_ms = int((monotonic() - start) * 1000 * self.speed)
+            self.send('end>')
+            self.send('stm>1')
+
+            isi = self._isi_ms(self.cfg['lowerISI'], self.cfg['upperISI'])
+            rt = self._response_ms()
+            if rt is not None and rt < isi:
+                await self._sleep_ms(rt)
+                self.send('stm>0')
+                self.send(f'trl>{trial_ms},{trial},{rt}')
+                self.send('clk>1')
+                await self._sleep_ms(isi - rt)
+            else:
+                await self._sleep_ms(self.cfg['stimDur'])
+                self.send('stm>0')
+                await self._sleep_ms(isi - self.cfg['stimDur'])
+                self.send(f'trl>{trial_ms},{trial},-1')
+
+
+class SimulatedSVOG(SimulatedDevice):
+    """ Wired sVOG: commands are '>key|value<<', answers 'key|value'. """
+    DEVICE = 'sVOG'
+    SEPARATOR = '|'
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.cfg = {'Name': 'NHTSA', 'MaxOpen': 1500, 'MaxClose': 1500, 'Debounce': 20, 'ClickMode': 1,
+                    'ButtonControl': 0}
+        self._exp_running = False
+        self._trial = None
+        self._trial_n = 0
+        self._open_ms = self._closed_ms = 0
+        self._lens_open, self._since = False, monotonic()
+
+    def receive(self, line: str):
+        line = line.strip()
+        if line.startswith('>') and line.endswith('<<'):
+            super().receive(line[1:-2])
+
+    def command(self, key, val):
+        if key == 'do_expStart':
+            self._exp_running = True
+            self._trial_n = 0
+            self.send('expStart')
+        elif key == 'do_expStop':
+            self._exp_running = False
+            self.send('expStop')
+        elif key == 'do_trialStart':
+            if self._exp_running and not (self._trial and not self._trial.done()):
+                self._trial_n += 1
+                self._trial = self._start(self._cycle())
+        elif key == 'do_trialStop':
+            if self._trial and not self._trial.done():
+                self._trial.cancel()
+                self._trial.add_done_callback(lambda t: self._report())
+        elif key == 'do_peekOpen':
+            self.send('stm|1')
+        elif key == 'do_peekClose':
+            self.send('stm|0')
+        elif key == 'get_deviceVer':
+            self.send('deviceVer|2.2')
+        elif key.startswith('get_config') and key[10:] in self.cfg:
+            self.send(f'config{key[10:]}|{self.cfg[key[10:]]}')
+        elif key.startswith('set_config') and key[10:] in self.cfg:
+            self.cfg[key[10:]] = val
+            self.send(f'config{key[10:]}|{val}')
+
+    async def _cycle(self):
+        self._open_ms = self._closed_ms = 0
+        self.send('stm|0')
+        self.send('stm|1')
+        self.send('trialStart')
+        while True:
+            self._lens_open, self._since = True, monotonic()
+            await self._sleep_ms(int(self.cfg['MaxOpen']))
+            self._open_ms += int(self.cfg['MaxOpen'])
+            self.send('stm|0')
+            self._lens_open, self._since = False, monotonic()
+            await self._sleep_ms(int(self.cfg['MaxClose']))
+            self._closed_ms += int(self.cfg['MaxClose'])
+            self.send('stm|1')
+
+    def _report(self):
+        partial = int((monotonic() - self._since) * 1000 * self.speed)
+        if self._lens_open:
+            self._open_ms += partial
+            self.send('stm|0')
+        else:
+            self._closed_ms += partial
+        self.send(f'data|{self._trial_n},{self._open_ms},{self._closed_ms}')
+
+
+class _SimulatedWirelessDevice(SimulatedDevice):
+    """
+    Commands the wDRT and wVOG firmware share: battery, RTC, clock synchronization ('syn', 'sst', 'tsq') and resending
+    numbered data records ('rtx'). Data records get the battery, the device time and '#seq' appended like the
+    firmware's broadcast.
+    """
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.battery = self._rng.randrange(40, 100)
+        self._seq = 0
+        self._sent = [None] * 64
+        self._clock_offset_ms = None
+
+    def command(self, key, val):
+        if key in ('get_bat', 'bat'):
+            self.send(f'bty>{self.battery}')
+        elif key == 'syn':
+            self._clock_offset_ms = int(val) - time() * 1000
+            self.send(f'syn>{int(val)}')
+        elif key == 'sst':
+            if self._clock_offset_ms is None:
+                self.send('sst>nosync')
+            else:
+                self._start(self._synchronized_start(int(val)))
+        elif key == 'tsq':
+            now = int(time() * 1000)
+            self.send(f'tsr>{val},{now},{now}')
+        elif key == 'rtx':
+            for seq in map(int, filter(None, val.split(','))):
+                sent = self._sent[seq % len(self._sent)]
+                if sent and sent[0] == seq:
+                    self.send(sent[1])
+
+    async def _synchronized_start(self, start_ms):
+        await asyncio.sleep(max(0.0, (start_ms - self._clock_offset_ms) / 1000 - time()))
+        self.command('trl', '1')
+        self.send(f'sst>{int(time() * 1000 + self._clock_offset_ms)}')
+
+    def send_record(self, record):
+        self._seq += 1
+        line = f'dta>{record},{self.battery},{int(time())}#{self._seq}'
+        self._sent[self._seq % len(self._sent)] = (self._seq, line)
+        self.send(line)
+
+
+class SimulatedWDRT(_SimulatedWirelessDevice):
+    """ wDRT: 'trl>1' / 'trl>0', 'dev>1|0|iso', 'get_cfg>', 'set>KEY:value,...'. """
+    DEVICE = 'wDRT'
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.cfg = {'ONTM': 1000, 'DBNC': 100, 'ISIH': 5000, 'ISIL': 3000, 'SPCT': 100}
+        self._trials = None
+
+    def command(self, key, val):
+        if key == 'trl':
+            if self._trials:
+                self._trials.cancel()
+                self._trials = None
+            if val == '1':
+                self._trials = self._start(self._run_trials())
+            else:
+                self.send('stm>0')
+        elif key == 'dev':
+            if val == 'iso':
+                self.cfg.update({'ONTM': 1000, 'ISIL': 3000, 'ISIH': 5000, 'DBNC': 100, 'SPCT': 100})
+                self._send_cfg()
+            else:
+                self.send(f'stm>{val}')
+        elif key == 'get_cfg':
+            self._send_cfg()
+        elif key == 'set':
+            for kv in filter(None, val.split(',')):
+                k, _, v = kv.partition(':')
+                if k in self.cfg:
+                    self.cfg[k] = int(v)
+            self._send_cfg()
+        else:
+            super().command(key, val)
+
+    def _send_cfg(self):
+        self.send(f"cfg>{','.join(f'{k}:{v}' for k, v in self.cfg.items())}")
+
+    async def _run_trials(self):
+        await self._sleep_ms(self._isi_ms(self.cfg['ISIL'], self.cfg['ISIH']))
+        block_start = monotonic()
+        trial = 0
+        while True:
+            trial += 1
+            isi = self._isi_ms(self.cfg['ISIL'], self.cfg['ISIH'])
+            rt = self._response_ms()
+            self.send(f'trl>{trial}')
+            self.send('stm>1')
+
+            responses = 0
+            if rt is not None and rt < isi:
+                await self._sleep_ms(rt)
+                responses = 1
+                self.send('clk>1')
+                self.send(f'rt>{rt * 1000}')
+                self.send('stm>0')
+                await self._sleep_ms(isi - rt)
+            else:
+                rt = -1
+                await self._sleep_ms(self.cfg['ONTM'])
+                self.send('stm>0')
+                await self._sleep_ms(isi - self.cfg['ONTM'])
+
+            block_ms = int((monotonic() - block_start) * 1000 * self.speed)
+            self.send_record(f'{block_ms},{trial},{responses},{rt}')
+
+
+class SimulatedWVOG(_SimulatedWirelessDevice):
+    """ wVOG: 'exp>1' / 'exp>0', 'trl>1' / 'trl>0', 'a>' / 'b>' / 'x>', 'cfg>', 'set>key,value,...'. """
+    DEVICE = 'wVOG'
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.cfg = {'clr': '100', 'cls': '1500', 'dbc': '20', 'srt': '1', 'opn': '1500', 'dta': '0', 'drk': '0',
+                    'typ': 'cycle'}
+        self._exp_running = False
+        self._trial = None
+        self._trial_n = 0
+        self._times = [0, 0]
+        self._clear, self._since = False, monotonic()
+
+    def command(self, key, val):
+        if key == 'exp':
+            self._exp_running = val == '1'
+            self._trial_n = 0 if self._exp_running else self._trial_n
+            self.send(f'exp>{val}')
+        elif key == 'trl':
+            if val == '1' and self._exp_running and not (self._trial and not self._trial.done()):
+                self._trial_n += 1
+                self.send('trl>1')
+                self._trial = self._start(self._cycle())
+            elif val == '0' and self._trial and not self._trial.done():
+                self._trial.cancel()
+                self._trial.add_done_callback(lambda t: self._end_trial())
+        elif key in ('a', 'b', 'x'):
+            self.send(f'stm>{val}')
+        elif key == 'cfg':
+            self._send_cfg()
+        elif key == 'set':
+            kvs = val.split(',')
+            for k, v in zip(kvs[::2], kvs[1::2]):
+                if k in self.cfg:
+                    self.cfg[k] = v
+            self._send_cfg()
+        else:
+            super().command(key, val)
+
+    def _send_cfg(self):
+        self.send(f"cfg>{','.join(f'{k}:{v}' for k, v in self.cfg.items())}")
+
+    async def _cycle(self):
+        self._times = [0, 0]
+        self._clear = not int(self.cfg['srt'])
+        while True:
+            self._since = monotonic()
+            self.send(f'stm>{int(self._clear)}')
+            ms = int(self.cfg['opn'] if self._clear else self.cfg['cls'])
+            await self._sleep_ms(ms)
+            self._times[0 if self._clear else 1] += ms
+            self._clear = not self._clear
+            if int(self.cfg['dta']):
+                self.send_record(f'{self._trial_n},{self._times[0]},{self._times[1]},{sum(self._times)},'
+                                 f'{int(self._clear)}')
+
+    def _end_trial(self):
+        self._times[0 if self._clear else 1] += int((monotonic() - self._since) * 1000 * self.speed)
+        self.send('trl>0')
+        self.send('stm>0')
+        self.send_record(f'{self._trial_n},{self._times[0]},{self._times[1]},{sum(self._times)},X')
+
+
+DEVICES = {cls.DEVICE: cls for cls in (SimulatedSDRT, SimulatedSVOG, SimulatedWDRT, SimulatedWVOG)}
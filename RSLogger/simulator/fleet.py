@@ -0,0 +1,198 @@
+"""
+Fleet of simulated RS devices for running HWRoot without hardware.
+
+Wired sDRT/sVOG/wDRT/wVOG units are pty backed serial ports and wireless wDRT/wVOG units are nodes of a simulated
+XBee dongle. Fleet.comports lists them like serial's comports() does, and Fleet.open_xbee stands in for XBeeDevice:
+
+    fleet = Fleet(wired={'sDRT': 4}, wireless={'wDRT': 20}, speed=10)
+    fleet.start()
+    HWRoot(queues, list_ports=fleet.comports, xbee_factory=fleet.open_xbee)
+
+Like the application, RemoteConnectionManager leaves the dongle alone while wired RS devices are attached, so a fleet
+is either wired or wireless as far as HWRoot is concerned.
+
+Load test, run from the repository root (Linux or macOS):
+    python -m RSLogger.simulator.fleet --wdrt 50 --wireless --speed 10 --seconds 30
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+from time import sleep, perf_counter
+
+from RSLogger.hardware_io.hi_controller import HWRoot
+from RSLogger.hardware_io.xbee_node_cache import XBeeNodeCache
+from RSLogger.simulator.devices import DEVICES, Faults
+from RSLogger.simulator.pty_port import PtyPort
+from RSLogger.simulator.xbee import SimulatedXBee
+from RSLogger.utilities import trace, metrics
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import new_message
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+
+class Fleet:
+    """
+    Simulated devices, counted per device type in wired ({'sDRT': 10, ...}) and wireless ({'wDRT': 20, 'wVOG': 5}).
+    Every device gets its own random seed derived from seed. Other keyword arguments (speed, jitter_ms, faults,
+    rt_ms, miss) go to every device; xbee_latency_ms and xbee_drop to the simulated dongle.
+
+    The devices run on an asyncio loop in a thread of their own, started by start() and ended by stop().
+    """
+    def __init__(self, wired=None, wireless=None, seed=0, xbee_latency_ms=5.0, xbee_drop=0.0, debug=False,
+                 **device_options):
+        self._debug = debug
+
+        self.wired = [DEVICES[dev](f'{dev}_{i + 1}', seed=f'{seed}{dev}w{i}', debug=debug, **device_options)
+                      for dev, n in (wired or {}).items() for i in range(n)]
+        self.wireless = [DEVICES[dev](f'{dev}_{i + 1}', seed=f'{seed}{dev}x{i}', debug=debug, **device_options)
+                         for dev, n in (wireless or {}).items() for i in range(n)]
+        self._xbee_options = {'latency_ms': xbee_latency_ms, 'drop': xbee_drop, 'seed': seed, 'debug': debug}
+
+        self.ports = list()
+        self.xbee = None
+
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), name='simulator', daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def _run(self, started):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        self.ports = [PtyPort(device, self._loop, self._debug) for device in self.wired]
+        if self.wireless:
+            self.xbee = SimulatedXBee(self.wireless, self._loop, **self._xbee_options)
+        started.set()
+
+        self._loop.run_forever()
+        for port in self.ports:
+            port.close()
+        for device in self.wireless:
+            device.stop()
+        self._loop.close()
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+
+    ####################################################################################################################
+    # Stand-ins for the host's hardware lookups
+
+    def comports(self):
+        """ For UsbPortScanner / RemoteConnectionManager list_ports. """
+        ports = [port.port_info() for port in self.ports]
+        if self.xbee:
+            ports.append(self.xbee.port_info())
+        return ports
+
+    def open_xbee(self, port, baud):
+        """ For RemoteConnectionManager xbee_factory. """
+        return self.xbee
+
+    def stats(self):
+        totals = dict()
+        for device in self.wired + self.wireless:
+            for key, value in device.stats.items():
+                totals[key] = totals.get(key, 0) + value
+        totals['pty_overflows'] = sum(port.overflows for port in self.ports)
+        if self.xbee:
+            totals.update(self.xbee.stats)
+        return totals
+
+
+########################################################################################################################
+# Load test
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    for dev in DEVICES:
+        parser.add_argument(f'--{dev.lower()}', type=int, default=0, help=f'Number of {dev} units')
+    parser.add_argument('--wireless', action='store_true', help='wDRT/wVOG units are XBee nodes instead of wired')
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--speed', type=float, default=1.0, help='Run trials this many times as fast')
+    parser.add_argument('--jitter', type=float, default=0.0, help='ms each device line may be delayed by')
+    parser.add_argument('--drop', type=float, default=0.0, help='Chance a device line is lost')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='Chance a serial line is garbled')
+    parser.add_argument('--duplicate', type=float, default=0.0, help='Chance a device line arrives twice')
+    parser.add_argument('--xbee-drop', type=float, default=0.0, help='Chance a frame to an XBee node is lost')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace', help='Trace the host and write the Chrome trace to this file')
+    parser.add_argument('--metrics', metavar='ADDRESS', help='Serve the host metrics on this [host:]port or socket')
+    args = parser.parse_args()
+
+    if args.trace:
+        trace.enable()
+    if args.metrics:
+        print(f'metrics served on {metrics.serve(args.metrics).server_address}')
+
+    counts = {dev: getattr(args, dev.lower()) for dev in DEVICES}
+    wireless = {dev: n for dev, n in counts.items() if args.wireless and dev in ('wDRT', 'wVOG') and n}
+    wired = {dev: n for dev, n in counts.items() if n and dev not in wireless}
+    if wired and wireless:
+        print('Wired devices keep RemoteConnectionManager from using the dongle, the wireless units will not connect')
+
+    fleet = Fleet(wired, wireless, seed=args.seed, xbee_drop=args.xbee_drop, speed=args.speed,
+                  jitter_ms=args.jitter, faults=Faults(args.drop, args.corrupt, args.duplicate))
+    fleet.start()
+
+    session = tempfile.mkdtemp(prefix='rs_sim_')
+    queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
+    hw = HWRoot(queues, autostart=False, list_ports=fleet.comports, xbee_factory=fleet.open_xbee,
+                node_cache=XBeeNodeCache(os.path.join(session, 'xbee_nodes.json')))
+    threading.Thread(target=hw.launch, name='hw_root', daemon=True).start()
+
+    n_devices = len(fleet.wired) + len(fleet.wireless)
+    t_0 = perf_counter()
+    while sum(len(ports) for ports in hw.RS_devices.values()) < n_devices and perf_counter() - t_0 < 20:
+        sleep(0.1)
+    attached = sum(len(ports) for ports in hw.RS_devices.values())
+    print(f'{attached} of {n_devices} devices attached in {perf_counter() - t_0:.1f} s, session folder {session}')
+
+    get_log_writer().open_session(session)
+    for key, payload in (('fpath', session), ('init', ''), ('start', '')):
+        queues['q_2_hi'].put(new_message('all', 'all', key, payload))
+        sleep(0.2)
+
+    ui_messages = 0
+    t_0 = perf_counter()
+    while perf_counter() - t_0 < args.seconds:
+        ui_messages += len(list(queues['q_2_ui'].drain()))
+        sleep(0.1)
+    elapsed = perf_counter() - t_0
+
+    for key in ('stop', 'close'):
+        queues['q_2_hi'].put(new_message('all', 'all', key))
+        sleep(0.5)
+    ui_messages += len(list(queues['q_2_ui'].drain()))
+    get_log_writer().close_all(wait=True)
+    fleet.stop()
+
+    print(f'messages to the UI: {ui_messages} ({ui_messages / elapsed:.0f}/s)')
+    print(f'simulator:          {fleet.stats()}')
+    print(f'log writer:         {get_log_writer().stats()}')
+    print(f'data sequencer:     {hw.SEQ.stats()}')
+    if hw.XB.tx:
+        print(f'XBee transmitter:   {hw.XB.tx.stats()}')
+    for m in metrics.snapshot()['metrics']:
+        if m['kind'] == 'histogram' and m['value']['count']:
+            h = m['value']
+            print(f"{m['name'] + ':':20}n={h['count']} p50={h['p50']} p99={h['p99']} max={h['max']:.2f} ms")
+    if args.trace:
+        print(f'trace:              {trace.dump(args.trace)} events written to {args.trace}, {trace.stats()}')
+    for name in sorted(os.listdir(session)):
+        path = os.path.join(session, name)
+        if os.path.isfile(path) and name.endswith('.txt'):
+            with open(path) as infile:
+                print(f'{name:20}{sum(1 for _ in infile) - 1} lines')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import os
+import tty
+
+from serial.tools.list_ports_common import ListPortInfo
+
+from RSLogger.hardware_io.usb_connect import UsbPortScanner
+from RSLogger.utilities import trace
+
+_WRITE_ERROR = trace.register('PtyPort.write_error')
+
+
+class PtyPort:
+    """
+    A pseudo terminal standing in for a device's USB serial port. The host opens path like any serial port; the
+    simulated device is on the other end.
+
+    Only available where os.openpty is (Linux, macOS). port_info() describes the port with the device's USB pid and
+    vid, so UsbPortScanner recognizes it when the simulator's port listing is passed to it.
+    """
+    def __init__(self, device, loop, debug=False):
+        self._debug = debug
+
+        self.device = device
+        self._loop = loop
+
+        self._master, self._slave = os.openpty()
+        # No echo or line ending translation, like the USB CDC port of a device
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.path = os.ttyname(self._slave)
+
+        self._buffer = b''
+        self.overflows = 0
+
+        device.attach(loop, self.write)
+        loop.add_reader(self._master, self._readable)
+
+    def port_info(self):
+        info = ListPortInfo(self.path, skip_link_detection=True)
+        # UsbPortScanner opens ports by name, which has to be the full path here
+        info.name = self.path
+        info.pid = UsbPortScanner.DEVICE_IDS[self.device.DEVICE]['pid']
+        info.vid = UsbPortScanner.DEVICE_IDS[self.device.DEVICE]['vid']
+        info.description = f'Simulated {self.device.DEVICE}'
+        info.serial_number = self.device.name
+        return info
+
+    def write(self, data: bytes):
+        try:
+            os.write(self._master, data)
+        except BlockingIOError:
+            # Nobody is reading the port and its buffer is full; a real device would lose the line too
+            self.overflows += 1
+        except OSError as e:
+            trace.event(_WRITE_ERROR, (self.path, e))
+
+    def _readable(self):
+        try:
+            data = os.read(self._master, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            # Host closed the port
+            return
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            self.device.receive(line.decode('utf-8', errors='replace'))
+
+    def close(self):
+        self._loop.remove_reader(self._master)
+        self.device.stop()
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,194 @@
+import threading
+from random import Random
+from time import time
+
+from digi.xbee.devices import NetworkDiscoveryStatus, RemoteRaw802Device, XBeeMessage
+from digi.xbee.models.address import XBee64BitAddress
+from digi.xbee.models.protocol import XBeeProtocol
+from digi.xbee.models.status import TransmitStatus
+from digi.xbee.packets.raw import TXStatusPacket
+from serial.tools.list_ports_common import ListPortInfo
+
+from RSLogger.hardware_io.remote_connect import RemoteConnectionManager
+from RSLogger.utilities import trace
+
+_RECEIVED = trace.register('SimulatedXBee.received')
+
+
+class SimulatedXBee:
+    """
+    Stand-in for the coordinator's XBeeDevice with simulated wDRT/wVOG units as its remote nodes.
+
+    It offers the part of the XBeeDevice interface RemoteConnectionManager and XBeeTransmitter use, and its nodes are
+    real RemoteRaw802Device objects, so the controllers treat them like radios. Frames sent to a node reach its
+    simulated device after latency_ms, and a transmit status comes back on another thread like the Digi reader's.
+    The chance drop loses a frame to a node without a status, so the transmitter has to retry. Discovery finds every
+    node discovery_s after it is started.
+    """
+    PORT = 'SIMXB'
+    ADDRESS_BASE = 0x0013A20041B20000
+
+    def __init__(self, devices, loop, latency_ms=5.0, drop=0.0, discovery_s=0.5, seed=None, debug=False):
+        self._debug = debug
+
+        self._loop = loop
+        self.latency_ms = latency_ms
+        self.drop = drop
+        self.discovery_s = discovery_s
+
+        self._rng = Random(seed)
+        self._lock = threading.Lock()
+        self._frame_id = 0
+        self._open = False
+        self._data_callbacks = list()
+        self._packet_callbacks = list()
+
+        # RemoteXBeeDevice needs its local device's interface, this object stands in for that too
+        self.comm_iface = self
+
+        self._remotes = dict()
+        self._devices_by_addr = dict()
+        for i, device in enumerate(devices):
+            addr = XBee64BitAddress.from_hex_string(f'{self.ADDRESS_BASE + i + 1:016X}')
+            remote = RemoteRaw802Device(self, addr, node_id=device.name)
+            self._remotes[str(addr)] = remote
+            self._devices_by_addr[str(addr)] = device
+            device.attach(loop, lambda data, r=remote: self._received(r, data), corrupt=False)
+
+        self._network = _SimulatedNetwork(self)
+
+        self.stats = {'frames_out': 0, 'frames_lost': 0, 'frames_in': 0}
+
+    def port_info(self):
+        info = ListPortInfo(self.PORT, skip_link_detection=True)
+        info.pid = RemoteConnectionManager.DONGLE_ID['pid']
+        info.vid = RemoteConnectionManager.DONGLE_ID['vid']
+        info.description = 'Simulated XBee dongle'
+        return info
+
+    ####################################################################################################################
+    # XBeeDevice
+
+    def open(self):
+        self._open = True
+
+    def close(self):
+        self._open = False
+
+    def is_open(self):
+        return self._open
+
+    def get_serial_port(self):
+        return self.PORT
+
+    def get_protocol(self):
+        return XBeeProtocol.RAW_802_15_4
+
+    def get_network(self):
+        return self._network
+
+    def get_next_frame_id(self):
+        with self._lock:
+            self._frame_id = self._frame_id % 255 + 1
+            return self._frame_id
+
+    def add_data_received_callback(self, cb):
+        self._data_callbacks.append(cb)
+
+    def del_data_received_callback(self, cb):
+        self._data_callbacks.remove(cb)
+
+    def add_packet_received_callback(self, cb):
+        self._packet_callbacks.append(cb)
+
+    def del_packet_received_callback(self, cb):
+        self._packet_callbacks.remove(cb)
+
+    def send_packet(self, packet, sync=False):
+        addr = str(packet.x64bit_dest_addr)
+        device = self._devices_by_addr.get(addr)
+        self.stats['frames_out'] += 1
+        if not self._open or device is None or self._rng.random() < self.drop:
+            self.stats['frames_lost'] += 1
+            return
+
+        line = packet.rf_data.decode('utf-8', errors='replace')
+        try:
+            self._loop.call_soon_threadsafe(self._loop.call_later, self.latency_ms / 1000, device.receive, line)
+        except RuntimeError:
+            # Simulator stopped
+            return
+        threading.Timer(self.latency_ms / 1000, self._status, (packet.frame_id,)).start()
+
+    def send_data_async(self, remote, data):
+        if device := self._devices_by_addr.get(str(remote.get_64bit_addr())):
+            line = data.decode('utf-8', errors='replace') if isinstance(data, bytes) else data
+            try:
+                self._loop.call_soon_threadsafe(device.receive, line)
+            except RuntimeError:
+                pass
+
+    def _status(self, frame_id):
+        packet = TXStatusPacket(frame_id, TransmitStatus.SUCCESS)
+        for cb in list(self._packet_callbacks):
+            cb(packet)
+
+    def _received(self, remote, data):
+        # Simulator loop thread, the Digi library calls these from its reader thread
+        if not self._open:
+            return
+        self.stats['frames_in'] += 1
+        trace.event(_RECEIVED, data)
+        msg = XBeeMessage(data, remote, time())
+        for cb in list(self._data_callbacks):
+            cb(msg)
+
+
+class _SimulatedNetwork:
+    """ The part of XBeeNetwork RemoteConnectionManager uses. """
+    def __init__(self, xbee):
+        self._xbee = xbee
+        self._found = dict()
+        self._finished_callbacks = list()
+        self._timer = None
+
+    def add_discovery_process_finished_callback(self, cb):
+        self._finished_callbacks.append(cb)
+
+    def del_discovery_process_finished_callback(self, cb):
+        if cb in self._finished_callbacks:
+            self._finished_callbacks.remove(cb)
+
+    def start_discovery_process(self):
+        self._timer = threading.Timer(self._xbee.discovery_s, self._discovery_finished)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_discovery_process(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def is_discovery_running(self):
+        return self._timer is not None and self._timer.is_alive()
+
+    def _discovery_finished(self):
+        self._found.update(self._xbee._remotes)
+        for cb in list(self._finished_callbacks):
+            cb(NetworkDiscoveryStatus.SUCCESS)
+
+    def get_devices(self):
+        return list(self._found.values())
+
+    def add_if_not_exist(self, x64bit_addr, node_id=None):
+        """ Cached nodes are only known if the simulator has them, nodes of a real network are not made up. """
+        if remote := self._xbee._remotes.get(str(x64bit_addr)):
+            self._found[str(x64bit_addr)] = remote
+        return remote
+
+    def remove_device(self, remote):
+        if self._found.pop(str(remote.get_64bit_addr()), None) is None:
+            raise ValueError('Remote XBee device is not in the network')
+
+    def clear(self):
+        self._found.clear()
@@ -1,11 +1,12 @@
 import os
-from tkinter import StringVar, LEFT, filedialog, messagebox
+from tkinter import StringVar, LEFT, filedialog, messagebox, PhotoImage
 from tkinter.ttk import Button, Label, Entry, LabelFrame
-from PIL import Image, ImageTk
 from queue import SimpleQueue
 from time import time
 from os import path
-from threading import Thread
+
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities.message import new_message
 
 
 class ExpControls:
@@ -35,8 +36,9 @@ class ExpControls:
         record_path = path.abspath(path.join(path.dirname(__file__), '../../img/record.png'))
         pause_path = path.abspath(path.join(path.dirname(__file__), '../../img/pause.png'))
 
-        self._record_img = ImageTk.PhotoImage(Image.open(record_path))
-        self._pause_img = ImageTk.PhotoImage(Image.open(pause_path))
+        # Tk reads PNGs itself, PIL is not needed at startup
+        self._record_img = PhotoImage(file=record_path)
+        self._pause_img = PhotoImage(file=pause_path)
 
         self._record_button = Button(self._widget_lf, image=self._record_img, command=self._record_button_cb)
         # self._record_button = Button(self._widget_lf, text="Record", command=self._record_button_cb)
@@ -102,7 +104,7 @@ class ExpControls:
                     message=message_)
             if ans == 'yes' or file_count == 0:
                 self._file_path = file_path
-                self._q_out.put(f'all>all>fpath>{file_path}')
+                self._q_out.put(new_message('all', 'all', 'fpath', file_path))
                 self._ctrl_cb('fpath', file_path)
             else:
                 self._file_path = None
@@ -116,33 +118,24 @@ class ExpControls:
             self._ask_file_dialog()
             if self._file_path:
                 self._ctrl_cb('init', timestamp)
-                self._q_out.put(f'all>all>init>')
+                self._q_out.put(new_message('all', 'all', 'init'))
         else:
             self._ctrl_cb('close', timestamp)
-            self._q_out.put(f'all>all>close>')
+            self._q_out.put(new_message('all', 'all', 'close'))
 
     def _record_button_cb(self):
         timestamp = time()
         if not self._record_running:
             self._ctrl_cb('start', timestamp)
-            self._q_out.put(f'all>all>start>')
+            self._q_out.put(new_message('all', 'all', 'start'))
         else:
             self._ctrl_cb('stop', timestamp)
-            self._q_out.put(f'all>all>stop>')
+            self._q_out.put(new_message('all', 'all', 'stop'))
 
     def _block_cb(self, a, b, c):
-        self._q_out.put(f'all>all>cond>{self.var_cond_name.get()}')
+        self._q_out.put(new_message('all', 'all', 'cond', self.var_cond_name.get()))
 
     def _log_controls(self, state, timestamp):
-        def _write(_path, _results):
-            try:
-                with open(_path, 'a') as writer:
-                    writer.write(_results + '\n')
-            except (PermissionError, FileNotFoundError):
-                pass
         if timestamp != 'ALL':
             data = f"control,{state},{timestamp}"
-            file_path = f"{self._file_path}/controls.txt"
-
-            t = Thread(target=_write, args=(file_path, data))
-            t.start()
+            get_log_writer().write(f"{self._file_path}/controls.txt", data)
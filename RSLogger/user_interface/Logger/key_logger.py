@@ -1,7 +1,8 @@
 from tkinter import StringVar, Tk, RIGHT, LEFT
 from tkinter.ttk import Label, Button, LabelFrame
 from time import time
-from threading import Thread
+
+from RSLogger.utilities.log_writer import get_log_writer
 
 
 class KeyFlagger:
@@ -63,18 +64,8 @@ class KeyFlagger:
                 self._log_key_event(e.char, timestamp)
 
     def _log_key_event(self, event, timestamp):
-        def _write(_path, _results):
-            try:
-                with open(_path, 'a') as writer:
-                    writer.write(_results + '\n')
-            except PermissionError:
-                print("Keylog write error")
-
         data = f"keyflag,{event},{timestamp}"
-        file_path = f"{self._file_path}/keyflags.txt"
-
-        t = Thread(target=_write, args=(file_path, data))
-        t.start()
+        get_log_writer().write(f"{self._file_path}/keyflags.txt", data)
 
     @staticmethod
     def _use_button_cb():
@@ -1,7 +1,8 @@
 from tkinter import scrolledtext, END, LEFT
 from tkinter.ttk import Button, LabelFrame
 from time import time
-from threading import Thread
+
+from RSLogger.utilities.log_writer import get_log_writer
 
 
 class NoteTaker:
@@ -55,17 +56,7 @@ class NoteTaker:
         self._log_note(self.note, timestamp)
 
     def _log_note(self, note, timestamp):
-        def _write(_path, _results):
-            try:
-                with open(_path, 'a') as writer:
-                    writer.write(_results + '\n')
-            except PermissionError:
-                print("Note write error")
-
         data = f"Note,{note},{timestamp}"
-        file_path = f"{self._file_path}/notes.txt"
-
-        t = Thread(target=_write, args=(file_path, data))
-        t.start()
+        get_log_writer().write(f"{self._file_path}/notes.txt", data)
 
 
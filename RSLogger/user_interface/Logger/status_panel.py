@@ -0,0 +1,77 @@
+from tkinter import StringVar, LEFT
+from tkinter.ttk import Label, LabelFrame
+
+from RSLogger.utilities import metrics
+
+
+class StatusDisplay:
+    """ Compact view of the runtime metrics: device line rates, queue depths, file flush times and camera frames. """
+    def __init__(self, widget_frame, refresh_ms=1000):
+        self._widget_frame = widget_frame
+        self._refresh_ms = refresh_ms
+
+        # Main widget label frame
+        self._widget_lf = LabelFrame(widget_frame, text='Status')
+        self._widget_lf.pack(side=LEFT, fill='y', padx=2)
+
+        self._vars = dict()
+        for row, (key, text) in enumerate((('lines', "Lines/s:"),
+                                           ('queues', "Queues UI/HW:"),
+                                           ('files', "File flush p99:"),
+                                           ('camera', "Cam repeat/drop:"))):
+            self._vars[key] = StringVar()
+            self._vars[key].set("N/A")
+
+            Label(self._widget_lf, text=text). \
+                grid(row=row, column=0, sticky='W')
+
+            Label(self._widget_lf, textvariable=self._vars[key]). \
+                grid(row=row, column=1, sticky='E')
+
+        self._last = metrics.snapshot()
+        self._widget_lf.after(self._refresh_ms, self._refresh)
+
+    ################################
+    # Parent widget overrides
+    def set_file_path(self, path):
+        pass
+
+    def handle_log_init(self, timestamp):
+        pass
+
+    def handle_log_close(self, timestamp):
+        pass
+
+    def handle_data_record(self, timestamp):
+        pass
+
+    def handle_data_pause(self, timestamp):
+        pass
+
+    ################################
+    # Class helper functions
+    def _refresh(self):
+        snap = metrics.snapshot()
+        values = {(m['name'], tuple(sorted(m['labels'].items()))): m['value'] for m in snap['metrics']}
+
+        port_rates = metrics.rates(self._last, snap, 'device_lines')
+        busiest = max(port_rates.values(), default=0)
+        self._vars['lines'].set(f"{sum(port_rates.values()):.0f} ({len(port_rates)} ports, max {busiest:.0f})")
+
+        queues = f"{values.get(('q_2_ui_depth', ()), 0)} / {values.get(('q_2_hi_depth', ()), 0)}"
+        # Records the hardware process could not pass to the UI, with --hw-process
+        if ring_dropped := values.get(('ui_ring_dropped', ()), 0):
+            queues += f" ({ring_dropped} dropped)"
+        self._vars['queues'].set(queues)
+
+        flush = values.get(('log_flush_ms', ()))
+        if flush and flush['count']:
+            self._vars['files'].set(f"{flush['p99']:.1f} ms ({values.get(('log_pending', ()), 0)} pending)")
+
+        repeated = sum(v for (name, _), v in values.items() if name == 'camera_frames_repeated')
+        dropped = sum(v for (name, _), v in values.items() if name == 'camera_frames_dropped')
+        cameras = sum(1 for name, _ in values if name == 'camera_fps')
+        self._vars['camera'].set(f"{repeated} / {dropped}" if cameras else "N/A")
+
+        self._last = snap
+        self._widget_lf.after(self._refresh_ms, self._refresh)
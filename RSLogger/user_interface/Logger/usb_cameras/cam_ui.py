@@ -2,10 +2,8 @@ import time
 from tkinter import IntVar, StringVar
 from tkinter.ttk import LabelFrame, Checkbutton, Spinbox
 from tkinter import Label
-import win32com.client
-import cv2
 from multiprocessing import Process, Pipe
-from RSLogger.user_interface.Logger.usb_cameras import cam_win
+from RSLogger.utilities import metrics
 from threading import Thread
 from tkinter import RIGHT
 
@@ -48,7 +46,8 @@ class CameraWidget:
         self._prior_cam_count = int()
         self._cam_parent_pipe = dict()
         self._cam_pipe_msg_handler()
-        self._update_connected_cameras()
+        # The first scan loads the camera stack (WMI, OpenCV), after the window is up
+        self._win.after(500, self._update_connected_cameras)
 
         # Experiment Variables
         self._file_path = ""
@@ -155,6 +154,8 @@ class CameraWidget:
                     send(f"{self._selected_camera.get()}-FPS>{self._selected_frame_rate.get()}")
 
     def _connect_cameras(self, cam_id):
+        from RSLogger.user_interface.Logger.usb_cameras import cam_win
+
         cam = cam_id.split(':')[1]
         self._cam_parent_pipe[cam_id], child_pipe = Pipe()
         self._connected_cameras[cam_id] = Process(target=cam_win.CamViewer, args=(cam_id, child_pipe))
@@ -179,6 +180,7 @@ class CameraWidget:
         """
         try:
             if self._process_running:
+                import win32com.client
                 wmi = win32com.client.GetObject("winmgmts:")
                 usb_items = wmi.InstancesOf("Win32_USBHub")
                 usb_num_delta = self._prior_cam_count - len(usb_items)
@@ -215,6 +217,8 @@ class CameraWidget:
 
     @staticmethod
     def _identify_available_cameras():
+        import cv2
+
         attached_cameras = list()
         for i in range(4):
             cam = cv2.VideoCapture(i, cv2.CAP_DSHOW)
@@ -240,11 +244,25 @@ class CameraWidget:
                             self._attached_cameras[kv[0]]['use'] = val
                             self._use_camera_var.set(val)
                             pop = kv[0]
+                        elif cmd == 'MET':
+                            self._update_camera_metrics(kv[0], val)
 
                 except BrokenPipeError:
                     pass
                     # print(f"Camera {i} has been disconnected")
             if pop:
                 self._cam_parent_pipe.pop(pop)
+                self._remove_camera_metrics(pop)
             self._win.after(200, self._cam_pipe_msg_handler)
 
+    # Frame counts are counters in the camera process, here they are gauges holding its latest report
+    _METRICS = ('camera_frames_written', 'camera_frames_repeated', 'camera_frames_dropped', 'camera_fps')
+
+    def _update_camera_metrics(self, cam, val):
+        for name, value in zip(self._METRICS, val.split(',')):
+            metrics.gauge(name, camera=cam).set(int(value))
+
+    def _remove_camera_metrics(self, cam):
+        for name in self._METRICS:
+            metrics.remove(name, camera=cam)
+
@@ -1,4 +1,5 @@
 import asyncio
+import os
 
 import cv2
 import time
@@ -9,6 +10,8 @@ import queue
 from threading import Thread
 from time import sleep
 
+from RSLogger.utilities import metrics
+
 
 class CameraReader:
     def __init__(self, cam_id, it_frame_q, cv2cr):
@@ -29,7 +32,8 @@ class CameraReader:
         self._cv2cr = cv2cr
 
         # Capture Properties
-        self._cap = cv2.VideoCapture(int(self._id), cv2.CAP_DSHOW)
+        # DirectShow on Windows, whatever OpenCV picks elsewhere (e.g. V4L2 on a headless Linux box)
+        self._cap = cv2.VideoCapture(int(self._id), cv2.CAP_DSHOW if os.name == 'nt' else cv2.CAP_ANY)
         # self._cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
 
         # FPS Counter
@@ -46,6 +50,12 @@ class CameraReader:
         self._frame_drops = 0
         self._frame_tolerance = 3
 
+        # Metrics of this camera process, CamViewer reports them to the main window
+        self._frames_written = metrics.counter('camera_frames_written', camera=cam_id)
+        self._frames_repeated = metrics.counter('camera_frames_repeated', camera=cam_id)
+        self._frames_dropped = metrics.counter('camera_frames_dropped', camera=cam_id)
+        self._fps_gauge = metrics.gauge('camera_fps', camera=cam_id)
+
         self._save_file_start_time = 0
 
         # Save Feed
@@ -64,6 +74,7 @@ class CameraReader:
                     time_stamp = time.time()
 
                     fps, sd = self._fps_counter()
+                    self._fps_gauge.set(fps)
                     msg = f"{str(fps)} {self._desired_fps} {time_stamp}"
                     cv2.putText(frame, msg, (5, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
 
@@ -161,6 +172,7 @@ class CameraReader:
         # I'm ahead, do nothing and the camera will catch up
         if ahead:
             self._frame_drops += 1
+            self._frames_dropped.inc()
 
             # print(f" Drops: {self._frame_drops} Repeats: {self._frame_repeats}")
 
@@ -170,6 +182,8 @@ class CameraReader:
                 self._frame_count += 1
                 self._frame_repeats += 1
                 self._out.write(frm)
+                self._frames_written.inc()
+                self._frames_repeated.inc()
                 behind = expected_frame_count - self._frame_count >= 0
 
                 # print(f" Drops: {self._frame_drops} Repeats: {self._frame_repeats}")
@@ -178,6 +192,7 @@ class CameraReader:
         elif on_track:
             self._frame_count += 1
             self._out.write(frm)
+            self._frames_written.inc()
 
             # print(f'Frame on track...')
 
@@ -226,6 +241,10 @@ class CamViewer:
 
         self._close = False
 
+        # Frame counts are sent to the main window every metrics_interval seconds
+        self._metrics_interval = 1.0
+        self._next_metrics = time.monotonic() + self._metrics_interval
+
         # Cam controller async thread
         self._cam_c = Thread(target=self.controller_thread_entry,
                              args=(cam, self._it_frame_q, self._cv2cr))
@@ -251,6 +270,7 @@ class CamViewer:
             self._check_thread()
             self._check_for_new_messages()
             self._display_cam_view()
+            self._report_metrics()
             sleep(.001)
 
     def _check_thread(self):
@@ -283,6 +303,20 @@ class CamViewer:
             # print(f'cam_win _check_for_new_messages exception: {e}')
             pass
 
+    def _report_metrics(self):
+        now = time.monotonic()
+        if now < self._next_metrics:
+            return
+        self._next_metrics = now + self._metrics_interval
+
+        values = [metrics.counter(f'camera_frames_{kind}', camera=self._cam_alias).collect()
+                  for kind in ('written', 'repeated', 'dropped')]
+        values.append(metrics.gauge('camera_fps', camera=self._cam_alias).collect())
+        try:
+            self._ip_msg_p.send(f"{self._cam_alias}-MET:{','.join(str(v) for v in values)}")
+        except (BrokenPipeError, OSError):
+            pass
+
     def _handle_set_resolution(self, arg):
         self._cv2cr.put(arg)
 
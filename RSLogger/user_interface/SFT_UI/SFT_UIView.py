@@ -1,6 +1,7 @@
 from tkinter.ttk import Label, LabelFrame, Button, Frame, Notebook
 from tkinter import Tk, StringVar, BOTH
 from RSLogger.user_interface.SFT_UI import SFT_UIPlotter
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
 
 
 class SFTTabbedControls:
@@ -52,7 +53,8 @@ class SFTTabbedControls:
         self.NB.add(self.tab_f['frame'], text=name)
 
     def _tab_add_plot(self, dev_id):
-        self.tab_f['plot'] = SFT_UIPlotter.Plotter(self.tab_f['frame'])
+        plotter = SFT_UIPlotter.StripChart if get_render_scheduler().backend == 'tk' else SFT_UIPlotter.Plotter
+        self.tab_f['plot'] = plotter(self.tab_f['frame'])
         self.tab_f['plot'].set_rt_and_state_lines(dev_id)
 
     def _tab_add_manual_controls(self):
@@ -0,0 +1,73 @@
+from RSLogger.utilities import metrics
+
+
+class FigurePool:
+    """
+    The figures and Tk canvases the device plots are drawn on, shared by every device tab.
+
+    A plotter only gets a figure and canvas from the pool when its tab is first shown, and gives them back when the
+    pool needs them for another tab and its own is not shown; the plotter keeps collecting its data either way and
+    draws its axes and lines anew on whatever figure it gets next. At most `size` canvases are made, unless more plots
+    than that are shown at once.
+
+    The canvases are children of the main window, so they can be gridded into any tab; Tk maps and unmaps them with
+    the tab they are gridded in.
+    """
+    def __init__(self, size=4, on_draw=None):
+        self.size = size
+
+        # Called with the canvas after every full draw of one of the figures
+        self._on_draw = on_draw
+
+        self._free = list()
+        # plotter: (figure, canvas), least recently used first
+        self._owners = dict()
+
+        self._created = metrics.counter('plot_canvases_created')
+        metrics.gauge('plot_canvases', state='used').set_function(lambda: len(self._owners))
+        metrics.gauge('plot_canvases', state='free').set_function(lambda: len(self._free))
+
+    def acquire(self, plotter):
+        """ Attaches a figure and canvas to the plotter, taking them from a plot that is not shown if none are free. """
+        if plotter in self._owners:
+            self.touch(plotter)
+            return
+
+        if not self._free and len(self._owners) >= self.size:
+            for owner in self._owners:
+                if not owner._frame.winfo_viewable():
+                    self.release(owner)
+                    break
+
+        figure, canvas = self._free.pop() if self._free else self._new(plotter)
+        self._owners[plotter] = figure, canvas
+        plotter.attach(figure, canvas)
+
+    def release(self, plotter):
+        """ Detaches the plotter's figure and canvas, if it has them, for another plot to use. """
+        if (pair := self._owners.pop(plotter, None)) is not None:
+            plotter.detach()
+            self._free.append(pair)
+
+    def touch(self, plotter):
+        """ Marks the plotter's figure as just used. """
+        if (pair := self._owners.pop(plotter, None)) is not None:
+            self._owners[plotter] = pair
+
+    def owner(self, canvas):
+        for plotter, (_, owned) in self._owners.items():
+            if owned is canvas:
+                return plotter
+        return None
+
+    def _new(self, plotter):
+        # matplotlib is imported when the first plot is shown, not at startup
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        figure = Figure(figsize=(4, 2), dpi=100)
+        canvas = FigureCanvasTkAgg(figure, master=plotter._frame.winfo_toplevel())
+        if self._on_draw:
+            canvas.mpl_connect('draw_event', lambda e, c=canvas: self._on_draw(c))
+        self._created.inc()
+        return figure, canvas
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class TimeSeriesStore:
+    """
+    The last `length` samples of any number of series that all advance together, one sample per series every plot
+    tick, in one preallocated array.
+
+    Every series is a row twice as long as its history, and every sample is written at the write index and again one
+    history length later. The history, oldest sample first, is then always one contiguous slice of the row, so view()
+    hands set_data a view instead of a copy, and a tick writes one column instead of rolling every array:
+
+        store = TimeSeriesStore(600)
+        store.add(('u1', 'state'))
+        store.set(('u1', 'state'), 1)       # a series not set before a tick gets NaN, i.e. a gap
+        store.tick()
+        line.set_data(x, store.view(('u1', 'state')))
+
+    Rows are reused when series are removed; the array only grows (doubling) when more series are added than fit.
+
+    changing tells whether the last `length` ticks brought any series a sample different from the one before it, i.e.
+    whether the plotted histories still change from tick to tick; once every history is flat the plot can stop
+    redrawing until new data arrives.
+    """
+    def __init__(self, length=600, capacity=4):
+        self.length = length
+        self._data = np.full((capacity, 2 * length), np.nan)
+        self._pending = np.full(capacity, np.nan)
+        self._rows = dict()
+        self._free = list(range(capacity - 1, -1, -1))
+        self._index = 0
+        self._unchanged = length
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def add(self, key):
+        """ Adds a series with no samples yet. """
+        if key in self._rows:
+            return
+        if not self._free:
+            self._grow()
+        row = self._rows[key] = self._free.pop()
+        self._data[row] = np.nan
+        self._pending[row] = np.nan
+
+    def remove(self, key):
+        if (row := self._rows.pop(key, None)) is not None:
+            self._pending[row] = np.nan
+            self._free.append(row)
+
+    def set(self, key, value):
+        """ The series' value in the following tick. """
+        self._pending[self._rows[key]] = value
+
+    def tick(self):
+        """ Appends the pending value of every series, dropping its oldest sample. """
+        w = self._index
+        if np.array_equal(self._pending, self._data[:, w + self.length - 1], equal_nan=True):
+            self._unchanged += 1
+        else:
+            self._unchanged = 0
+        self._data[:, w] = self._pending
+        self._data[:, w + self.length] = self._pending
+        self._pending[:] = np.nan
+        self._index = (w + 1) % self.length
+
+    @property
+    def changing(self):
+        return self._unchanged < self.length
+
+    def view(self, key):
+        """ The series' history, oldest sample first, as a view into the store; valid until the next tick. """
+        start = self._index
+        return self._data[self._rows[key], start:start + self.length]
+
+    def clear(self):
+        """ Empties the history of every series and drops pending values. """
+        self._data[:] = np.nan
+        self._pending[:] = np.nan
+        self._unchanged = self.length
+
+    def _grow(self):
+        capacity = len(self._pending)
+        self._data = np.vstack((self._data, np.full((capacity, 2 * self.length), np.nan)))
+        self._pending = np.concatenate((self._pending, np.full(capacity, np.nan)))
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
@@ -0,0 +1,134 @@
+from time import perf_counter
+from tkinter import TclError
+
+from RSLogger.user_interface.figure_pool import FigurePool
+from RSLogger.utilities import metrics
+
+
+class RenderScheduler:
+    """
+    One Tk after() loop that animates every device plot, in place of a FuncAnimation per tab.
+
+    Every frame each plotter's _animate(i) appends its samples when a plot tick is due, whether or not the plot is
+    visible, so the history is right when its tab is shown. A plotter gets a figure and canvas from the FigurePool the
+    first time its tab is shown, and may lose them again to another tab while its own is not. A plotter is only drawn
+    when it is dirty (new data, a scrolling history, lines shown or hidden, cleared) and its tab frame is viewable, i.e.
+    its device view and notebook tab are shown. Drawing blits the plotter's lines onto a cached background; a plotter
+    that asks for a redraw (e.g. its y axis was rescaled, or it was just attached) gets one full draw of its figure
+    instead, the next time it is viewable.
+
+    Strip charts (strip_chart.StripChart) draw on a Tk canvas of their own instead: they have no figure and never go
+    to the pool, and update_lines() is all their drawing.
+
+    Plotters provide:
+        _frame          the tab frame the plot goes in
+        _fig, _canvas   the attached Figure and FigureCanvasTkAgg, None while detached; a strip chart's Tk canvas
+        _plot_lines     the animated lines
+        _animate(i)     appends samples when a tick is due
+        attach(fig, canvas), detach()
+        update_lines()  hands the lines their data
+        dirty, redraw   set by the plotter, cleared once drawn
+    """
+    def __init__(self, fps=10, canvases=4):
+        self.fps = fps
+        # Which plots the device views build: 'matplotlib' Plotters or 'tk' StripCharts
+        self.backend = 'matplotlib'
+        self.pool = FigurePool(canvases, on_draw=self._on_draw)
+
+        self._plotters = list()
+        self._backgrounds = dict()
+        self._widget = None
+        self._frame_n = 0
+
+        self._frame_ms = metrics.histogram('plot_frame_ms')
+        self._drawn = metrics.counter('plot_draws', kind='blit')
+        self._redrawn = metrics.counter('plot_draws', kind='full')
+        self._moved = metrics.counter('plot_draws', kind='canvas')
+        metrics.gauge('plots').set_function(lambda: len(self._plotters))
+
+    def add(self, plotter):
+        self._plotters.append(plotter)
+        # Tabs are rebuilt under the same name when a device reconnects, which destroys the old one
+        plotter._frame.bind('<Destroy>', lambda e, p=plotter: self.remove(p), add='+')
+
+        if self._widget is None:
+            self._widget = plotter._frame.winfo_toplevel()
+            self._widget.after(self._interval_ms, self._frame)
+
+    def remove(self, plotter):
+        if plotter in self._plotters:
+            self._plotters.remove(plotter)
+        try:
+            self.pool.release(plotter)
+        except TclError:
+            # The window is closing, canvases and all
+            pass
+
+    @property
+    def _interval_ms(self):
+        return max(1, int(1000 / self.fps))
+
+    def _frame(self):
+        t_0 = perf_counter()
+        self._frame_n += 1
+        for plotter in self._plotters:
+            try:
+                plotter._animate(self._frame_n)
+                if plotter._canvas is None:
+                    if plotter._frame.winfo_viewable():
+                        # First shown, or shown again after its canvas went to another tab
+                        self.pool.acquire(plotter)
+                elif (plotter.dirty or plotter.redraw) and plotter._frame.winfo_viewable():
+                    self._draw(plotter)
+            except Exception as e:
+                # One broken plot must not stop the others
+                print(f"Error when drawing plot: {e}")
+        if self._plotters:
+            self._frame_ms.observe((perf_counter() - t_0) * 1000)
+
+        try:
+            self._widget.after(self._interval_ms, self._frame)
+        except TclError:
+            # Window closed
+            pass
+
+    def _draw(self, plotter):
+        plotter.update_lines()
+        if plotter._fig is None:
+            # A strip chart moved its canvas items; Tk draws them when idle
+            self._moved.inc()
+            plotter.dirty = plotter.redraw = False
+            return
+
+        canvas = plotter._canvas
+        self.pool.touch(plotter)
+        background = self._backgrounds.get(canvas)
+        if plotter.redraw or background is None:
+            # Full draw; _on_draw caches the new background and draws the lines onto it
+            canvas.draw()
+            self._redrawn.inc()
+        else:
+            canvas.restore_region(background)
+            for line in plotter._plot_lines:
+                plotter._fig.draw_artist(line)
+            canvas.blit(plotter._fig.bbox)
+            self._drawn.inc()
+        plotter.dirty = plotter.redraw = False
+
+    def _on_draw(self, canvas):
+        """ After every full draw of a figure, e.g. on a resize: the lines are animated, so not drawn by it. """
+        self._backgrounds[canvas] = canvas.copy_from_bbox(canvas.figure.bbox)
+        if plotter := self.pool.owner(canvas):
+            for line in plotter._plot_lines:
+                plotter._fig.draw_artist(line)
+
+
+_scheduler = None
+
+
+def get_render_scheduler() -> RenderScheduler:
+    """ Returns the UI wide RenderScheduler. """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RenderScheduler()
+    return _scheduler
@@ -5,6 +5,8 @@ from math import ceil
 from os import path
 from time import sleep
 
+from RSLogger.utilities.message import new_message
+
 
 class DRTConfigWin:
     def __init__(self, q_out: SimpleQueue):
@@ -88,21 +90,21 @@ class DRTConfigWin:
 
     def _upload_to_device_cb(self):
         low = self._filter_entry(self.UI_settings['lowerISI'].get(), 3000, 0, 65535)
-        self._q_to_hi.put(f"sDRT>{self._active_tab}>set_lowerISI>{low}")
+        self._q_to_hi.put(new_message('sDRT', self._active_tab, 'set_lowerISI', str(low)))
 
         high = self._filter_entry(self.UI_settings['upperISI'].get(), 5000, low, 65535)
-        self._q_to_hi.put(f"sDRT>{self._active_tab}>set_upperISI>{high}")
+        self._q_to_hi.put(new_message('sDRT', self._active_tab, 'set_upperISI', str(high)))
 
         intensity = ceil(self._filter_entry(self.UI_settings['intensity'].get(), 100, 0, 100) * 2.55)
-        self._q_to_hi.put(f"sDRT>{self._active_tab}>set_intensity>{intensity}")
+        self._q_to_hi.put(new_message('sDRT', self._active_tab, 'set_intensity', str(intensity)))
 
         duration = self._filter_entry(self.UI_settings['stimDur'].get(), 1000, 0, 65535)
-        self._q_to_hi.put(f"sDRT>{self._active_tab}>set_stimDur>{duration}")
+        self._q_to_hi.put(new_message('sDRT', self._active_tab, 'set_stimDur', str(duration)))
 
         self._clear_settings()
 
     def _set_iso_cb(self):
-        self._q_to_hi.put(f"sDRT>{self._active_tab}>iso>")
+        self._q_to_hi.put(new_message('sDRT', self._active_tab, 'iso'))
         self._clear_settings()
 
     def _clear_settings(self):
@@ -110,7 +112,6 @@ class DRTConfigWin:
             self.UI_settings[i].set("")
 
     def update_fields(self, msg):
-        msg = msg.strip("cfg>")
         msg = msg.split(",")
         for i in msg:
             kv = i.split(":")
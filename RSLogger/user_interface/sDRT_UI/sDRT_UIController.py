@@ -1,6 +1,8 @@
 from queue import SimpleQueue
 from tkinter import Tk
 from RSLogger.user_interface.sDRT_UI import sDRT_UIConfig, sDRT_UIView
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
 
 
 class sDRTUIController:
@@ -24,20 +26,23 @@ class sDRTUIController:
         # Configure Window
         self._cnf_win = sDRT_UIConfig.DRTConfigWin(self._q_2_hi)
 
-    def handle_command(self, com, key, val):
+    @trace.span
+    def handle_command(self, msg: Message):
+        key = msg.key
+
         # Tab Events
         if key == 'devices':
-            self._update_devices(val)
+            self._update_devices(msg.payload)
 
         # Messages from drt hardware
         elif key == 'cfg':
-            self._update_configuration(f'{com}, {val}')
+            self._update_configuration(msg.payload)
         elif key == 'stm':
-            self._update_stimulus_plot(f'{com}, {val}')
+            self._update_stimulus_plot(msg.port, msg.payload)
         elif key == 'trl':
-            self._update_results(f'{com}, {val}')
+            self._update_results(msg.port, msg.payload)
         elif key == 'clk':
-            self._update_response_text(f'{com}, {val}')
+            self._update_response_text(msg.port, msg.payload)
 
         # Plot Commands
         elif key == 'clear':
@@ -47,6 +52,7 @@ class sDRTUIController:
         elif key == 'fpath':
             pass
 
+    @trace.span
     def handle_control_command(self, key, val):
         # Main Controller Events
         if key == 'init':
@@ -98,7 +104,7 @@ class sDRTUIController:
             for id_ in to_add:
                 if id_ not in self.devices:
                     self.devices[id_] = self._UIView.build_tab(id_)
-                    self._q_2_hi.put(f'sDRT>all>stop>1')
+                    self._q_2_hi.put(new_message('sDRT', 'all', 'stop', '1'))
                     pass
 
         to_remove = set(self.devices) - set(units)
@@ -112,38 +118,31 @@ class sDRTUIController:
     def _update_configuration(self, args):
         self._cnf_win.update_fields(args)
 
-    def _update_stimulus_plot(self, arg):
-        port, state = arg.split(',')
+    def _update_stimulus_plot(self, port, state):
         if self._running:
             self.devices[port]['plot'].state_update(port, state)
 
             if state == '1':
-                self._update_response_text(f'{port},0')
+                self._update_response_text(port, '0')
 
-    def _update_rt_plot(self, arg):
+    def _update_rt_plot(self, unit_id, rt):
         if self._running:
-            unit_id, rt = arg.split(',')
             rt = int(rt)
             rt = -0.1 if rt == -1 else round((int(rt) / 1000), 2)
             self.devices[unit_id]['plot'].rt_update(unit_id, rt)
 
-    def _update_results(self, arg):
-        arg_split = arg.split(',')
-
-        if len(arg_split) == 5:
-            unit_id, unix_t, mills, trl_n, rt = arg_split
-        else:
-            unit_id, mills, trl_n, rt = arg_split
+    def _update_results(self, unit_id, payload):
+        mills, trl_n, rt = payload.split(',')
 
         self._update_trial_text(unit_id, trl_n)
         self._update_rt_text(unit_id, rt)
-        self._update_rt_plot(f'{unit_id}, {rt}')
+        self._update_rt_plot(unit_id, rt)
 
     def _reset_results_text(self):
         for d in self.devices:
             self._update_trial_text(d, '0')
             self._update_rt_text(d, '-1')
-            self._update_response_text(f'{d},0')
+            self._update_response_text(d, '0')
 
     def _update_trial_text(self, unit_id, cnt):
         if self._running:
@@ -155,8 +154,7 @@ class sDRTUIController:
                 rt = round((int(rt) / 1000), 2)
             self.devices[unit_id]['rt'].set(rt)
 
-    def _update_response_text(self, msg):
-        unit_id, clicks = msg.split(',')
+    def _update_response_text(self, unit_id, clicks):
         if self._running:
             self.devices[unit_id]['clicks'].set(clicks)
 
@@ -170,12 +168,12 @@ class sDRTUIController:
             self.devices[d]['plot'].run = False
 
     def _stimulus_on_cb(self):
-        self._q_2_hi.put(f"sDRT>{self._UIView.NB.tab(self._UIView.NB.select(), 'text')}>stim>on")
+        self._q_2_hi.put(new_message('sDRT', self._UIView.NB.tab(self._UIView.NB.select(), 'text'), 'stim', 'on'))
 
     def _stimulus_off_cb(self):
-        self._q_2_hi.put(f"sDRT>{self._UIView.NB.tab(self._UIView.NB.select(), 'text')}>stim>off")
+        self._q_2_hi.put(new_message('sDRT', self._UIView.NB.tab(self._UIView.NB.select(), 'text'), 'stim', 'off'))
 
     def _configure_button_cb(self):
         self._cnf_win.show(self._UIView.NB.tab(self._UIView.NB.select(), "text"))
-        self._q_2_hi.put(f"sDRT>{self._UIView.NB.tab(self._UIView.NB.select(), 'text')}>get_config>")
+        self._q_2_hi.put(new_message('sDRT', self._UIView.NB.tab(self._UIView.NB.select(), 'text'), 'get_config'))
 
@@ -1,17 +1,17 @@
-import matplotlib.animation as animation
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import time
 
+from RSLogger.user_interface.plot_store import TimeSeriesStore
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
+from RSLogger.user_interface import strip_chart
+
 
 class Plotter:
     def __init__(self, frame):
-        # Chart
-        self._fig = Figure(figsize=(4, 2), dpi=100)
-        self._fig.suptitle("DRT - Detection Response Task")
-        self._canvas = FigureCanvasTkAgg(self._fig, master=frame)
-        self._canvas.get_tk_widget().grid(row=0, column=0, padx=2, pady=2, sticky='NEWS', rowspan=20)
+        # Chart; the figure and canvas come from the figure pool once the tab is shown
+        self._frame = frame
+        self._fig = None
+        self._canvas = None
 
         self._plt = list()
 
@@ -20,44 +20,85 @@ class Plotter:
         # Plot time
         self._time_array = np.arange(-60, 0, .1)
 
+        # Plot data, one series per line
+        self._store = TimeSeriesStore(len(self._time_array))
+
         # Plot tic
         self._next_update = time.time()
         self._interval = .1
 
         # Reaction Time
         self._rt_now = dict()
-        self._rt_array = dict()
         self._rt_xy = dict()
         self._plot_lines = set()
 
         self._rt_y_min = 0
         self._rt_y_max = 1
+        self._rt_yticks = np.arange(0, 2, 1)
+        self._rt_ylim = (-0.2, 1.2)
 
         # Stimulus State
         self._state_now = dict()
-        self._state_array = dict()
         self._state_xy = dict()
 
-        # Animation
-        self._ani = None
+        # (unit_id, name) of the lines hidden
+        self._hidden = set()
+
+        # Drawn by the render scheduler
+        self.dirty = True
+        self.redraw = False
+
+        self.run = False
+
+        get_render_scheduler().add(self)
 
+    def attach(self, figure, canvas):
+        """ Draws the plot on a figure and canvas from the pool. """
+        self._fig = figure
+        self._canvas = canvas
+
+        self._fig.clear()
+        self._fig.suptitle("DRT - Detection Response Task")
         self._add_rt_plot()
         self._add_state_plot()
+        for unit_id in self._unit_ids:
+            self._add_lines(unit_id)
 
-        self.run = False
+        widget = self._canvas.get_tk_widget()
+        widget.grid(in_=self._frame, row=0, column=0, padx=2, pady=2, sticky='NEWS', rowspan=20)
+        widget.lift()
+        self.redraw = True
+
+    def detach(self):
+        """ Hands the figure and canvas back; the data keeps being collected. """
+        self._canvas.get_tk_widget().grid_forget()
+        self._fig = None
+        self._canvas = None
+
+        self._plt.clear()
+        self._rt_xy.clear()
+        self._state_xy.clear()
+        self._plot_lines.clear()
 
     def _add_rt_plot(self):
         self._plt.append(self._fig.add_subplot(212))
+        # X axes
+        self._plt[0].set_xticks([-60, -50, -40, -30, -20, -10, 0])
+        self._plt[0].set_xlim([-62, 2])
         # Y axes
         self._plt[0].set_ylabel("RT-Seconds")
         self._plt[0].yaxis.set_label_position('right')
         self._plt[0].yaxis.set_tick_params()
+        self._plt[0].set_yticks(self._rt_yticks)
+        self._plt[0].set_ylim(self._rt_ylim)
 
     def _add_state_plot(self):
         self._plt.append(self._fig.add_subplot(211))
 
         # X axes
         self._plt[1].xaxis.set_tick_params(labelbottom=False)
+        self._plt[1].set_xticks([-60, -50, -40, -30, -20, -10, 0])
+        self._plt[1].set_xlim([-62, 2])
         # Y axes
         self._plt[1].set_ylabel("Stimulus")
         self._plt[1].yaxis.set_label_position('right')
@@ -65,65 +106,41 @@ class Plotter:
         self._plt[1].set_yticks([0, 1])
         self._plt[1].set_yticklabels(["Off", "On"])
 
-
     def set_rt_and_state_lines(self, unit_id):
-        # RT LINE
-
         self._rt_now[unit_id] = None
+        self._store.add((unit_id, 'hit'))
+        self._store.add((unit_id, 'miss'))
+
+        self._state_now[unit_id] = 0
+        self._store.add((unit_id, 'state'))
 
-        self._rt_array[unit_id] = dict()
+        self._unit_ids.update([unit_id])
+        if self._fig is not None:
+            self._add_lines(unit_id)
+        self.dirty = True
+
+    def _add_lines(self, unit_id):
+        # RT LINE
         self._rt_xy[unit_id] = dict()
         # Hits
-        self._rt_array[unit_id]['hit'] = np.empty([600])
-        self._rt_array[unit_id]['hit'][:] = np.nan
-
         self._rt_xy[unit_id]['hit'] = self._plt[0].\
-            plot(self._time_array, self._rt_array[unit_id]['hit'], marker="o")
+            plot(self._time_array, self._store.view((unit_id, 'hit')), marker="o", animated=True)
 
         c = self._rt_xy[unit_id]['hit'][0].get_color()
         # ---- Misses
-        self._rt_array[unit_id]['miss'] = np.empty([600])
-        self._rt_array[unit_id]['miss'][:] = np.nan
-
         self._rt_xy[unit_id]['miss'] = self._plt[0].\
-            plot(self._time_array, self._rt_array[unit_id]['miss'], marker="x", color=c)
-
-        # ---- X axes - RT
-        self._plt[0].set_xticks([-60, -50, -40, -30, -20, -10, 0])
-        self._plt[0].set_xlim([-62, 2])
-        self._plt[0].set_yticks(np.arange(0, 2, 1))
-        self._plt[0].set_ylim([-0.2, 1.2])
+            plot(self._time_array, self._store.view((unit_id, 'miss')), marker="x", color=c, animated=True)
 
         # STATE LINE
-        self._state_now[unit_id] = 0
-        self._state_array[unit_id] = np.empty([600])
-        self._state_array[unit_id][:] = np.nan
-
-        self._state_xy[unit_id] = self._plt[1].plot(self._time_array, self._state_array[unit_id], marker="")
-
-        # ---- X axes - State
-        self._plt[1].set_xticks([-60, -50, -40, -30, -20, -10, 0])
-        self._plt[1].set_xlim([-62, 2])
-
-        # RUN ANIMATION
-        if self._ani is None:
-            self._ani = animation.FuncAnimation(self._fig,
-                                                self._animate,
-                                                init_func=lambda prt=unit_id: self._init_animation(prt),
-                                                interval=10, blit=True, cache_frame_data=False)
-
-        self._unit_ids.update([unit_id])
-
-    def _init_animation(self, p):
-        self._state_xy[p][0].set_data(self._time_array, self._state_array[p])
-        self._rt_xy[p]['hit'][0].set_data(self._time_array, self._rt_array[p]['hit'])
-        self._rt_xy[p]['miss'][0].set_data(self._time_array, self._rt_array[p]['miss'])
+        self._state_xy[unit_id] = self._plt[1].plot(self._time_array, self._store.view((unit_id, 'state')), marker="",
+                                                    animated=True)
 
-        self._plot_lines.update(self._state_xy[p])
-        self._plot_lines.update(self._rt_xy[p]['hit'])
-        self._plot_lines.update(self._rt_xy[p]['miss'])
+        self._plot_lines.update(self._rt_xy[unit_id]['hit'])
+        self._plot_lines.update(self._rt_xy[unit_id]['miss'])
+        self._plot_lines.update(self._state_xy[unit_id])
 
-        return self._plot_lines
+        self._set_visible(unit_id, 'rt')
+        self._set_visible(unit_id, 'stim_state')
 
     def _animate(self, i):
         if self.run:
@@ -133,38 +150,32 @@ class Plotter:
                     try:
                         self._rescale_rt_y(self._rt_now[unit_id])
 
-                        # Hits
-                        self._rt_array[unit_id]['hit'] = np.roll(self._rt_array[unit_id]['hit'], -1)
-                        self._rt_array[unit_id]['miss'] = np.roll(self._rt_array[unit_id]['miss'], -1)
-
+                        # Hits and misses; a tick without a response leaves a gap
                         if self._rt_now[unit_id]:
                             if self._rt_now[unit_id] > 0:
-                                self._rt_array[unit_id]['hit'][-1] = self._rt_now[unit_id]
-                                self._rt_array[unit_id]['miss'][-1] = None
+                                self._store.set((unit_id, 'hit'), self._rt_now[unit_id])
                             else:
-                                self._rt_array[unit_id]['miss'][-1] = None
-                                self._rt_array[unit_id]['miss'][-1] = self._rt_now[unit_id]
-                        else:
-                            self._rt_array[unit_id]['hit'][-1] = None
-                            self._rt_array[unit_id]['miss'][-1] = None
-
-                        self._rt_xy[unit_id]['hit'][0].set_data(self._time_array, self._rt_array[unit_id]['hit'])
-                        self._rt_xy[unit_id]['miss'][0].set_data(self._time_array, self._rt_array[unit_id]['miss'])
-
+                                self._store.set((unit_id, 'miss'), self._rt_now[unit_id])
                         self._rt_now[unit_id] = None
 
-                        self._plot_lines.update(self._rt_xy[unit_id]['hit'])
-                        self._plot_lines.update(self._rt_xy[unit_id]['miss'])
-
-                        self._state_array[unit_id] = np.roll(self._state_array[unit_id], -1)
-                        self._state_array[unit_id][-1] = self._state_now[unit_id]
-                        self._state_xy[unit_id][0].set_data(self._time_array, self._state_array[unit_id])
-
-                        self._plot_lines.update(self._state_xy[unit_id])
+                        self._store.set((unit_id, 'state'), self._state_now[unit_id])
                     except KeyError:
                         pass
 
-        return self._plot_lines
+                # One column for every unit's lines, instead of rolling every array
+                self._store.tick()
+                if self._store.changing:
+                    self.dirty = True
+
+    def update_lines(self):
+        for unit_id in self._rt_xy:
+            self._set_line_data(unit_id)
+
+    def _set_line_data(self, unit_id):
+        # Only y changes, the line copies what it is given
+        self._rt_xy[unit_id]['hit'][0].set_ydata(self._store.view((unit_id, 'hit')))
+        self._rt_xy[unit_id]['miss'][0].set_ydata(self._store.view((unit_id, 'miss')))
+        self._state_xy[unit_id][0].set_ydata(self._store.view((unit_id, 'state')))
 
     def _ready_to_update(self):
         t = time.time()
@@ -180,10 +191,13 @@ class Plotter:
     def _rescale_rt_y(self, val=0):
         if val is not None:
             if val >= self._rt_y_max:
-                self._plt[0].set_yticks(np.arange(0, val, 1))
-                self._plt[0].set_ylim(self._rt_y_min - .3, val * 1.2)
+                self._rt_yticks = np.arange(0, val, 1)
+                self._rt_ylim = (self._rt_y_min - .3, val * 1.2)
                 self._rt_y_max = val
-                self._plt[0].figure.canvas.draw_idle()
+                if self._plt:
+                    self._plt[0].set_yticks(self._rt_yticks)
+                    self._plt[0].set_ylim(self._rt_ylim)
+                    self.redraw = True
 
     # Plot Controls
     def rt_update(self, unit_id, val):
@@ -193,37 +207,44 @@ class Plotter:
         self._state_now[unit_id] = int(val)
 
     def clear_all(self):
-        for unit_id in self._state_array.keys():
+        self._store.clear()
+        for unit_id in self._unit_ids:
             self._state_now[unit_id] = 0
-            self._state_array[unit_id][:] = np.nan
-            self._state_xy[unit_id][0].set_data(self._time_array, self._state_array[unit_id])
 
-        for unit_id in self._rt_array.keys():
-            self._rt_array[unit_id]['hit'][:] = np.nan
-            self._rt_array[unit_id]['miss'][:] = np.nan
-            self._rt_xy[unit_id]['hit'][0].set_data(self._time_array, self._rt_array[unit_id]['hit'])
-            self._rt_xy[unit_id]['miss'][0].set_data(self._time_array, self._rt_array[unit_id]['miss'])
-
-        self._plt[0].figure.canvas.draw_idle()
+        self.dirty = True
 
     def remove_unit_id(self, unit_id):
-        self._state_array.pop(unit_id)
-        self._state_xy.pop(unit_id)
-        self._rt_array.pop(unit_id)
+        for series in ('hit', 'miss', 'state'):
+            self._store.remove((unit_id, series))
+        self._rt_xy.pop(unit_id, None)
+        self._state_xy.pop(unit_id, None)
         self._unit_ids.remove(unit_id)
 
     def hide_lines(self, unit_id, name=None):
-        if name == 'rt':
-            self._rt_xy[unit_id]['hit'][0].set_visible(False)
-            self._rt_xy[unit_id]['miss'][0].set_visible(False)
-        elif name == 'stim_state':
-            self._state_xy[unit_id][0].set_visible(False)
+        self._hidden.add((unit_id, name))
+        self._set_visible(unit_id, name)
 
     def show_lines(self, unit_id, name=None):
-        if name == 'rt':
-            self._rt_xy[unit_id]['hit'][0].set_visible(True)
-            self._rt_xy[unit_id]['miss'][0].set_visible(True)
-        elif name == 'stim_state':
-            self._state_xy[unit_id][0].set_visible(True)
-
-
+        self._hidden.discard((unit_id, name))
+        self._set_visible(unit_id, name)
+
+    def _set_visible(self, unit_id, name):
+        visible = (unit_id, name) not in self._hidden
+        if name == 'rt' and unit_id in self._rt_xy:
+            self._rt_xy[unit_id]['hit'][0].set_visible(visible)
+            self._rt_xy[unit_id]['miss'][0].set_visible(visible)
+        elif name == 'stim_state' and unit_id in self._state_xy:
+            self._state_xy[unit_id][0].set_visible(visible)
+        self.dirty = True
+
+
+class StripChart(strip_chart.StripChart, Plotter):
+    """ The same plot on a Tk canvas instead of a matplotlib figure. """
+    title = "DRT - Detection Response Task"
+    state_label = "Stimulus"
+    state_ticks = ("Off", "On")
+    data_label = "RT-Seconds"
+    markers = {'hit': 'o', 'miss': 'x'}
+
+    def _data_y(self):
+        return tuple(self._rt_ylim), tuple(self._rt_yticks)
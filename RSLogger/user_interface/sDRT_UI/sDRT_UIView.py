@@ -1,6 +1,7 @@
 from tkinter.ttk import Label, LabelFrame, Button, Frame, Notebook
 from tkinter import Tk, StringVar, BOTH
 from RSLogger.user_interface.sDRT_UI import sDRT_UIPlotter
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
 
 
 class DRTTabbedControls:
@@ -47,7 +48,8 @@ class DRTTabbedControls:
         self.NB.add(self.tab_f['frame'], text=name)
 
     def _tab_add_plot(self, dev_id):
-        self.tab_f['plot'] = sDRT_UIPlotter.Plotter(self.tab_f['frame'])
+        plotter = sDRT_UIPlotter.StripChart if get_render_scheduler().backend == 'tk' else sDRT_UIPlotter.Plotter
+        self.tab_f['plot'] = plotter(self.tab_f['frame'])
         self.tab_f['plot'].set_rt_and_state_lines(dev_id)
 
     def _tab_add_manual_controls(self):
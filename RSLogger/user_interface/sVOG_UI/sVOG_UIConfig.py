@@ -4,6 +4,8 @@ from tkinter import IntVar, Toplevel, StringVar
 from queue import SimpleQueue
 from os import path
 
+from RSLogger.utilities.message import new_message
+
 
 class VOGConfigWin:
     def __init__(self, q_out: SimpleQueue):
@@ -113,26 +115,26 @@ class VOGConfigWin:
         vals = [self._UISettings['configName'].get().strip(), self._UISettings['configMaxOpen'].get().strip(),
                 self._UISettings['configMaxClose'].get().strip(),
                 debounce, clk_mode, btn_mode]
-        self._push_config(f'cfg,{",".join(vals)}')
+        self._push_config(",".join(vals))
 
     def _set_nhtsa_cb(self):
         vals = ['NHTSA', '1500', '1500', '20', '1', '0']
-        self._push_config(f'cfg,{",".join(vals)}')
+        self._push_config(",".join(vals))
 
     def _set_glance_cb(self):
         vals = ['Glance', '1500', '1500', '20', '1', '2']
-        self._push_config(f'cfg,{",".join(vals)}')
+        self._push_config(",".join(vals))
 
     def _set_eblindfold_cb(self):
         vals = ['eBlindfold', '2147483647', '0', '100', '1', '0']
-        self._push_config(f'cfg,{",".join(vals)}')
+        self._push_config(",".join(vals))
 
     def _set_direct_cb(self):
         vals = ['Direct', '2147483647', '0', '100', '0', '1']
-        self._push_config(f'cfg,{",".join(vals)}')
+        self._push_config(",".join(vals))
 
     def _push_config(self, vals):
-        self._q_out.put(f"sVOG>{self._active_tab}>{vals}>")
+        self._q_out.put(new_message('sVOG', self._active_tab, 'set_cfg', vals))
 
     def update_fields(self, key, val):
         if key == 'configClickMode':
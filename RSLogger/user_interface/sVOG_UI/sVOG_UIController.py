@@ -4,6 +4,8 @@ from tkinter import Tk
 import numpy as np
 
 from RSLogger.user_interface.sVOG_UI import sVOG_UIView, sVOG_UIConfig
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
 
 
 class sVOGUIController:
@@ -26,7 +28,10 @@ class sVOGUIController:
         # Configure Window
         self._cnf_win = sVOG_UIConfig.VOGConfigWin(self._q_out)
 
-    def handle_command(self, com, key, val):
+    @trace.span
+    def handle_command(self, msg: Message):
+        com, key, val = msg.port, msg.key, msg.payload
+
         # Tab Events
         if key == 'devices':
             self._update_devices(val)
@@ -57,6 +62,7 @@ class sVOGUIController:
         elif key == 'fpath':
             pass
 
+    @trace.span
     def handle_control_command(self, key, val):
         # Main Controller Events
         if key == 'init':
@@ -116,7 +122,7 @@ class sVOGUIController:
             for id_ in to_add:
                 if id_ not in self.devices:
                     self.devices[id_] = self._UIView.build_tab(id_)
-                    self._q_out.put(f'sVOG>all>stop>')
+                    self._q_out.put(new_message('sVOG', 'all', 'stop'))
                     pass
 
         to_remove = set(self.devices) - set(units)
@@ -174,14 +180,14 @@ class sVOGUIController:
 
     def _stimulus_on_cb(self):
         com = self._UIView.NB.tab(self._UIView.NB.select(), 'text')
-        self._q_out.put(f"sVOG>{com}>do_peekOpen>")
+        self._q_out.put(new_message('sVOG', com, 'do_peekOpen'))
 
     def _stimulus_off_cb(self):
         com = self._UIView.NB.tab(self._UIView.NB.select(), 'text')
-        self._q_out.put(f"sVOG>{com}>do_peekClose>")
+        self._q_out.put(new_message('sVOG', com, 'do_peekClose'))
 
     def _configure_button_cb(self):
         self._cnf_win.show(self._UIView.NB.tab(self._UIView.NB.select(), "text"))
         com = self._UIView.NB.tab(self._UIView.NB.select(), 'text')
-        self._q_out.put(f"sVOG>{com}>get_config>")
+        self._q_out.put(new_message('sVOG', com, 'get_config'))
 
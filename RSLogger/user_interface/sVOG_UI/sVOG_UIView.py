@@ -1,6 +1,7 @@
 from tkinter.ttk import Label, LabelFrame, Button, Frame, Notebook
 from tkinter import Tk, StringVar, BOTH
 from RSLogger.user_interface.sVOG_UI import sVOG_UIPlotter
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
 
 
 class VOGTabbedControls:
@@ -47,7 +48,8 @@ class VOGTabbedControls:
         self.NB.add(self.tab_f['frame'], text=name)
 
     def _tab_add_plot(self, dev_id):
-        self.tab_f['plot'] = sVOG_UIPlotter.Plotter(self.tab_f['frame'])
+        plotter = sVOG_UIPlotter.StripChart if get_render_scheduler().backend == 'tk' else sVOG_UIPlotter.Plotter
+        self.tab_f['plot'] = plotter(self.tab_f['frame'])
         self.tab_f['plot'].set_tsot_and_state_lines(dev_id)
 
     def _tab_add_manual_controls(self):
@@ -0,0 +1,205 @@
+from tkinter import Canvas
+
+import numpy as np
+
+
+# matplotlib's default colour cycle, so a unit has the same colour with either plot backend
+COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf')
+
+X_LIM = (-62, 2)
+X_TICKS = (-60, -50, -40, -30, -20, -10, 0)
+STATE_Y_LIM = (-0.2, 1.2)
+
+
+class StripChart:
+    """
+    A device plot drawn on a plain Tk canvas instead of a matplotlib figure (main.py --plot-backend tk), for slow
+    machines and large fleets.
+
+    Mixed in ahead of a device's Plotter, whose data handling it keeps as is: the same methods, the same
+    TimeSeriesStore ticked by _animate, the same y scaling. Only the drawing differs. Every unit has a stimulus state
+    line in the top panel and markers for its data series in the bottom one, as canvas items that are created once
+    and then only have their coordinates changed. The state line is reduced to the samples where it changes, so a
+    60 second history is a few points rather than 600, and the markers are the few samples that have a value. The
+    axes are only drawn again when the canvas is resized or the y axis is rescaled.
+
+    The render scheduler calls update_lines() when the chart is dirty and shown; Tk draws the moved items when idle.
+
+    Devices set:
+        title                       figure title
+        state_label, state_ticks    top panel y label and the labels of its 0 and 1 ticks
+        data_label                  bottom panel y label
+        markers                     data series name: 'o', 'x' or '_'
+        _data_y()                   bottom panel y limits and ticks, as tuples
+    """
+    title = ''
+    state_label = ''
+    state_ticks = ('Off', 'On')
+    data_label = ''
+    markers = dict()
+
+    def __init__(self, frame):
+        super().__init__(frame)
+
+        # Always has a canvas; a Tk canvas is cheap, unlike a figure
+        self._canvas = Canvas(frame, width=400, height=200, background='white', highlightthickness=0)
+        self._canvas.grid(row=0, column=0, padx=2, pady=2, sticky='NEWS', rowspan=20)
+        self._canvas.bind('<Configure>', self._resized)
+
+        self._size = (400, 200)
+        # (x0, y0, x1, y1) of the state and data panels
+        self._panels = None
+        self._data_axis = None
+
+        # Canvas items by (unit_id, series), reused from tick to tick, and how many of them are shown
+        self._items = dict()
+        self._shown = dict()
+        self._colors = dict()
+
+        # (unit_id, name) of the lines hidden
+        self._hidden = set()
+
+    def _data_y(self):
+        raise NotImplementedError
+
+    def _resized(self, e):
+        self._size = (e.width, e.height)
+        self.redraw = True
+
+    # Plot Controls
+    def hide_lines(self, unit_id, name=None):
+        self._hidden.add((unit_id, name))
+        self.dirty = True
+
+    def show_lines(self, unit_id, name=None):
+        self._hidden.discard((unit_id, name))
+        self.dirty = True
+
+    # Drawing
+    def update_lines(self):
+        if self.redraw or self._panels is None or self._data_axis != self._data_y():
+            self._draw_axes()
+
+        for unit_id in self._unit_ids:
+            color = self._colors.setdefault(unit_id, COLORS[len(self._colors) % len(COLORS)])
+
+            visible = (unit_id, 'stim_state') not in self._hidden
+            self._draw_state(unit_id, color, visible)
+
+            visible = (unit_id, 'rt') not in self._hidden
+            for series, marker in self.markers.items():
+                self._draw_markers(unit_id, series, marker, color, visible)
+
+    def _draw_axes(self):
+        canvas = self._canvas
+        canvas.delete('axes')
+
+        width, height = self._size
+        left, right, top, bottom, gap = 40, 24, 22, 18, 10
+        panel_h = (height - top - bottom - gap) / 2
+        self._panels = ((left, top, width - right, top + panel_h),
+                        (left, top + panel_h + gap, width - right, height - bottom))
+        self._data_axis = self._data_y()
+        y_lim, y_ticks = self._data_axis
+
+        canvas.create_text(width / 2, 4, text=self.title, anchor='n', tags='axes')
+        for panel, label, lim, ticks, tick_labels in (
+                (self._panels[0], self.state_label, STATE_Y_LIM, (0, 1), self.state_ticks),
+                (self._panels[1], self.data_label, y_lim, y_ticks, [f'{t:g}' for t in y_ticks])):
+            x0, y0, x1, y1 = panel
+            canvas.create_rectangle(x0, y0, x1, y1, outline='black', tags='axes')
+            canvas.create_text(x1 + 12, (y0 + y1) / 2, text=label, angle=90, tags='axes')
+
+            for tick, tick_label in zip(ticks, tick_labels):
+                if lim[0] <= tick <= lim[1]:
+                    y = self._y(panel, lim, tick)
+                    canvas.create_line(x0 - 3, y, x0, y, tags='axes')
+                    canvas.create_text(x0 - 5, y, text=tick_label, anchor='e', tags='axes')
+
+            for tick in X_TICKS:
+                x = self._x(panel, tick)
+                canvas.create_line(x, y1, x, y1 + 3, tags='axes')
+
+        # Time labels under the data panel only
+        y1 = self._panels[1][3]
+        for tick in X_TICKS:
+            canvas.create_text(self._x(self._panels[1], tick), y1 + 4, text=f'{tick}', anchor='n', tags='axes')
+
+        canvas.tag_lower('axes')
+
+    def _draw_state(self, unit_id, color, visible):
+        panel = self._panels[0]
+        y = self._store.view((unit_id, 'state'))
+
+        runs = list()
+        if visible:
+            # Only the samples that differ from either neighbour; a run of equal values becomes its two ends
+            valid = ~np.isnan(y)
+            keep = valid.copy()
+            keep[1:-1] &= ~(valid[:-2] & valid[2:] & (y[1:-1] == y[:-2]) & (y[1:-1] == y[2:]))
+
+            # Gaps split the line
+            run = np.cumsum(valid & ~np.concatenate(([False], valid[:-1])))
+            index = np.flatnonzero(keep)
+            xs = self._x(panel, -60 + index * .1).tolist()
+            ys = self._y(panel, STATE_Y_LIM, np.clip(y[index], *STATE_Y_LIM)).tolist()
+            coords = dict()
+            for r, x, y_ in zip(run[index].tolist(), xs, ys):
+                coords.setdefault(r, list()).extend((x, y_))
+            runs = [c for c in coords.values() if len(c) > 2]
+
+        items = self._reuse((unit_id, 'state'), len(runs),
+                            lambda: self._canvas.create_line(0, 0, 0, 0, fill=color, width=1.5))
+        for item, coords in zip(items, runs):
+            self._canvas.coords(item, coords)
+
+    def _draw_markers(self, unit_id, series, marker, color, visible):
+        panel = self._panels[1]
+        lim = self._data_axis[0]
+        y = self._store.view((unit_id, series))
+
+        if visible:
+            index = np.flatnonzero((y >= lim[0]) & (y <= lim[1]))
+            xs = self._x(panel, -60 + index * .1).tolist()
+            ys = self._y(panel, lim, y[index]).tolist()
+        else:
+            xs = ys = ()
+
+        r = 3
+        if marker == 'o':
+            create = lambda: self._canvas.create_oval(0, 0, 0, 0, fill=color, outline=color)
+            shape = lambda x, y: (x - r, y - r, x + r, y + r)
+        elif marker == 'x':
+            create = lambda: self._canvas.create_line(0, 0, 0, 0, fill=color, width=1.5)
+            shape = lambda x, y: (x - r, y - r, x + r, y + r, x, y, x - r, y + r, x + r, y - r)
+        else:
+            create = lambda: self._canvas.create_line(0, 0, 0, 0, fill=color, width=1.5)
+            shape = lambda x, y: (x - r, y, x + r, y)
+
+        items = self._reuse((unit_id, series), len(xs), create)
+        for item, x, y in zip(items, xs, ys):
+            self._canvas.coords(item, shape(x, y))
+
+    def _reuse(self, key, n, create):
+        """ The first n canvas items of the series, made when there are not enough, the rest hidden. """
+        items = self._items.setdefault(key, list())
+        while len(items) < n:
+            items.append(create())
+
+        shown = self._shown.get(key, 0)
+        for item in items[n:shown]:
+            self._canvas.itemconfigure(item, state='hidden')
+        for item in items[shown:n]:
+            self._canvas.itemconfigure(item, state='normal')
+        self._shown[key] = n
+        return items[:n]
+
+    @staticmethod
+    def _x(panel, t):
+        x0, _, x1, _ = panel
+        return x0 + (np.asarray(t) - X_LIM[0]) / (X_LIM[1] - X_LIM[0]) * (x1 - x0)
+
+    @staticmethod
+    def _y(panel, lim, value):
+        _, y0, _, y1 = panel
+        return y1 - (np.asarray(value) - lim[0]) / (lim[1] - lim[0]) * (y1 - y0)
@@ -0,0 +1,34 @@
+from threading import Thread, Event
+from tkinter import Tk, TclError
+
+
+class TkWaker:
+    """
+    Thread-safe way to wake the Tk mainloop from another thread.
+
+    Calling an instance only sets an event, so the caller (e.g. the HWRoot asyncio loop) never blocks on Tk. A small
+    daemon thread forwards the wakeup as a virtual event, which tkinter marshals into the mainloop thread.
+    """
+    def __init__(self, win: Tk, sequence: str):
+        self._win = win
+        self._sequence = sequence
+
+        self._event = Event()
+        self._thread = Thread(target=self._run, name=f'TkWaker{sequence}', daemon=True)
+        self._thread.start()
+
+    def __call__(self):
+        self._event.set()
+
+    def _run(self):
+        while True:
+            self._event.wait()
+            self._event.clear()
+            try:
+                self._win.event_generate(self._sequence, when='tail')
+            except RuntimeError:
+                # Mainloop not running yet (or anymore); try again shortly
+                self._event.wait(.1)
+                self._event.set()
+            except TclError:
+                return  # Window destroyed
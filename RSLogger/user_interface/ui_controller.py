@@ -1,38 +1,41 @@
-import urllib.request
-import webbrowser
-import inspect
+from importlib import import_module
 
-from urllib.error import URLError
 from tkinter import Tk, BOTH, messagebox, Canvas, Label
 from tkinter.ttk import Frame
 from os import path
 
-from time import time_ns
-from queue import SimpleQueue
+from time import strftime
 from main import __version__
-
-# User Interface
-from RSLogger.user_interface.sDRT_UI import sDRT_UIController
-from RSLogger.user_interface.sVOG_UI import sVOG_UIController
-from RSLogger.user_interface.wDRT_UI import wDRT_UIController
-from RSLogger.user_interface.wVOG_UI import wVOG_UIController
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.user_interface.tk_waker import TkWaker
+from RSLogger.utilities import trace
+from RSLogger.utilities.message import new_message
+from RSLogger.utilities.version_check import VersionCheck
 
 # Widgets
 from RSLogger.user_interface.Logger.controls import ExpControls
 from RSLogger.user_interface.Logger.key_logger import KeyFlagger
 from RSLogger.user_interface.Logger.note_logger import NoteTaker
 from RSLogger.user_interface.Logger.log_timers import InfoDisplay
+from RSLogger.user_interface.Logger.status_panel import StatusDisplay
 from RSLogger.user_interface.Logger.usb_cameras.cam_ui import CameraWidget
 
 
 class UIController:
+    # Device user interfaces, with their plots, are imported and built when the first device of their type connects
+    DEVICE_UI = {
+        'sDRT': ('RSLogger.user_interface.sDRT_UI.sDRT_UIController', 'sDRTUIController'),
+        'wDRT': ('RSLogger.user_interface.wDRT_UI.wDRT_UIController', 'WDRTUIController'),
+        'wVOG': ('RSLogger.user_interface.wVOG_UI.wVOG_UIController', 'WVOGUIController'),
+        'sVOG': ('RSLogger.user_interface.sVOG_UI.sVOG_UIController', 'sVOGUIController'),
+    }
+
     def __init__(self, queues, debug=False):
         self._debug = debug
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
 
-        self._q_2_ui: SimpleQueue = queues['q_2_ui']
-        self._q_2_hi: SimpleQueue = queues['q_2_hi']
+        self._q_2_ui: WakeupQueue = queues['q_2_ui']
+        self._q_2_hi: WakeupQueue = queues['q_2_hi']
 
         # sDRT_UI Thread - This is the main thread where a tkinter loop is used
         self.win: Tk = Tk()
@@ -75,45 +78,56 @@ class UIController:
             'key_flag': KeyFlagger(self.win, self.widget_frame),
             'note': NoteTaker(self.widget_frame),
             'info': InfoDisplay(self.widget_frame),
+            'status': StatusDisplay(self.widget_frame),
             'cam': CameraWidget(self.win, self.widget_frame),
         }
 
-        # Devices
-        self._device_controllers = {
-            # 'sft': SFT_UIController.SFTUIController(self.win, queues['ui_controller'], queues['ui_sft']),
-            'sDRT': sDRT_UIController.sDRTUIController(self.win, queues['q_2_hi']),
-            'wDRT': wDRT_UIController.WDRTUIController(self.win, queues['q_2_hi']),
-            'wVOG': wVOG_UIController.WVOGUIController(self.win, queues['q_2_hi']),
-            'sVOG': sVOG_UIController.sVOGUIController(self.win, queues['q_2_hi'])
-        }
+        # Devices, see DEVICE_UI
+        self._device_controllers = dict()
+        # Control commands of the running log, replayed to device controllers built during it
+        self._session_controls = dict()
+
+        # Messages from the hardware thread wake the mainloop through a virtual event instead of an after() poll
+        self.win.bind('<<q_2_ui>>', lambda e: self._q_2_ui_messages_listener())
+        self.win.after(0, lambda: self._q_2_ui.set_waker(TkWaker(self.win, '<<q_2_ui>>')))
 
-        self._q_2_ui_messages_listener()
+        # Ctrl+Shift+T starts tracing; pressed again it stops and writes the trace to the session folder
+        self._trace_folder = ''
+        self.win.bind('<Control-T>', lambda e: self._toggle_trace())
 
-        self.check_version()
+        # Answered on a background thread through q_2_ui, see _show_version
+        VersionCheck().start(lambda latest: self._q_2_ui.put(new_message('ui', 'ui', 'version', latest or '')))
 
         # Tkinter loop
         self.win.after(0, self.win.deiconify)
 
         self.win.mainloop()
 
+    @trace.span
     def _q_2_ui_messages_listener(self):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
-
-        while not self._q_2_ui.empty():
-
-            msg = self._q_2_ui.get()
-            try:
-                device, port, key, val = msg.split('>')
-                # Handle XBee connection status
-                if device == 'xbee' and key == 'conn_status':
-                    self._update_connection_indicator(val)
-                elif device in self._device_controllers.keys():
-                    self._device_controllers[device].handle_command(port, key, val)
-            except ValueError as e:
-                pass
-
-        self.win.after(10, self._q_2_ui_messages_listener)
+        for msg in self._q_2_ui.drain():
+            # Handle XBee connection status
+            if msg.device == 'xbee' and msg.key == 'conn_status':
+                self._update_connection_indicator(msg.payload)
+            elif msg.device == 'xbee' and msg.key == 'ready':
+                self._show_time_to_ready(msg.payload)
+            elif msg.device == 'ui' and msg.key == 'version':
+                self._show_version(msg.payload)
+            elif controller := self._device_controllers.get(msg.device) or self._build_device_controller(msg):
+                controller.handle_command(msg)
+
+    @trace.span
+    def _build_device_controller(self, msg):
+        """ Builds the controller of msg's device type when its first device connects. """
+        if msg.device not in self.DEVICE_UI or msg.key != 'devices' or not msg.payload:
+            return None
+
+        module, cls = self.DEVICE_UI[msg.device]
+        controller = getattr(import_module(module), cls)(self.win, self._q_2_hi)
+        self._device_controllers[msg.device] = controller
+        for key, val in self._session_controls.items():
+            controller.handle_control_command(key, val)
+        return controller
         
     def _update_connection_indicator(self, status_str):
         """Update the XBee connection indicator based on status string."""
@@ -129,10 +143,17 @@ class UIController:
             self.conn_indicator.itemconfig(self.conn_circle, fill="red")
             self.conn_port_label.config(text="NOT CONNECTED")
 
-    def _control_handler(self, key, val):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
+    def _show_time_to_ready(self, ready_str):
+        """Show how long the wireless devices took to become usable after the dongle connected."""
+        # Format: "n_devices|milliseconds|cache or discovery"
+        n_devices, ms, source = ready_str.split("|")
+        if self.xbee_connected:
+            cached = " from cache" if source == "cache" else ""
+            self.conn_port_label.config(
+                text=f"CONNECTED on {self.xbee_port} - {n_devices} ready in {int(ms) / 1000:.2f} s{cached}")
 
+    @trace.span
+    def _control_handler(self, key, val):
         for widget in self._widgets:
             if key == 'fpath':
                 self._widgets[widget].set_file_path(val)
@@ -148,37 +169,60 @@ class UIController:
         for controller in self._device_controllers:
             self._device_controllers[controller].handle_control_command(key, val)
 
-    def check_version(self):
-        if self._debug:
-            print(f"{time_ns()} {self.file_()[:-3]}.{self.class_()}.{self.method_()}")
-
+        if key == 'init':
+            self._session_controls = {'init': val}
+        elif key == 'start':
+            self._session_controls['start'] = val
+        elif key == 'stop':
+            self._session_controls.pop('start', None)
+        elif key == 'close':
+            self._session_controls.clear()
+
+        # Session files are recovered when a folder is chosen, flushed to disk on pause and closed when logging ends
+        if key == 'fpath':
+            get_log_writer().open_session(val)
+            self._trace_folder = val
+        elif key == 'stop':
+            get_log_writer().flush()
+        elif key == 'close':
+            get_log_writer().close_all()
+
+    def _toggle_trace(self):
+        # With --hw-process q_2_hi is a CommandPipe, and the hardware process is traced along with this one
+        hw_trace = getattr(self._q_2_hi, 'trace', None)
+
+        if not trace.enabled:
+            trace.clear()
+            trace.enable()
+            if hw_trace:
+                hw_trace(True)
+            self.win.title(f"RS Logger {__version__} - tracing")
+            return
+
+        trace.disable()
+        self.win.title(f"RS Logger {__version__}")
+        folder, stamp = self._trace_folder or path.expanduser('~'), strftime('%Y%m%d_%H%M%S')
+        trace_path = path.join(folder, f"rs_trace_{stamp}.json")
+        message = ""
+        if hw_trace:
+            hw_path = path.join(folder, f"rs_trace_hw_{stamp}.json")
+            hw_trace(False, hw_path)
+            message = f"\n\nThe hardware process writes its own to\n{hw_path}"
         try:
-            version = urllib.request.urlopen("https://raw.githubusercontent.com/redscientific/RS_Logger/master/version.txt")
-            version = str(version.read().decode('utf-8'))
-            version = version.strip()
-            if version > __version__:
-                ans = messagebox.askquestion(
-                    title="Notification",
-                    message=f"You are running RSLogger version {__version__}\n\n"
-                            f"The most recent version is {version}\n\n"
-                            f"would you like to download the most recent version now?")
-                if ans == 'yes':
-                    url = f"https://github.com/redscientific/RS_Logger/raw/master/dist/Output/RSLogger_v{version}.exe"
-                    webbrowser.open_new(url)
-        except URLError:
-            messagebox.showwarning(title="No Internet Connection!",
-                                   message="Your software may be out of date.\n\n"
-                                           "Please go to redscientific.com to check for updates.")
-
-    def file_(self):
-        return path.basename(__file__)
-
-    def class_(self):
-        return self.__class__.__name__
-
-    def method_(self):
-        return  inspect.currentframe().f_back.f_code.co_name
-
-
-
-
+            n_events = trace.dump(trace_path)
+            messagebox.showinfo(title="Trace", message=f"{n_events} events written to\n{trace_path}{message}")
+        except OSError as e:
+            messagebox.showwarning(title="Trace", message=f"The trace could not be written: {e}")
+
+    def _show_version(self, latest):
+        if not VersionCheck.is_newer(latest, __version__):
+            return
+        ans = messagebox.askquestion(
+            title="Notification",
+            message=f"You are running RSLogger version {__version__}\n\n"
+                    f"The most recent version is {latest}\n\n"
+                    f"would you like to download the most recent version now?")
+        if ans == 'yes':
+            import webbrowser
+            url = f"https://github.com/redscientific/RS_Logger/raw/master/dist/Output/RSLogger_v{latest}.exe"
+            webbrowser.open_new(url)
@@ -4,6 +4,8 @@ from tkinter import Tk, TclError
 import numpy as np
 
 from RSLogger.user_interface.wDRT_UI import wDRT_UIView, wDRT_UIConfig
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
 
 
 class WDRTUIController:
@@ -25,6 +27,7 @@ class WDRTUIController:
         self._view.register_stim_off_cb(self._stim_off_button_cb)
         self._view.register_configure_clicked_cb(self._configure_button_cb)
         self._view.register_rescan_network(self._rescan_network_cb)
+        self._view.register_pull_card(self._pull_card_cb)
         self._active_tab = None
 
         # Configure Window
@@ -32,7 +35,10 @@ class WDRTUIController:
         self._cnf_win.register_custom_cb(self._custom_button_cb)
         self._cnf_win.register_iso_cb(self._iso_button_cb)
 
-    def handle_command(self, com, key, val):
+    @trace.span
+    def handle_command(self, msg: Message):
+        com, key, val = msg.port, msg.key, msg.payload
+
         # Tab Events
         if key == 'devices':
             self._update_devices(val)
@@ -53,6 +59,7 @@ class WDRTUIController:
 
         elif key == 'fpath'  : self._update_file_path(val)
 
+    @trace.span
     def handle_control_command(self, key, val):
         if   key == 'init'    : self._log_init(val)
         elif key == 'close'   : self._log_close(val)
@@ -72,7 +79,7 @@ class WDRTUIController:
             for id_ in to_add:
                 if id_ not in self.devices:
                     self.devices[id_] = self._view.build_tab(id_)
-                    self._q_2_hi.put(f'wDRT>{id_}>stop>')
+                    self._q_2_hi.put(new_message('wDRT', id_, 'stop'))
 
         to_remove = set(self.devices) - set(units)
         if to_remove:
@@ -138,19 +145,19 @@ class WDRTUIController:
         try:
             self._active_tab = self._view.NB.tab(self._view.NB.select(), "text")
             if self.devices:
-                self._q_2_hi.put(f"wDRT>{self._active_tab}>get_bat>")
+                self._q_2_hi.put(new_message('wDRT', self._active_tab, 'get_bat'))
         except TclError as e:
             if self._debug: print(e)
 
     def _stim_on_button_cb(self):
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>stm_on>")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'stm_on'))
 
     def _stim_off_button_cb(self):
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>stm_off>")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'stm_off'))
 
     def _configure_button_cb(self):
         self._cnf_win.show(self._active_tab)
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>get_cfg>")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'get_cfg'))
 
     def _rescan_network_cb(self):
         for c in self._view.NB.winfo_children():
@@ -159,9 +166,12 @@ class WDRTUIController:
             except TclError:
                 pass
         self.devices.clear()
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>net_scn>")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'net_scn'))
         self._view.hide()
 
+    def _pull_card_cb(self):
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'mmc_pull'))
+
     # Plotter
     def _update_stim_state(self, arg, com):
         if self._running:
@@ -216,10 +226,10 @@ class WDRTUIController:
     # Configuration Window
     # ---- Registered Callbacks
     def _custom_button_cb(self, msg):
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>set>{msg}")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'set', msg))
 
     def _iso_button_cb(self):
-        self._q_2_hi.put(f"wDRT>{self._active_tab}>iso>")
+        self._q_2_hi.put(new_message('wDRT', self._active_tab, 'iso'))
 
     # ---- msg from wDRT unit
     def _update_configuration(self, args):
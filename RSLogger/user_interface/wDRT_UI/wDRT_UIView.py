@@ -3,6 +3,7 @@ from tkinter.ttk import Frame, Notebook
 from tkinter import StringVar, BOTH
 from tkinter import Label as tkLabel
 from RSLogger.user_interface.wDRT_UI import wDRT_UIPlotter
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
 
 
 class WDRTMainWindow:
@@ -26,6 +27,7 @@ class WDRTMainWindow:
         self._stim_off_cb = None
         self._configure_clicked_cb = None
         self._rescan_network_cb = None
+        self._pull_card_cb = None
 
     def build_tab(self, dev_id) -> dict:
         self._tab_f.clear()
@@ -51,7 +53,8 @@ class WDRTMainWindow:
         self.NB.add(self._tab_f['frame'], text=name)
 
     def _tab_add_plot(self, dev_id):
-        self._tab_f['plot'] = wDRT_UIPlotter.Plotter(self._tab_f['frame'])
+        plotter = wDRT_UIPlotter.StripChart if get_render_scheduler().backend == 'tk' else wDRT_UIPlotter.Plotter
+        self._tab_f['plot'] = plotter(self._tab_f['frame'])
         self._tab_f['plot'].set_rt_and_state_lines(dev_id)
 
     def _tab_add_battery_bar(self, dev_id):
@@ -109,6 +112,9 @@ class WDRTMainWindow:
         if not 'COM' in dev_id:
             self._tab_f['refresh'] = Button(f, text="Rescan Network", command=self._rescan_network_cb)
             self._tab_f['refresh'].grid(row=1, column=0, sticky='NEWS')
+        else:
+            self._tab_f['pull_card'] = Button(f, text="Pull Card Logs", command=self._pull_card_cb)
+            self._tab_f['pull_card'].grid(row=1, column=0, sticky='NEWS')
 
     # Events and Callbacks
     def register_rt_checkbox_cb(self, cb):
@@ -129,6 +135,9 @@ class WDRTMainWindow:
     def register_rescan_network(self, cb):
         self._rescan_network_cb = cb
 
+    def register_pull_card(self, cb):
+        self._pull_card_cb = cb
+
     def show(self):
         self._frame.pack(fill=BOTH, expand=1)
         self._frame.columnconfigure(0, weight=1)
@@ -3,6 +3,8 @@ from tkinter import IntVar, Toplevel, StringVar
 from time import time_ns
 from os import path
 
+from RSLogger.utilities.message import new_message
+
 
 class VOGConfigWin:
     def __init__(self, q_out, debug=False):
@@ -163,7 +165,7 @@ class VOGConfigWin:
         for setting in self._UISettings:
             vals += f'{recode_config(setting)}:{self._UISettings[setting].get()},'
         vals = vals.rstrip(',')
-        self._q_out.put(f'wVOG>{self._active_tab}>set_cfg>{vals}\n')
+        self._q_out.put(new_message('wVOG', self._active_tab, 'set_cfg', vals))
         self._clear_fields()
 
     def _clear_fields(self):
@@ -1,14 +1,14 @@
 from queue import SimpleQueue
 from tkinter import Tk, TclError
 from RSLogger.user_interface.wVOG_UI import wVOG_UIView, wVOG_UIConfig
+from RSLogger.utilities.message import Message, new_message
+from RSLogger.utilities import trace
 from numpy import nan
-from time import time_ns
 
 
 class WVOGUIController:
     def __init__(self, win, q_out, debug=False):
         self._debug = debug
-        if self._debug: print(f'{time_ns()} WVOGUIController.__init__')
 
         self._win: Tk = win
         self._q_2_hi: SimpleQueue = q_out
@@ -30,12 +30,14 @@ class WVOGUIController:
         self._active_tab = None
 
         self._view.register_rescan_network(self._rescan_network_cb)
+        self._view.register_pull_card(self._pull_card_cb)
 
         # Configure Window
         self._cnf_win = wVOG_UIConfig.VOGConfigWin(self._q_2_hi)
 
-    def handle_command(self, com, key, val):
-        if self._debug: print(f'{time_ns()} WVOGUIController.handle_command')
+    @trace.span
+    def handle_command(self, msg: Message):
+        com, key, val = msg.port, msg.key, msg.payload
 
         # Tab Events
         if key == 'devices':
@@ -57,17 +59,15 @@ class WVOGUIController:
 
         elif key == 'stm'    : self._update_stim_state(val, com)
 
+    @trace.span
     def handle_control_command(self, key, val):
-        if self._debug: print(f'{time_ns()} WVOGUIController.handle_control_command')
-
         if   key == 'init'    : self._log_init(val)
         elif key == 'close'   : self._log_close(val)
         elif key == 'start'   : self._data_record(val)
         elif key == 'stop'    : self._data_pause(val)
 
+    @trace.span
     def _update_devices(self, devices=None):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_devices')
-
         units = list()
         if devices:
             units = devices.split(",")
@@ -88,25 +88,22 @@ class WVOGUIController:
                     self.devices.pop(id_)
                     self._view.NB.forget(self._view.NB.children[id_.lower()])
 
+    @trace.span
     def _add_tab(self, dev_ids):
-        if self._debug: print(f'{time_ns()} WVOGUIController._add_tab')
-
         for id_ in dev_ids:
             if id_ not in self.devices:
                 self.devices[id_] = self._view.build_tab(id_)
 
+    @trace.span
     def _remove_tab(self, dev_ids):
-        if self._debug: print(f'{time_ns()} WVOGUIController._remove_tab')
-
         for id_ in dev_ids:
             if id_ in self.devices.keys():
                 self.devices.pop(id_)
                 self._view.NB.forget(self._view.NB.children[id_.lower()])
 
     # wVOG_UI Parent
+    @trace.span
     def _log_init(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._log_init')
-
         self._toggle_state('disabled')
         self._running = True
         for d in self.devices:
@@ -116,30 +113,26 @@ class WVOGUIController:
             self.devices[d]['plot'].run = True
             self._reset_results_text()
 
+    @trace.span
     def _log_close(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._log_close')
-
         self._running = False
         self._toggle_state('normal')
         for d in self.devices:
             self.devices[d]['plot'].run = False
 
+    @trace.span
     def _data_record(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._data_record')
-
         for d in self.devices:
             self.devices[d]['plot'].recording = True
 
+    @trace.span
     def _data_pause(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._data_pause')
-
         for d in self.devices:
             self.devices[d]['plot'].state_update(d, nan)
             self.devices[d]['plot'].recording = False
 
+    @trace.span
     def _toggle_state(self, state):
-        if self._debug: print(f'{time_ns()} WVOGUIController. _toggle_state')
-
         for d in self.devices:
 
             self.devices[d]['a_toggle'].configure(state=state)
@@ -151,14 +144,13 @@ class WVOGUIController:
             except KeyError:
                 pass
 
+    @trace.span
     def _update_file_path(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_file_path')
         pass
 
     # Registered Callbacks with wVOG UI
+    @trace.span
     def _tab_changed_cb(self, e):
-        if self._debug: print(f'{time_ns()} WVOGUIController._tab_changed_cb')
-
         if self.devices:
             try:
                 # Clean up old tab and device
@@ -169,40 +161,40 @@ class WVOGUIController:
                 # Start new tab and device
                 self._active_tab = self._view.NB.tab(self._view.NB.select(), "text")
                 if 'COM' not in self._active_tab:
-                    self._q_2_hi.put(f"wVOG>{self._active_tab}>get_bat>")
+                    self._q_2_hi.put(new_message('wVOG', self._active_tab, 'get_bat'))
                 if self._running:
                     self.devices[self._active_tab]['plot'].run = True
                     self.devices[self._active_tab]['plot'].clear_all()
             except Exception as e:
                 pass
 
+    @trace.span
     def _lens_change_cb(self, lens, state):
-        if self._debug: print(f'{time_ns()} WVOGUIController._lens_change_cb')
-
-        self._q_2_hi.put(f"wVOG>{self._active_tab}>{lens}_{state}>")
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, f'{lens}_{state}'))
 
+    @trace.span
     def _configure_button_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._configure_button_cb')
-
         self._cnf_win.show(self._active_tab)
-        self._q_2_hi.put(f"wVOG>{self._active_tab}>get_cfg>")
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, 'get_cfg'))
 
+    @trace.span
     def _rescan_network_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._rescan_network_cb')
-
         for c in self._view.NB.winfo_children():
             try:
                 self._view.NB.forget(c)
             except TclError:
                 pass
         self.devices.clear()
-        self._q_2_hi.put(f"wVOG>{self._active_tab}>net_scn>")
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, 'net_scn'))
         self._view.hide()
 
+    @trace.span
+    def _pull_card_cb(self):
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, 'mmc_pull'))
+
     # Messages from vog hardware
+    @trace.span
     def _update_tsot_plot(self, arg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_tsot_plot')
-
         if self._running:
             port = self._view.NB.tab(self._view.NB.select(), "text")
             device = self.devices[port]
@@ -216,89 +208,78 @@ class WVOGUIController:
             device['plot'].tsot_update(port, opened)
             device['plot'].tsct_update(port, closed)
 
+    @trace.span
     def _reset_results_text(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._reset_results_text')
-
         for d in self.devices:
             self._update_trial_text(d, '0')
             self._update_tsot_text(d, '0')
             self._update_tsct_text(d, '0')
 
+    @trace.span
     def _update_trial_text(self, unit_id, cnt):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_trial_text')
-
         if self._running:
             self.devices[unit_id]['trl_n'].set(cnt)
 
+    @trace.span
     def _update_tsot_text(self, unit_id, tsot):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_tsot_text')
-
         if self._running:
             self.devices[unit_id]['tsot'].set(tsot)
 
+    @trace.span
     def _update_tsct_text(self, unit_id, tsct):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_tsct_text')
-
         if self._running:
             self.devices[unit_id]['tsct'].set(tsct)
 
         # Plot Commands
 
+    @trace.span
     def _clear_plot(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._clear_plot')
-
         for d in self.devices:
             self.devices[d]['plot'].clear_all()
 
+    @trace.span
     def _stop_plotter(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._stop_plotter')
-
         for d in self.devices:
             self.devices[d]['plot'].run = False
 
+    @trace.span
     def _stimulus_a_toggle_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._stimulus_a_toggle_cb')
-
         com = self._view.NB.tab(self._view.NB.select(), 'text')
         if self.devices[com]['a_toggle']['text'] == 'A Open':
             self.devices[com]['a_toggle']['text'] = 'A Close'
-            self._q_2_hi.put(f"wVOG>{com}>stm_a>1")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_a', '1'))
         else:
             self.devices[com]['a_toggle']['text'] = 'A Open'
-            self._q_2_hi.put(f"wVOG>{com}>stm_a>0")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_a', '0'))
 
+    @trace.span
     def _stimulus_b_toggle_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._stimulus_b_toggle_cb')
-
         com = self._view.NB.tab(self._view.NB.select(), 'text')
         if self.devices[com]['b_toggle']['text'] == 'B Open':
             self.devices[com]['b_toggle']['text'] = 'B Close'
-            self._q_2_hi.put(f"wVOG>{com}>stm_b>1")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_b', '1'))
         else:
             self.devices[com]['b_toggle']['text'] = 'B Open'
-            self._q_2_hi.put(f"wVOG>{com}>stm_b>0")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_b', '0'))
 
+    @trace.span
     def _stimulus_ab_toggle_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._stimulus_ab_toggle_cb')
-
         com = self._view.NB.tab(self._view.NB.select(), 'text')
         if self.devices[com]['ab_toggle']['text'] == 'AB Open':
             self.devices[com]['ab_toggle']['text'] = 'AB Close'
-            self._q_2_hi.put(f"wVOG>{com}>stm_x>1")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_x', '1'))
         else:
             self.devices[com]['ab_toggle']['text'] = 'AB Open'
-            self._q_2_hi.put(f"wVOG>{com}>stm_x>0")
+            self._q_2_hi.put(new_message('wVOG', com, 'stm_x', '0'))
 
     # Plotter
+    @trace.span
     def _update_stim_state(self, arg, unit_id):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_stim_state')
-
         if self._running and unit_id in self.devices:
             self.devices[unit_id]['plot'].state_update(unit_id, arg)
 
+    @trace.span
     def _update_tsot_tsct_data(self, arg, unit_id):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_tsot_tsct_data')
-
         if self._running and unit_id in self.devices:
             trl_n, tsot, tsct, ttt, state, bat, utc = arg.strip().split(',')
             if unit_id == self._active_tab:
@@ -309,9 +290,8 @@ class WVOGUIController:
             self.devices[unit_id]['plot'].tsot_update(unit_id, tsot)
             self.devices[unit_id]['plot'].tsct_update(unit_id, tsct)
 
+    @trace.span
     def _update_battery_soc(self, arg, unit_id=None):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_battery_soc')
-
         if 'COM' not in unit_id:
             soc = arg
             if isinstance(arg, list):
@@ -326,18 +306,15 @@ class WVOGUIController:
 
     # Configuration Window
     # ---- Registered Callbacks
+    @trace.span
     def _custom_button_cb(self, msg):
-        if self._debug: print(f'{time_ns()} WVOGUIController._custom_button_cb')
-
-        self._q_2_hi.put(f"wVOG>{self._active_tab}>set_cfg>{msg}")
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, 'set_cfg', msg))
 
+    @trace.span
     def _nhtsa_button_cb(self):
-        if self._debug: print(f'{time_ns()} WVOGUIController._nhtsa_button_cb')
-
-        self._q_2_hi.put(f"wVOG>{self._active_tab}>set_nhtsa>")
+        self._q_2_hi.put(new_message('wVOG', self._active_tab, 'set_nhtsa'))
 
     # ---- msg from wVOG unit
+    @trace.span
     def _update_configuration(self, args):
-        if self._debug: print(f'{time_ns()} WVOGUIController._update_configuration')
-
         self._cnf_win.parse_config(args)
@@ -1,17 +1,17 @@
-import matplotlib.animation as animation
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import time
 
+from RSLogger.user_interface.plot_store import TimeSeriesStore
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
+from RSLogger.user_interface import strip_chart
+
 
 class Plotter:
     def __init__(self, frame):
-        # Chart
-        self._fig = Figure(figsize=(4, 2), dpi=100)
-        self._fig.suptitle("wVOG - Wireless Visual Occlusion Goggles")
-        self._canvas = FigureCanvasTkAgg(self._fig, master=frame)
-        self._canvas.get_tk_widget().grid(row=0, column=0, padx=2, pady=2, sticky='NEWS', rowspan=20)
+        # Chart; the figure and canvas come from the figure pool once the tab is shown
+        self._frame = frame
+        self._fig = None
+        self._canvas = None
 
         self._plt = list()
 
@@ -20,6 +20,9 @@ class Plotter:
         # Plot time
         self._time_array = np.arange(-60, 0, .1)
 
+        # Plot data, one series per line
+        self._store = TimeSeriesStore(len(self._time_array))
+
         # Plot tic
         self._next_update = time.time()
         self._interval = .1
@@ -28,41 +31,79 @@ class Plotter:
         self._tsot_now = dict()
         self._tsct_now = dict()
 
-        self._tst_array = dict()
         self._tst_xy = dict()
 
         self._tst_y_min = 0
         self._tst_y_max = 1
+        self._tst_yticks = np.arange(0, 3000, 1000)
+        self._tst_ylim = (0, 3000)
 
         self._plot_lines = set()
 
         # Stimulus State
         self._state_now = dict()
-        self._state_array = dict()
         self._state_xy = dict()
 
-        # Animation
-        self._ani = None
+        # (unit_id, name) of the lines hidden
+        self._hidden = set()
 
-        self._add_tsot_plot()
-        self._add_state_plot()
+        # Drawn by the render scheduler
+        self.dirty = True
+        self.redraw = False
 
         self.run = False
 
         self.recording = False
 
+        get_render_scheduler().add(self)
+
+    def attach(self, figure, canvas):
+        """ Draws the plot on a figure and canvas from the pool. """
+        self._fig = figure
+        self._canvas = canvas
+
+        self._fig.clear()
+        self._fig.suptitle("wVOG - Wireless Visual Occlusion Goggles")
+        self._add_tsot_plot()
+        self._add_state_plot()
+        for unit_id in self._unit_ids:
+            self._add_lines(unit_id)
+
+        widget = self._canvas.get_tk_widget()
+        widget.grid(in_=self._frame, row=0, column=0, padx=2, pady=2, sticky='NEWS', rowspan=20)
+        widget.lift()
+        self.redraw = True
+
+    def detach(self):
+        """ Hands the figure and canvas back; the data keeps being collected. """
+        self._canvas.get_tk_widget().grid_forget()
+        self._fig = None
+        self._canvas = None
+
+        self._plt.clear()
+        self._tst_xy.clear()
+        self._state_xy.clear()
+        self._plot_lines.clear()
+
     def _add_tsot_plot(self):
         self._plt.append(self._fig.add_subplot(212))
+        # X axes
+        self._plt[0].set_xticks([-60, -50, -40, -30, -20, -10, 0])
+        self._plt[0].set_xlim([-62, 2])
         # Y axes
         self._plt[0].set_ylabel("TSOT-TSCT")
         self._plt[0].yaxis.set_label_position('right')
         self._plt[0].yaxis.set_tick_params()
+        self._plt[0].set_yticks(self._tst_yticks)
+        self._plt[0].set_ylim(self._tst_ylim)
 
     def _add_state_plot(self):
         self._plt.append(self._fig.add_subplot(211))
 
         # X axes
         self._plt[1].xaxis.set_tick_params(labelbottom=False)
+        self._plt[1].set_xticks([-60, -50, -40, -30, -20, -10, 0])
+        self._plt[1].set_xlim([-62, 2])
         # Y axes
         self._plt[1].set_ylabel("State")
         self._plt[1].yaxis.set_label_position('right')
@@ -72,66 +113,42 @@ class Plotter:
 
 
     def set_tsot_and_state_lines(self, unit_id):
-        # RT LINE
-
         self._tsot_now[unit_id] = None
         self._tsct_now[unit_id] = None
+        self._store.add((unit_id, 'tsot'))
+        self._store.add((unit_id, 'tsct'))
+
+        self._state_now[unit_id] = np.nan
+        self._store.add((unit_id, 'state'))
 
-        self._tst_array[unit_id] = dict()
+        self._unit_ids.update([unit_id])
+        if self._fig is not None:
+            self._add_lines(unit_id)
+        self.dirty = True
+
+    def _add_lines(self, unit_id):
         self._tst_xy[unit_id] = dict()
 
         # TSOT
-        self._tst_array[unit_id]['tsot'] = np.empty([600])
-        self._tst_array[unit_id]['tsot'][:] = np.nan
-
         self._tst_xy[unit_id]['tsot'] = self._plt[0].\
-            plot(self._time_array, self._tst_array[unit_id]['tsot'], marker="o")
+            plot(self._time_array, self._store.view((unit_id, 'tsot')), marker="o", animated=True)
 
         c = self._tst_xy[unit_id]['tsot'][0].get_color()
 
         # TSCT
-        self._tst_array[unit_id]['tsct'] = np.empty([600])
-        self._tst_array[unit_id]['tsct'][:] = np.nan
-
         self._tst_xy[unit_id]['tsct'] = self._plt[0].\
-            plot(self._time_array, self._tst_array[unit_id]['tsct'], marker="_", color=c)
-
-        # ---- X axes - TST
-        self._plt[0].set_xticks([-60, -50, -40, -30, -20, -10, 0])
-        self._plt[0].set_xlim([-62, 2])
-        self._plt[0].set_yticks(np.arange(0, 3000, 1000))
-        self._plt[0].set_ylim([0, 3000])
+            plot(self._time_array, self._store.view((unit_id, 'tsct')), marker="_", color=c, animated=True)
 
         # STATE LINE
-        self._state_now[unit_id] = np.nan
-        self._state_array[unit_id] = np.empty([600])
-        self._state_array[unit_id][:] = np.nan
-
-        self._state_xy[unit_id] = self._plt[1].plot(self._time_array, self._state_array[unit_id], marker="")
-
-        # ---- X axes - State
-        self._plt[1].set_xticks([-60, -50, -40, -30, -20, -10, 0])
-        self._plt[1].set_xlim([-62, 2])
-
-        # RUN ANIMATION
-        if self._ani is None:
-            self._ani = animation.FuncAnimation(self._fig,
-                                                self._animate,
-                                                init_func=lambda prt=unit_id: self._init_animation(prt),
-                                                interval=10, blit=True, cache_frame_data=False)
-
-        self._unit_ids.update([unit_id])
-
-    def _init_animation(self, p):
-        self._state_xy[p][0].set_data(self._time_array, self._state_array[p])
-        self._tst_xy[p]['tsot'][0].set_data(self._time_array, self._tst_array[p]['tsot'])
-        self._tst_xy[p]['tsct'][0].set_data(self._time_array, self._tst_array[p]['tsct'])
+        self._state_xy[unit_id] = self._plt[1].plot(self._time_array, self._store.view((unit_id, 'state')), marker="",
+                                                    animated=True)
 
-        self._plot_lines.update(self._state_xy[p])
-        self._plot_lines.update(self._tst_xy[p]['tsot'])
-        self._plot_lines.update(self._tst_xy[p]['tsct'])
+        self._plot_lines.update(self._tst_xy[unit_id]['tsot'])
+        self._plot_lines.update(self._tst_xy[unit_id]['tsct'])
+        self._plot_lines.update(self._state_xy[unit_id])
 
-        return self._plot_lines
+        self._set_visible(unit_id, 'rt')
+        self._set_visible(unit_id, 'stim_state')
 
     def _animate(self, i):
         if self.run:
@@ -141,34 +158,33 @@ class Plotter:
 
                     self._rescale_y(self._tsot_now[unit_id], self._tsct_now[unit_id])
 
-                    # TST
-                    self._tst_array[unit_id]['tsot'] = np.roll(self._tst_array[unit_id]['tsot'], -1)
-                    self._tst_array[unit_id]['tsct'] = np.roll(self._tst_array[unit_id]['tsct'], -1)
-
+                    # TST; a tick without a value leaves a gap
                     if self._tsot_now[unit_id]:
-                        self._tst_array[unit_id]['tsot'][-1] = self._tsot_now[unit_id]
+                        self._store.set((unit_id, 'tsot'), self._tsot_now[unit_id])
 
                     if self._tsct_now[unit_id]:
-                        self._tst_array[unit_id]['tsct'][-1] = self._tsct_now[unit_id]
-
-                    self._tst_xy[unit_id]['tsot'][0].set_data(self._time_array, self._tst_array[unit_id]['tsot'])
-                    self._tst_xy[unit_id]['tsct'][0].set_data(self._time_array, self._tst_array[unit_id]['tsct'])
+                        self._store.set((unit_id, 'tsct'), self._tsct_now[unit_id])
 
                     self._tsot_now[unit_id] = np.nan
                     self._tsct_now[unit_id] = np.nan
 
-                    self._plot_lines.update(self._tst_xy[unit_id]['tsot'])
-                    self._plot_lines.update(self._tst_xy[unit_id]['tsct'])
-
                     # State
-                    self._state_array[unit_id] = np.roll(self._state_array[unit_id], -1)
-                    self._state_array[unit_id][-1] = self._state_now[unit_id]
+                    self._store.set((unit_id, 'state'), self._state_now[unit_id])
 
-                    self._state_xy[unit_id][0].set_data(self._time_array, self._state_array[unit_id])
+                # One column for every unit's lines, instead of rolling every array
+                self._store.tick()
+                if self._store.changing:
+                    self.dirty = True
 
-                    self._plot_lines.update(self._state_xy[unit_id])
+    def update_lines(self):
+        for unit_id in self._tst_xy:
+            self._set_line_data(unit_id)
 
-        return self._plot_lines
+    def _set_line_data(self, unit_id):
+        # Only y changes, the line copies what it is given
+        self._tst_xy[unit_id]['tsot'][0].set_ydata(self._store.view((unit_id, 'tsot')))
+        self._tst_xy[unit_id]['tsct'][0].set_ydata(self._store.view((unit_id, 'tsct')))
+        self._state_xy[unit_id][0].set_ydata(self._store.view((unit_id, 'state')))
 
     def _ready_to_update(self):
         t = time.time()
@@ -189,10 +205,13 @@ class Plotter:
                     if val >= self._tst_y_max:
                         val = round(val/1000) * 1000
                         tic_width = round(val/3/1000)*1000
-                        self._plt[0].set_yticks(np.arange(0, val*1.2, tic_width))
-                        self._plt[0].set_ylim(self._tst_y_min - .3, val * 1.2)
+                        self._tst_yticks = np.arange(0, val*1.2, tic_width)
+                        self._tst_ylim = (self._tst_y_min - .3, val * 1.2)
                         self._tst_y_max = val
-                        self._plt[0].figure.canvas.draw_idle()
+                        if self._plt:
+                            self._plt[0].set_yticks(self._tst_yticks)
+                            self._plt[0].set_ylim(self._tst_ylim)
+                            self.redraw = True
         except ZeroDivisionError:
             pass
 
@@ -208,37 +227,44 @@ class Plotter:
             self._state_now[unit_id] = val
 
     def clear_all(self):
-        for unit_id in self._state_array.keys():
+        self._store.clear()
+        for unit_id in self._unit_ids:
             self._state_now[unit_id] = np.nan
-            self._state_array[unit_id][:] = np.nan
-            self._state_xy[unit_id][0].set_data(self._time_array, self._state_array[unit_id])
-
-        for unit_id in self._tst_array.keys():
-            self._tst_array[unit_id]['tsot'][:] = np.nan
-            self._tst_array[unit_id]['tsct'][:] = np.nan
-            self._tst_xy[unit_id]['tsot'][0].set_data(self._time_array, self._tst_array[unit_id]['tsot'])
-            self._tst_xy[unit_id]['tsct'][0].set_data(self._time_array, self._tst_array[unit_id]['tsct'])
 
-        self._plt[0].figure.canvas.draw_idle()
+        self.dirty = True
 
     def remove_unit_id(self, unit_id):
-        self._state_array.pop(unit_id)
-        self._state_xy.pop(unit_id)
-        self._tst_array.pop(unit_id)
+        for series in ('tsot', 'tsct', 'state'):
+            self._store.remove((unit_id, series))
+        self._tst_xy.pop(unit_id, None)
+        self._state_xy.pop(unit_id, None)
         self._unit_ids.remove(unit_id)
 
     def hide_lines(self, unit_id, name=None):
-        if name == 'rt':
-            self._tst_xy[unit_id]['tsot'][0].set_visible(False)
-            self._tst_xy[unit_id]['tsct'][0].set_visible(False)
-        elif name == 'stim_state':
-            self._state_xy[unit_id][0].set_visible(False)
+        self._hidden.add((unit_id, name))
+        self._set_visible(unit_id, name)
 
     def show_lines(self, unit_id, name=None):
-        if name == 'rt':
-            self._tst_xy[unit_id]['tsot'][0].set_visible(True)
-            self._tst_xy[unit_id]['tsct'][0].set_visible(True)
-        elif name == 'stim_state':
-            self._state_xy[unit_id][0].set_visible(True)
-
-
+        self._hidden.discard((unit_id, name))
+        self._set_visible(unit_id, name)
+
+    def _set_visible(self, unit_id, name):
+        visible = (unit_id, name) not in self._hidden
+        if name == 'rt' and unit_id in self._tst_xy:
+            self._tst_xy[unit_id]['tsot'][0].set_visible(visible)
+            self._tst_xy[unit_id]['tsct'][0].set_visible(visible)
+        elif name == 'stim_state' and unit_id in self._state_xy:
+            self._state_xy[unit_id][0].set_visible(visible)
+        self.dirty = True
+
+
+class StripChart(strip_chart.StripChart, Plotter):
+    """ The same plot on a Tk canvas instead of a matplotlib figure. """
+    title = "wVOG - Wireless Visual Occlusion Goggles"
+    state_label = "State"
+    state_ticks = ("Opaque", "Clear")
+    data_label = "TSOT-TSCT"
+    markers = {'tsot': 'o', 'tsct': '_'}
+
+    def _data_y(self):
+        return tuple(self._tst_ylim), tuple(self._tst_yticks)
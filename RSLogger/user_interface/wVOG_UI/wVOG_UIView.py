@@ -2,6 +2,7 @@ import tkinter
 from tkinter.ttk import Label, LabelFrame, Button, Frame, Notebook
 from tkinter import Tk, StringVar, BOTH
 from RSLogger.user_interface.wVOG_UI import wVOG_UIPlotter
+from RSLogger.user_interface.render_scheduler import get_render_scheduler
 
 class wVOGTabbedControls:
     def __init__(self, win: Tk):
@@ -23,6 +24,7 @@ class wVOGTabbedControls:
         self._lens_ab_toggle_cb = None
         self._configure_clicked_cb = None
         self._rescan_network_cb = None
+        self._pull_card_cb = None
 
     ################################
     # Parent View overrides
@@ -64,7 +66,8 @@ class wVOGTabbedControls:
                 self.tab_f[f'b_{i}'].grid(row=0, column=i, sticky="NEWS", pady=2, padx=1)
 
     def _tab_add_plot(self, dev_id):
-        self.tab_f['plot'] = wVOG_UIPlotter.Plotter(self.tab_f['frame'])
+        plotter = wVOG_UIPlotter.StripChart if get_render_scheduler().backend == 'tk' else wVOG_UIPlotter.Plotter
+        self.tab_f['plot'] = plotter(self.tab_f['frame'])
         self.tab_f['plot'].set_tsot_and_state_lines(dev_id)
 
     def _tab_add_manual_controls(self):
@@ -115,6 +118,9 @@ class wVOGTabbedControls:
         if not 'COM' in id:
             self.tab_f['refresh'] = Button(f, text="Rescan Network", command=self._rescan_network_cb)
             self.tab_f['refresh'].grid(row=1, column=0, sticky='NEWS')
+        else:
+            self.tab_f['pull_card'] = Button(f, text="Pull Card Logs", command=self._pull_card_cb)
+            self.tab_f['pull_card'].grid(row=1, column=0, sticky='NEWS')
 
 
     ################################
@@ -134,6 +140,9 @@ class wVOGTabbedControls:
     def register_rescan_network(self, cb):
         self._rescan_network_cb = cb
 
+    def register_pull_card(self, cb):
+        self._pull_card_cb = cb
+
     def show(self):
         self._frame.pack(fill=BOTH, expand=1)
         self._frame.columnconfigure(0, weight=1)
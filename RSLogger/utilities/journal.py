@@ -0,0 +1,134 @@
+"""
+Write-ahead journal for the session text logs.
+
+Every chunk LogWriter appends to a session file is first appended to rslogger.journal in the same folder, together
+with a sequence number, the target file name, the byte offset it is written at and a CRC32. Only the journal is
+fsync'd on the short flush interval; the session files themselves are fsync'd at checkpoints (pause, close and
+every checkpoint_interval), after which the journal is emptied.
+
+If the app dies between checkpoints, recover() puts every intact journal record back at its offset, drops any
+partial trailing line the crash left in the target files and empties the journal. LogWriter runs it automatically
+before writing to a folder that still has a journal, and it can be run by hand:
+
+    python -m RSLogger.utilities.journal recover <session folder>
+"""
+import argparse
+import os
+import struct
+import zlib
+
+
+JOURNAL_NAME = 'rslogger.journal'
+
+# crc32, seq, offset, data length, target name length
+_RECORD = struct.Struct('<IQQIH')
+
+
+class Journal:
+    def __init__(self, folder):
+        self.path = os.path.join(folder, JOURNAL_NAME)
+        self._handle = open(self.path, 'ab')
+        self._seq = 0
+
+    def append(self, target, offset, data: bytes):
+        name = target.encode('utf-8')
+        body = _RECORD.pack(0, self._seq, offset, len(data), len(name))[4:] + name + data
+        self._handle.write(struct.pack('<I', zlib.crc32(body)) + body)
+        self._seq += 1
+
+    def sync(self):
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def checkpoint(self):
+        """ Call once every target file is fsync'd; the journaled records are no longer needed. """
+        self._handle.flush()
+        self._handle.truncate(0)
+        self._handle.seek(0)
+        os.fsync(self._handle.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self._handle.close()
+        os.remove(self.path)
+
+
+def read_records(path):
+    """ Returns the intact records of a journal file in order, stopping at the first torn or out of sequence one. """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    records = list()
+    offset = 0
+    expected_seq = None
+    while offset + _RECORD.size <= len(data):
+        crc, seq, target_offset, data_len, name_len = _RECORD.unpack_from(data, offset)
+        end = offset + _RECORD.size + name_len + data_len
+        if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+            break
+        if expected_seq is not None and seq != expected_seq:
+            break
+        name = data[offset + _RECORD.size:offset + _RECORD.size + name_len].decode('utf-8')
+        records.append((seq, name, target_offset, data[offset + _RECORD.size + name_len:end]))
+        expected_seq = seq + 1
+        offset = end
+    return records
+
+
+def needs_recovery(folder):
+    path = os.path.join(folder, JOURNAL_NAME)
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+def recover(folder):
+    """
+    Replays the journal in folder into its target files and removes it.
+    Returns {target: {'records': n, 'replayed': n, 'truncated_bytes': n}}.
+    """
+    path = os.path.join(folder, JOURNAL_NAME)
+    report = dict()
+    if not os.path.isfile(path):
+        return report
+
+    by_target = dict()
+    for seq, name, offset, data in read_records(path):
+        by_target.setdefault(name, []).append((offset, data))
+
+    for name, records in by_target.items():
+        target = os.path.join(folder, name)
+        replayed = 0
+        with open(target, 'r+b' if os.path.isfile(target) else 'w+b') as f:
+            for offset, data in records:
+                f.seek(offset)
+                if f.read(len(data)) != data:
+                    f.seek(offset)
+                    f.write(data)
+                    replayed += 1
+
+            # Anything after the last journaled byte is only kept up to its last complete line
+            end = max(offset + len(data) for offset, data in records)
+            f.seek(end)
+            tail = f.read()
+            keep = tail.rfind(b'\n') + 1
+            if keep < len(tail):
+                f.truncate(end + keep)
+            f.flush()
+            os.fsync(f.fileno())
+        report[name] = {'records': len(records), 'replayed': replayed, 'truncated_bytes': len(tail) - keep}
+
+    os.remove(path)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='RS Logger session journal')
+    parser.add_argument('command', choices=['recover'])
+    parser.add_argument('folder', help='Session folder')
+    args = parser.parse_args()
+
+    result = recover(args.folder)
+    if not result:
+        print('Nothing to recover')
+    for target, counts in result.items():
+        print(f"{target}: {counts['records']} journaled, {counts['replayed']} replayed, "
+              f"{counts['truncated_bytes']} bytes of partial line dropped")
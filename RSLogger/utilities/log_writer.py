@@ -0,0 +1,325 @@
+import locale
+import os
+from queue import SimpleQueue, Empty
+from threading import Thread, Event, Lock
+from time import perf_counter
+
+from RSLogger.utilities import trace, metrics
+from RSLogger.utilities.journal import Journal, needs_recovery, recover
+
+
+class LogWriter(Thread):
+    """
+    Single background writer for every session log file.
+
+    Lines are queued by any thread and written in order by this one. Each file is opened once and kept open, the
+    header is written only when the file is new, and buffered lines are flushed every flush_interval seconds, or
+    straight away when flush() or close_all() is called (e.g. on pause and close).
+
+    With journal=True (the default) every write is also appended to the session folder's write-ahead journal, and
+    only the journal is fsync'd on each flush. Session files are fsync'd at checkpoints: every checkpoint_interval
+    seconds, on flush() and on close_all(). See journal.
+
+    With binary=True, device trial logs (sDRT.txt, wDRT.txt, sVOG.txt, wVOG.txt) are also appended to a binary
+    session file next to them; see session_store.
+    """
+    def __init__(self, flush_interval=1.0, checkpoint_interval=30.0, buffer_size=65536, journal=True, binary=False,
+                 debug=False):
+        super().__init__(name='log_writer', daemon=True)
+        self._debug = debug
+
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.journal = journal
+        self.binary = binary
+        self._buffer_size = buffer_size
+
+        # Text mode equivalents, files are written as bytes so offsets can be tracked without flushing
+        self._encoding = locale.getpreferredencoding(False)
+        self._newline = os.linesep
+
+        self._q = SimpleQueue()
+        self._files = dict()
+        self._offsets = dict()
+        self._stores = dict()
+        self._journals = dict()
+        self._dirty = set()
+        self._unsynced = set()
+
+        # Counters
+        self._stats_lock = Lock()
+        self._lines = 0
+        self._bytes = 0
+        self._flushes = 0
+        self._checkpoints = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._recovered = dict()
+
+        # Runtime metrics, see metrics
+        self._wait_ms = metrics.histogram('log_queue_wait_ms')
+        self._flush_ms = metrics.histogram('log_flush_ms')
+        self._checkpoint_ms = metrics.histogram('log_checkpoint_ms')
+        metrics.gauge('log_pending').set_function(self._q.qsize)
+        metrics.gauge('log_lines').set_function(lambda: self._lines)
+        metrics.gauge('log_errors').set_function(lambda: self._errors)
+
+    ####################################################################################################################
+    # Called from any thread
+
+    def write(self, path, line, header=None):
+        """ Queue one line (without line ending) for path. header is written first if the file is new or empty. """
+        self._q.put(('line', path, line, header, perf_counter()))
+
+    def open_session(self, folder):
+        """ Recovers folder from its journal if the last session there did not close cleanly. """
+        self._q.put(('open', folder))
+
+    def flush(self, wait=False):
+        """ Flush and fsync every open file. """
+        self._request('flush', wait)
+
+    def close_all(self, wait=False):
+        """ Flush, fsync and close every open file. Later writes reopen them. """
+        self._request('close', wait)
+
+    def stats(self):
+        with self._stats_lock:
+            return {'lines': self._lines,
+                    'bytes': self._bytes,
+                    'flushes': self._flushes,
+                    'checkpoints': self._checkpoints,
+                    'errors': self._errors,
+                    'last_flush_ms': self._last_flush_ms,
+                    'max_flush_ms': self._max_flush_ms,
+                    'open_files': len(self._files),
+                    'pending': self._q.qsize(),
+                    'recovered': dict(self._recovered)}
+
+    def _request(self, cmd, wait):
+        done = Event()
+        self._q.put((cmd, done))
+        if wait:
+            done.wait(5)
+
+    ####################################################################################################################
+    # Writer thread
+
+    def run(self):
+        next_flush = perf_counter() + self.flush_interval
+        next_checkpoint = perf_counter() + self.checkpoint_interval
+        while True:
+            try:
+                # Wake for whichever is due first, a checkpoint is due even when nothing is left to flush
+                deadlines = [t for t, due in ((next_flush, self._dirty), (next_checkpoint, self._unsynced)) if due]
+                timeout = max(0.0, min(deadlines) - perf_counter()) if deadlines else None
+                item = self._q.get(timeout=timeout)
+                self._handle(item)
+                while True:
+                    self._handle(self._q.get_nowait())
+            except Empty:
+                pass
+
+            now = perf_counter()
+            if self._dirty and now >= next_flush:
+                self._flush()
+            if self._unsynced and now >= next_checkpoint:
+                self._checkpoint()
+            if not self._dirty:
+                next_flush = perf_counter() + self.flush_interval
+            if not self._unsynced:
+                next_checkpoint = perf_counter() + self.checkpoint_interval
+
+    def _handle(self, item):
+        cmd = item[0]
+        if cmd == 'line':
+            _, path, line, header, queued = item
+            self._wait_ms.observe((perf_counter() - queued) * 1000)
+            self._write(path, line, header)
+        elif cmd == 'open':
+            try:
+                self._journal_for(item[1])
+            except OSError as e:
+                print(f"Error when opening journal in {item[1]}: {e}")
+        elif cmd == 'flush':
+            self._flush()
+            self._checkpoint()
+            item[1].set()
+        elif cmd == 'close':
+            self._flush()
+            self._checkpoint()
+            self._close()
+            item[1].set()
+
+    def _write(self, path, line, header):
+        handle = self._files.get(path)
+        text = line + '\n'
+        try:
+            if handle is None:
+                journal = self._journal_for(os.path.dirname(path))
+                handle = open(path, 'ab', buffering=self._buffer_size)
+                self._files[path] = handle
+                self._offsets[path] = handle.tell()
+                if header and self._offsets[path] == 0:
+                    text = f'{header}\n{text}'
+            else:
+                journal = self._journals.get(os.path.dirname(path))
+
+            data = text.replace('\n', self._newline).encode(self._encoding, errors='replace')
+            if journal:
+                journal.append(os.path.basename(path), self._offsets[path], data)
+            handle.write(data)
+            self._offsets[path] += len(data)
+        except (PermissionError, FileNotFoundError, OSError) as e:
+            print(f"Error when writing to file {path}: {e}")
+            with self._stats_lock:
+                self._errors += 1
+            return
+
+        self._dirty.add(path)
+        self._unsynced.add(path)
+        with self._stats_lock:
+            self._lines += 1
+            self._bytes += len(data)
+
+        if self.binary:
+            self._write_binary(path, line, header)
+
+    def _journal_for(self, folder):
+        if not self.journal:
+            return None
+        if folder not in self._journals:
+            if needs_recovery(folder):
+                report = recover(folder)
+                print(f"Recovered session files in {folder}: {report}")
+                with self._stats_lock:
+                    self._recovered[folder] = report
+            self._journals[folder] = Journal(folder)
+        return self._journals[folder]
+
+    def _write_binary(self, path, line, header):
+        store = self._stores.get(path)
+        if store is None:
+            # Only sessions with binary=True need session_store and numpy
+            from RSLogger.utilities.session_store import SessionStoreWriter, binary_path, device_type_for
+
+            if not (device_type := device_type_for(path)):
+                return
+            try:
+                store = SessionStoreWriter(binary_path(path), device_type, header or '')
+            except OSError as e:
+                print(f"Error when opening binary store for {path}: {e}")
+                return
+            self._stores[path] = store
+        store.append_line(line)
+
+    @trace.span
+    def _flush(self):
+        """ Hands buffered lines to the OS. Only the journals are fsync'd, or every file when journaling is off. """
+        if not self._dirty:
+            return
+
+        t_0 = perf_counter()
+        for path in self._dirty:
+            handles = [self._files[path]]
+            if store := self._stores.get(path):
+                handles.append(store)
+            try:
+                for handle in handles:
+                    handle.flush()
+                    if not self.journal:
+                        os.fsync(handle.fileno())
+            except (OSError, ValueError) as e:
+                print(f"Error when flushing file {path}: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+        for folder, journal in self._journals.items():
+            try:
+                journal.sync()
+            except OSError as e:
+                print(f"Error when syncing journal in {folder}: {e}")
+        if not self.journal:
+            self._unsynced.clear()
+        self._dirty.clear()
+        flush_ms = (perf_counter() - t_0) * 1000
+
+        with self._stats_lock:
+            self._flushes += 1
+            self._last_flush_ms = flush_ms
+            self._max_flush_ms = max(self._max_flush_ms, flush_ms)
+        self._flush_ms.observe(flush_ms)
+
+    @trace.span
+    def _checkpoint(self):
+        """ fsyncs every file written since the last checkpoint, then empties the journals. """
+        if not self._unsynced:
+            return
+
+        t_0 = perf_counter()
+        for path in self._unsynced:
+            handles = [self._files[path]] if path in self._files else []
+            if store := self._stores.get(path):
+                handles.append(store)
+            try:
+                for handle in handles:
+                    os.fsync(handle.fileno())
+            except (OSError, ValueError) as e:
+                print(f"Error when syncing file {path}: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                return  # Keep the journal until the files are safely on disk
+        self._unsynced.clear()
+
+        for folder, journal in self._journals.items():
+            try:
+                journal.checkpoint()
+            except OSError as e:
+                print(f"Error when emptying journal in {folder}: {e}")
+        with self._stats_lock:
+            self._checkpoints += 1
+        self._checkpoint_ms.observe((perf_counter() - t_0) * 1000)
+
+    def _close(self):
+        for path, handle in self._files.items():
+            try:
+                handle.close()
+            except OSError as e:
+                print(f"Error when closing file {path}: {e}")
+        self._files.clear()
+        self._offsets.clear()
+
+        for path, store in self._stores.items():
+            try:
+                store.close()
+            except OSError as e:
+                print(f"Error when closing binary store for {path}: {e}")
+        self._stores.clear()
+
+        for folder, journal in self._journals.items():
+            try:
+                journal.close()
+            except OSError as e:
+                print(f"Error when closing journal in {folder}: {e}")
+        self._journals.clear()
+
+
+_log_writer = None
+_log_writer_lock = Lock()
+
+
+def get_log_writer() -> LogWriter:
+    """ Returns the process wide LogWriter, starting it on first use. """
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter()
+            _log_writer.start()
+    return _log_writer
+
+
+def use_log_writer(writer):
+    """ Makes writer the process wide log writer, e.g. a stand-in passing the lines to another process's writer. """
+    global _log_writer
+    with _log_writer_lock:
+        _log_writer = writer
@@ -0,0 +1,39 @@
+from itertools import count
+from time import time
+from typing import NamedTuple
+
+
+# Devices whose firmware separates key and value with something other than '>'
+LINE_SEPARATORS = {'sVOG': '|'}
+
+_sequence = count()
+
+
+class Message(NamedTuple):
+    """
+    Record passed through q_2_hi and q_2_ui.
+
+    device:    device type ('sDRT', 'wDRT', 'sVOG', 'wVOG'), 'all' for broadcasts or 'xbee' for dongle status
+    port:      COM port or XBee node ID, 'all' for broadcasts, 'ui' for messages addressed to the user interface
+    key:       command or data key (e.g. 'start', 'trl', 'dta')
+    payload:   everything after the key, never split by the transport
+    timestamp: host time in seconds when the record was created or the line arrived
+    seq:       process wide sequence number
+    """
+    device: str
+    port: str
+    key: str
+    payload: str = ''
+    timestamp: float = 0.0
+    seq: int = 0
+
+
+def new_message(device, port, key, payload='', timestamp=None) -> Message:
+    return Message(device, port, key, payload, time() if timestamp is None else timestamp, next(_sequence))
+
+
+def parse_device_line(device, port, line: bytes, timestamp) -> Message:
+    """ Parses one line received from a device, e.g. b'trl>1234,5,678\\r\\n', into a Message. """
+    text = line.decode('utf-8', errors='replace').strip()
+    key, _, payload = text.partition(LINE_SEPARATORS.get(device, '>'))
+    return Message(device, port, key, payload, timestamp, next(_sequence))
@@ -0,0 +1,245 @@
+"""
+Process wide registry of runtime metrics: counters, gauges and histograms.
+
+A metric is identified by its name and labels and is created the first time it is asked for; asking again returns the
+same object, so a hot path looks its metric up once and keeps it:
+
+    from RSLogger.utilities import metrics
+
+    lines = metrics.counter('device_lines', device='sDRT', port='COM3')
+    lines.inc()
+
+    metrics.gauge('q_2_ui_depth').set_function(q_2_ui.qsize)  # read when the metrics are collected
+    metrics.histogram('log_flush_ms').observe(flush_ms)
+
+Updating a metric takes an uncontended lock and never allocates. Counters only ever grow; rates are worked out by
+whoever reads them, from two snapshots and their 'time'.
+
+snapshot() returns everything as a dict, and serve() makes it available over HTTP on the loopback interface, or on a
+Unix socket where there are any, as JSON at /metrics.json and in the Prometheus text format at /metrics:
+
+    curl http://127.0.0.1:9464/metrics.json
+    curl --unix-socket /tmp/rs_metrics.sock http://localhost/metrics
+"""
+import threading
+from bisect import bisect_left
+from time import monotonic, time
+
+# Upper bounds of the default histogram buckets, in ms
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_metrics = dict()
+_metrics_lock = threading.Lock()
+_sources = list()
+_started = monotonic()
+
+
+class Counter:
+    """ Count of events since the process started. """
+    kind = 'counter'
+    __slots__ = ('name', 'labels', '_value', '_lock')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self._value += n
+
+    def collect(self):
+        return self._value
+
+
+class Gauge:
+    """ Value that goes up and down, either set() by its owner or read from a function when it is collected. """
+    kind = 'gauge'
+    __slots__ = ('name', 'labels', '_value', '_function')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, fn):
+        """ fn is called on the collecting thread and has to be cheap and thread safe, like Queue.qsize. """
+        self._function = fn
+
+    def collect(self):
+        if self._function is None:
+            return self._value
+        try:
+            return self._function()
+        except Exception:
+            # Its owner has gone away
+            return None
+
+
+class Histogram:
+    """ Distribution of observed values over fixed buckets, with their count, sum and maximum. """
+    kind = 'histogram'
+    __slots__ = ('name', 'labels', 'buckets', '_counts', '_count', '_sum', '_max', '_lock')
+
+    def __init__(self, name, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # The last one counts values above every bucket
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def collect(self):
+        with self._lock:
+            counts = list(self._counts)
+            result = {'count': self._count, 'sum': self._sum, 'max': self._max}
+        result['buckets'] = dict(zip([*self.buckets, 'inf'], counts))
+        for q in (50, 90, 99):
+            result[f'p{q}'] = self._quantile(counts, result['count'], result['max'], q / 100)
+        return result
+
+    def _quantile(self, counts, count, max_, q):
+        """ Upper bound of the bucket the q quantile falls in, at most the largest value observed. """
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, max_)
+        return max_
+
+
+def _get(cls, name, labels, **options):
+    key = (name, tuple(sorted(labels.items())))
+    metric = _metrics.get(key)
+    if metric is None:
+        with _metrics_lock:
+            metric = _metrics.get(key)
+            if metric is None:
+                metric = _metrics[key] = cls(name, dict(key[1]), **options)
+    if not isinstance(metric, cls):
+        raise TypeError(f"Metric {name} is a {metric.kind}, not a {cls.kind}")
+    return metric
+
+
+def counter(name: str, **labels) -> Counter:
+    return _get(Counter, name, labels)
+
+
+def gauge(name: str, **labels) -> Gauge:
+    return _get(Gauge, name, labels)
+
+
+def histogram(name: str, buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+    """ buckets only applies when the histogram is created. """
+    return _get(Histogram, name, labels, buckets=buckets)
+
+
+def remove(name: str, **labels):
+    """ Forgets a metric, e.g. the gauges of a camera that was unplugged. """
+    with _metrics_lock:
+        _metrics.pop((name, tuple(sorted(labels.items()))), None)
+
+
+def add_source(fn):
+    """
+    Adds the metrics fn returns, as a list in the form of snapshot()['metrics'], to every snapshot. This is how the
+    metrics of another process, e.g. the hardware process, are shown with this one's.
+    """
+    _sources.append(fn)
+
+
+def snapshot() -> dict:
+    """
+    Every metric's current value, as {'time': ..., 'uptime': ..., 'metrics': [{name, kind, labels, value}, ...]}.
+    time is time.monotonic(), for working out rates from two snapshots.
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    collected = [{'name': m.name, 'kind': m.kind, 'labels': m.labels, 'value': m.collect()} for m in metrics]
+    for source in _sources:
+        collected.extend(source())
+    return {'time': monotonic(),
+            'wall_time': time(),
+            'uptime': monotonic() - _started,
+            'metrics': collected}
+
+
+def rates(previous: dict, current: dict, name: str) -> dict:
+    """ Per second rate of every counter called name between two snapshots, by its labels as a sorted tuple. """
+    dt = current['time'] - previous['time']
+    before = {tuple(sorted(m['labels'].items())): m['value'] for m in previous['metrics'] if m['name'] == name}
+    result = dict()
+    for m in current['metrics']:
+        if m['name'] == name and dt > 0:
+            labels = tuple(sorted(m['labels'].items()))
+            result[labels] = (m['value'] - before.get(labels, 0)) / dt
+    return result
+
+
+def prometheus(snap=None) -> str:
+    """ snapshot() in the Prometheus text exposition format. """
+    snap = snap or snapshot()
+
+    def labels_text(labels, **extra):
+        items = {**labels, **extra}
+        if not items:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items.items()) + '}'
+
+    lines = list()
+    typed = set()
+    for m in sorted(snap['metrics'], key=lambda m: m['name']):
+        name, value = f"rs_{m['name']}", m['value']
+        if value is None:
+            continue
+        if name not in typed:
+            lines.append(f"# TYPE {name} {m['kind']}")
+            typed.add(name)
+        if m['kind'] == 'histogram':
+            cumulative = 0
+            for bound, n in value['buckets'].items():
+                cumulative += n
+                le = '+Inf' if bound == 'inf' else bound
+                lines.append(f"{name}_bucket{labels_text(m['labels'], le=le)} {cumulative}")
+            lines.append(f"{name}_sum{labels_text(m['labels'])} {value['sum']}")
+            lines.append(f"{name}_count{labels_text(m['labels'])} {value['count']}")
+        else:
+            lines.append(f"{name}{labels_text(m['labels'])} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+########################################################################################################################
+# Endpoint
+
+def serve(address='127.0.0.1:9464'):
+    """
+    Serves the metrics from a daemon thread. address is host:port, or a port (0 picks a free one) on the loopback
+    interface, or the path of a Unix socket. Returns the server; its server_address says where it listens and
+    shutdown() stops it.
+    """
+    # http.server is only imported when the metrics are served
+    from RSLogger.utilities import metrics_server
+    return metrics_server.serve(str(address))
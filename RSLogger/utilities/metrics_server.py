@@ -0,0 +1,59 @@
+""" HTTP endpoint of the metrics registry, see metrics.serve. """
+import json
+import os
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from RSLogger.utilities import metrics
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path in ('/', '/metrics.json'):
+            body, content_type = json.dumps(metrics.snapshot()).encode(), 'application/json'
+        elif path == '/metrics':
+            body, content_type = metrics.prometheus().encode(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            request, _ = super().get_request()
+            return request, ('unix', 0)
+
+
+def serve(address: str):
+    """ See metrics.serve. """
+    if ':' in address or address.isdigit():
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _Handler)
+        server.daemon_threads = True
+    else:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError("Unix sockets are not available here, serve on host:port instead")
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _UnixHTTPServer(address, _Handler)
+    threading.Thread(target=server.serve_forever, name='metrics_server', daemon=True).start()
+    return server
+
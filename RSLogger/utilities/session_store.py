@@ -0,0 +1,252 @@
+"""
+Compact binary copy of the session text logs (sDRT.rsb next to sDRT.txt, etc.).
+
+File layout, little endian:
+    file header:  magic b'RSLB', u16 version, 16s device type, u16 length of the text header, text header (utf-8)
+    segment:      magic b'SEG1', u16 device id length, u16 label length, u32 record count, u16 record size,
+                  device id (utf-8), label (utf-8), record count fixed width records
+
+Segments are only ever appended. A segment cut short by a crash is cut off the file when it is next opened for
+writing, so a later session's segments follow the last complete one. For files already written past a torn segment,
+the reader only takes a segment whose records end where the file or the next segment magic begins, and otherwise skips
+ahead to the next segment magic. The binary file is not in the session journal: after a crash it may lack the last
+segments the text log has.
+
+    python -m RSLogger.utilities.session_store to-csv <session folder or .rsb file>
+"""
+import argparse
+import os
+import struct
+from typing import NamedTuple, Tuple
+
+import numpy as np
+
+
+FILE_MAGIC = b'RSLB'
+SEGMENT_MAGIC = b'SEG1'
+VERSION = 1
+
+_FILE_HEADER = struct.Struct('<4sH16sH')
+_SEGMENT_HEADER = struct.Struct('<4sHHIH')
+
+# struct code -> numpy dtype
+_DTYPES = {'d': '<f8', 'q': '<i8', 'I': '<u4', 'i': '<i4', '1s': 'S1'}
+
+
+class RecordSchema(NamedTuple):
+    """ Fields of one trial record, in the same order as the data columns of the text log. """
+    fields: Tuple[Tuple[str, str], ...]
+
+    @property
+    def struct(self):
+        return struct.Struct('<' + ''.join(code for _, code in self.fields))
+
+    @property
+    def dtype(self):
+        return np.dtype([(name, _DTYPES[code]) for name, code in self.fields])
+
+
+SCHEMAS = {
+    'sDRT': RecordSchema((('unix_time', 'd'), ('ms_since_record', 'q'), ('trial', 'I'), ('responses', 'I'),
+                          ('rt', 'i'))),
+    'wDRT': RecordSchema((('unix_time', 'd'), ('ms_since_record', 'q'), ('trial', 'I'), ('responses', 'I'),
+                          ('rt', 'i'), ('battery', 'i'), ('device_utc', 'q'))),
+    'sVOG': RecordSchema((('unix_time', 'd'), ('trial', 'I'), ('shutter_open', 'i'), ('shutter_closed', 'i'))),
+    'wVOG': RecordSchema((('unix_time', 'd'), ('trial', 'I'), ('shutter_open', 'i'), ('shutter_closed', 'i'),
+                          ('shutter_total', 'i'), ('transition', '1s'), ('battery', 'i'), ('device_utc', 'q'))),
+}
+
+
+def binary_path(text_path):
+    """ sDRT.txt -> sDRT.rsb """
+    return os.path.splitext(text_path)[0] + '.rsb'
+
+
+def device_type_for(text_path):
+    """ Device type of a session text log, or None if it has no binary schema. """
+    name = os.path.splitext(os.path.basename(text_path))[0]
+    return name if name in SCHEMAS else None
+
+
+class SessionStoreWriter:
+    """
+    Appends text log lines to a binary session file. Lines are parsed and packed as they arrive and written as one
+    segment per device and label on flush().
+    """
+    def __init__(self, path, device_type, text_header=''):
+        self.path = path
+        self.device_type = device_type
+        self._schema = SCHEMAS[device_type]
+        self._struct = self._schema.struct
+        self._n_fields = len(self._schema.fields)
+        self._converters = [float if code == 'd' else str.encode if code == '1s' else int
+                            for _, code in self._schema.fields]
+
+        self._pending = dict()
+        self.skipped = 0
+
+        self._handle = open(path, 'ab')
+        if self._handle.tell():
+            self._truncate_torn_tail()
+        if self._handle.tell() == 0:
+            header = text_header.encode('utf-8')
+            self._handle.write(_FILE_HEADER.pack(FILE_MAGIC, VERSION, device_type.encode('ascii'), len(header)))
+            self._handle.write(header)
+
+    def _truncate_torn_tail(self):
+        """ Cuts off whatever follows the last complete segment, e.g. a segment torn by a crash. """
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        try:
+            end = _scan(data, self._struct.size)[2]
+        except ValueError:
+            # Not even a whole file header
+            end = 0
+        if end < len(data):
+            print(f"Dropping {len(data) - end} bytes of a torn segment at the end of {self.path}")
+            self._handle.truncate(end)
+            self._handle.seek(end)
+
+    def append_line(self, line):
+        """ Packs one text log line ('device id,label,field,field,...'). Returns False if it does not parse. """
+        try:
+            head, *values = line.rsplit(',', self._n_fields)
+            device_id, _, label = head.partition(',')
+            record = self._struct.pack(*[conv(v.strip()) for conv, v in zip(self._converters, values)])
+        except (ValueError, struct.error):
+            self.skipped += 1
+            return False
+
+        self._pending.setdefault((device_id, label), []).append(record)
+        return True
+
+    def flush(self):
+        if self._pending:
+            for (device_id, label), records in self._pending.items():
+                id_b, label_b = device_id.encode('utf-8'), label.encode('utf-8')
+                self._handle.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(id_b), len(label_b), len(records),
+                                                        self._struct.size))
+                self._handle.write(id_b)
+                self._handle.write(label_b)
+                self._handle.write(b''.join(records))
+            self._pending.clear()
+        self._handle.flush()
+
+    def fileno(self):
+        return self._handle.fileno()
+
+    def close(self):
+        self.flush()
+        self._handle.close()
+
+
+def _scan(data, record_size=None):
+    """ The file header and complete segments of data, and the offset just past the last complete segment. """
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError('file header cut short')
+    magic, version, device_type, header_len = _FILE_HEADER.unpack_from(data, 0)
+    if magic != FILE_MAGIC:
+        raise ValueError('not an RS Logger binary session file')
+    offset = _FILE_HEADER.size + header_len
+    if offset > len(data):
+        raise ValueError('file header cut short')
+    header = (device_type.rstrip(b'\x00').decode('ascii'), data[_FILE_HEADER.size:offset].decode('utf-8'))
+    if record_size is None:
+        record_size = SCHEMAS[header[0]].struct.size
+
+    segments = list()
+    end = offset
+    while offset + _SEGMENT_HEADER.size <= len(data):
+        magic, id_len, label_len, count, size = _SEGMENT_HEADER.unpack_from(data, offset)
+        start = offset + _SEGMENT_HEADER.size + id_len + label_len
+        stop = start + count * size
+        # A complete segment ends the file, or is followed by the next one (or the start of one cut short). A
+        # segment cut short in its records that was appended to afterwards reaches into the next segment instead
+        follows = data[stop:stop + len(SEGMENT_MAGIC)]
+        if magic != SEGMENT_MAGIC or size != record_size or stop > len(data) or not SEGMENT_MAGIC.startswith(follows):
+            # Segment cut short; skip to the next one, if anything was appended after it
+            offset = data.find(SEGMENT_MAGIC, offset + 1)
+            if offset < 0:
+                break
+            continue
+        id_start = offset + _SEGMENT_HEADER.size
+        device_id = data[id_start:id_start + id_len].decode('utf-8', errors='replace')
+        label = data[id_start + id_len:start].decode('utf-8', errors='replace')
+        segments.append((device_id, label, count, memoryview(data)[start:stop]))
+        offset = end = stop
+
+    return header, segments, end
+
+
+def _read_segments(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    try:
+        (device_type, text_header), segments, _ = _scan(data)
+    except ValueError as e:
+        raise ValueError(f'{path}: {e}')
+    return device_type, text_header, segments
+
+
+def read_session(path) -> np.ndarray:
+    """ Reads a .rsb file into one structured array: the record fields followed by device_id and label columns. """
+    device_type, _, segments = _read_segments(path)
+    record_dtype = SCHEMAS[device_type].dtype
+    size = record_dtype.itemsize
+
+    id_width = max((len(s[0]) for s in segments), default=1) or 1
+    label_width = max((len(s[1]) for s in segments), default=1) or 1
+
+    # Record fields keep their packed offsets so every segment is copied as raw bytes
+    names = list(record_dtype.names) + ['device_id', 'label']
+    formats = [record_dtype.fields[n][0] for n in record_dtype.names] + [f'U{id_width}', f'U{label_width}']
+    offsets = [record_dtype.fields[n][1] for n in record_dtype.names] + [size, size + 4 * id_width]
+    out = np.empty(sum(s[2] for s in segments),
+                   dtype=np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                                   'itemsize': size + 4 * (id_width + label_width)}))
+    raw = out.view(np.uint8).reshape(len(out), out.dtype.itemsize)
+
+    i = 0
+    for device_id, label, count, buffer in segments:
+        raw[i:i + count, :size] = np.frombuffer(buffer, dtype=np.uint8).reshape(count, size)
+        out['device_id'][i:i + count] = device_id
+        out['label'][i:i + count] = label
+        i += count
+    return out
+
+
+def to_csv(path, out_path=None):
+    """
+    Converts a .rsb file back to the text log layout. Segments group records by device, so rows are put back in
+    arrival order by their host timestamp (the first field). Returns the path written.
+    """
+    device_type, text_header, segments = _read_segments(path)
+    schema = SCHEMAS[device_type]
+    out_path = out_path or os.path.splitext(path)[0] + '_converted.txt'
+
+    rows = list()
+    for device_id, label, count, buffer in segments:
+        for record in schema.struct.iter_unpack(buffer):
+            values = [v.decode('ascii') if isinstance(v, bytes) else repr(v) if isinstance(v, float) else str(v)
+                      for v in record]
+            rows.append((record[0], f"{device_id},{label},{','.join(values)}\n"))
+    rows.sort(key=lambda r: r[0])
+
+    with open(out_path, 'w') as writer:
+        if text_header:
+            writer.write(text_header + '\n')
+        writer.writelines(row for _, row in rows)
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='RS Logger binary session files')
+    parser.add_argument('command', choices=['to-csv'])
+    parser.add_argument('path', help='Session folder or .rsb file')
+    args = parser.parse_args()
+
+    paths = [args.path] if os.path.isfile(args.path) else \
+        [os.path.join(args.path, f) for f in sorted(os.listdir(args.path)) if f.endswith('.rsb')]
+    for p in paths:
+        print(to_csv(p))
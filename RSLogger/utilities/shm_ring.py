@@ -0,0 +1,216 @@
+"""
+Single producer, single consumer ring buffer of Messages in shared memory, for passing records between processes
+without locks or pickling.
+
+The block starts with a 64 byte header (positions, record counts and a wakeup flag) followed by the records. A record
+is its length as a u32 and the encoded Message; a record that does not fit before the end of the block is written at
+its start, after a wrap marker. Positions only ever grow; a position modulo the capacity is an offset into the data.
+The writer only moves the write position and the reader only the read position, so neither ever waits for the other.
+
+Reading an empty ring would mean polling, so the writer also sends one byte over a pipe when it writes to a ring the
+reader has gone to sleep on (the wakeup flag is clear), like WakeupQueue only asks for one wakeup per burst.
+
+    ring = ShmRing.create(1 << 22)                              # in the parent
+    writer = RingWriter(ShmRing.attach(ring.name), wake_send)   # in the producing process
+    reader = RingReader(ring, wake_recv)                        # in the consuming process
+    writer.put(msg)
+    for msg in reader.drain(): ...
+
+Only the producing process may write and only the consuming one read. Threads of the producing process may share
+a RingWriter, its put() serializes them.
+"""
+import struct
+import threading
+from multiprocessing import shared_memory
+from time import monotonic, sleep
+
+from RSLogger.utilities.message import Message
+
+_HEADER = 64
+_HEAD = 0   # u64 write position
+_TAIL = 8   # u64 read position
+_WAKE = 16  # u32, set by the writer when it sends a wakeup, cleared by the reader before it drains
+_WRITTEN = 24  # u64 records written
+_READ = 32  # u64 records read
+
+_LENGTH = struct.Struct('<I')
+_POSITION = struct.Struct('<Q')
+_FIXED = struct.Struct('<dQ')  # timestamp, seq
+_WRAP = 0xFFFFFFFF
+_SEPARATOR = '\x1f'
+
+
+def encode(msg: Message) -> bytes:
+    text = _SEPARATOR.join((msg.device, msg.port, msg.key, str(msg.payload)))
+    return _FIXED.pack(msg.timestamp, msg.seq) + text.encode('utf-8', errors='replace')
+
+
+def decode(data) -> Message:
+    timestamp, seq = _FIXED.unpack_from(data)
+    device, port, key, payload = bytes(data[_FIXED.size:]).decode('utf-8').split(_SEPARATOR, 3)
+    return Message(device, port, key, payload, timestamp, seq)
+
+
+class ShmRing:
+    """ The shared memory block. capacity is the size of the data part in bytes. """
+    def __init__(self, shm: shared_memory.SharedMemory, owner=False):
+        self._shm = shm
+        self._owner = owner
+        self.name = shm.name
+        self.buf = shm.buf
+        self.capacity = shm.size - _HEADER
+
+    @classmethod
+    def create(cls, capacity=1 << 22):
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER + capacity)
+        shm.buf[:_HEADER] = bytes(_HEADER)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the block with the resource tracker too. Processes started by the
+            # creator share its tracker, which only keeps one registration per block, so the creator's unlink still
+            # ends it
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm)
+
+    def close(self):
+        self.buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def position(self, offset):
+        return _POSITION.unpack_from(self.buf, offset)[0]
+
+    def set_position(self, offset, value):
+        _POSITION.pack_into(self.buf, offset, value)
+
+
+class RingWriter:
+    """
+    Producer side. When the ring is full put() waits up to wait_s (or its timeout) for the reader to make room, then
+    drops the record. Drops are counted and printed at most once a second.
+    """
+    def __init__(self, ring: ShmRing, wake_conn, wait_s=0.05):
+        self._ring = ring
+        self._wake_conn = wake_conn
+        self._lock = threading.Lock()
+        self.wait_s = wait_s
+        self.dropped = 0
+        self._reported = 0
+        self._next_report = 0.0
+
+    def put(self, msg: Message, block=True, timeout=None):
+        data = encode(msg)
+        deadline = None
+        while True:
+            if self._write(data):
+                return True
+            if not block:
+                break
+            now = monotonic()
+            if deadline is None:
+                deadline = now + (self.wait_s if timeout is None else timeout)
+            elif now >= deadline:
+                break
+            # Not holding the lock, other threads can still write once there is room
+            sleep(0.001)
+
+        self._drop()
+        return False
+
+    def _write(self, data):
+        ring, buf, capacity = self._ring, self._ring.buf, self._ring.capacity
+        size = _LENGTH.size + len(data)
+
+        with self._lock:
+            head = ring.position(_HEAD)
+            free = capacity - (head - ring.position(_TAIL))
+            offset = head % capacity
+            skip = capacity - offset if capacity - offset < size else 0
+            if size + skip > free:
+                return False
+
+            if skip:
+                if skip >= _LENGTH.size:
+                    _LENGTH.pack_into(buf, _HEADER + offset, _WRAP)
+                offset = 0
+            _LENGTH.pack_into(buf, _HEADER + offset, len(data))
+            start = _HEADER + offset + _LENGTH.size
+            buf[start:start + len(data)] = data
+            # Publish the record before looking at the flag, see RingReader.drain
+            ring.set_position(_HEAD, head + skip + size)
+            ring.set_position(_WRITTEN, ring.position(_WRITTEN) + 1)
+
+            if not _LENGTH.unpack_from(buf, _WAKE)[0]:
+                _LENGTH.pack_into(buf, _WAKE, 1)
+                try:
+                    self._wake_conn.send_bytes(b'w')
+                except (OSError, ValueError):
+                    # Reader has gone away
+                    pass
+        return True
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+            now = monotonic()
+            if now < self._next_report:
+                return
+            self._next_report = now + 1
+            n, self._reported = self.dropped - self._reported, self.dropped
+        print(f"Ring to the UI full, {n} records dropped ({self.dropped} in total)")
+
+    def put_nowait(self, msg):
+        return self.put(msg, block=False)
+
+    def qsize(self):
+        """ Records waiting to be read. """
+        return self._ring.position(_WRITTEN) - self._ring.position(_READ)
+
+
+class RingReader:
+    """ Consumer side. """
+    def __init__(self, ring: ShmRing, wake_conn):
+        self._ring = ring
+        self._wake_conn = wake_conn
+
+    def wait(self, timeout=None) -> bool:
+        """ Blocks until the writer sends a wakeup, for at most timeout seconds. False if the writer has gone away. """
+        try:
+            if self._wake_conn.poll(timeout):
+                while self._wake_conn.poll(0):
+                    self._wake_conn.recv_bytes()
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def drain(self):
+        """ Yields every record written so far. """
+        ring, buf, capacity = self._ring, self._ring.buf, self._ring.capacity
+
+        # Cleared before the write position is read, so a record published after this either is read below or
+        # makes the writer send another wakeup
+        _LENGTH.pack_into(buf, _WAKE, 0)
+
+        tail = ring.position(_TAIL)
+        head = ring.position(_HEAD)
+        read = ring.position(_READ)
+        while tail < head:
+            offset = tail % capacity
+            if capacity - offset < _LENGTH.size or _LENGTH.unpack_from(buf, _HEADER + offset)[0] == _WRAP:
+                tail += capacity - offset
+                continue
+            length = _LENGTH.unpack_from(buf, _HEADER + offset)[0]
+            start = _HEADER + offset + _LENGTH.size
+            msg = decode(buf[start:start + length])
+            tail += _LENGTH.size + length
+            read += 1
+            ring.set_position(_TAIL, tail)
+            ring.set_position(_READ, read)
+            yield msg
+        ring.set_position(_TAIL, tail)
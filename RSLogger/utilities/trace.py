@@ -0,0 +1,209 @@
+"""
+Low-overhead tracing for profiling a running session.
+
+Spans (a function call, with its duration) and instant events are recorded into a ring buffer of the thread they
+happen on. Every ring is preallocated when its thread records its first event, and a slot holds only the
+perf_counter_ns time stamp, the duration, an event ID and an optional argument, so recording never formats text,
+never allocates a buffer and never takes a lock. Event names are registered once, when a module is imported, and
+only their IDs are recorded. Once a ring is full the oldest events are overwritten.
+
+Tracing is off until enable() is called and can be turned on and off at any time; while it is off a traced function
+only costs its wrapper's call and one global check. dump() writes everything recorded as a Chrome trace, which opens in Perfetto
+(ui.perfetto.dev) or chrome://tracing.
+
+    from RSLogger.utilities import trace
+
+    _RECEIVED = trace.register('UsbPortScanner.received')
+
+    class Reader:
+        @trace.span
+        def handle(self, line):
+            trace.event(_RECEIVED, line)
+
+    trace.enable()
+    ...
+    trace.dump('rs_trace.json')
+
+A dump taken while other threads are still recording may show a few of their newest events twice or not at all.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+from time import perf_counter_ns
+
+# Read by every trace point; only enable() and disable() change it
+enabled = False
+
+_INSTANT = -1
+
+_names = list()
+_ids = dict()
+_names_lock = threading.Lock()
+
+_rings = list()
+_rings_lock = threading.Lock()
+_local = threading.local()
+_capacity = 1 << 16
+
+
+class _Ring:
+    """ Preallocated slots of one thread. Only its own thread writes to it. """
+    __slots__ = ('thread_id', 'thread_name', 'ts', 'dur', 'ids', 'args', 'mask', 'next', 'count')
+
+    def __init__(self, capacity):
+        thread = threading.current_thread()
+        self.thread_id = thread.native_id
+        self.thread_name = thread.name
+        self.ts = [0] * capacity
+        self.dur = [0] * capacity
+        self.ids = [0] * capacity
+        self.args = [None] * capacity
+        self.mask = capacity - 1  # capacity is a power of two
+        self.next = 0
+        self.count = 0
+
+    def snapshot(self):
+        """ Slots in the order they were written, oldest first. """
+        capacity = len(self.ts)
+        n = min(self.count, capacity)
+        start = (self.next - n) % capacity
+        order = [(start + i) % capacity for i in range(n)]
+        return [(self.ts[i], self.dur[i], self.ids[i], self.args[i]) for i in order]
+
+
+def _ring() -> _Ring:
+    try:
+        return _local.ring
+    except AttributeError:
+        ring = _local.ring = _Ring(_capacity)
+        with _rings_lock:
+            _rings.append(ring)
+        return ring
+
+
+def _record(id_, ts, dur, arg):
+    ring = _ring()
+    i = ring.next
+    ring.ts[i] = ts
+    ring.dur[i] = dur
+    ring.ids[i] = id_
+    ring.args[i] = arg
+    ring.next = (i + 1) & ring.mask
+    ring.count += 1
+
+
+########################################################################################################################
+# Trace points
+
+def register(name: str) -> int:
+    """ Returns the ID of an event or span name, registering it the first time. """
+    with _names_lock:
+        if name not in _ids:
+            _ids[name] = len(_names)
+            _names.append(name)
+        return _ids[name]
+
+
+def event(id_: int, arg=None):
+    """ Records an instant event. arg is kept as it is and only turned into text by dump(). """
+    if enabled:
+        _record(id_, perf_counter_ns(), _INSTANT, arg)
+
+
+def span(fn=None, *, name=None):
+    """
+    Decorator recording every call of fn as a span named after its qualified name, e.g. 'HWRoot.distribute_message'.
+    Works for plain and async functions; an async span lasts until the coroutine returns.
+    """
+    if fn is None:
+        return lambda f: span(f, name=name)
+
+    id_ = register(name or fn.__qualname__)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if not enabled:
+                return await fn(*args, **kwargs)
+            t_0 = perf_counter_ns()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _record(id_, t_0, perf_counter_ns() - t_0, None)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return fn(*args, **kwargs)
+        t_0 = perf_counter_ns()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(id_, t_0, perf_counter_ns() - t_0, None)
+    return wrapper
+
+
+########################################################################################################################
+# Control
+
+def enable(capacity=None):
+    """
+    Starts recording. capacity (events per thread) is rounded up to a power of two and only applies to rings created
+    after the call.
+    """
+    global enabled, _capacity
+    if capacity:
+        _capacity = 1 << (capacity - 1).bit_length()
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def clear():
+    """ Forgets everything recorded so far, and the rings of threads that have ended. """
+    alive = {t.native_id for t in threading.enumerate()}
+    with _rings_lock:
+        _rings[:] = [ring for ring in _rings if ring.thread_id in alive]
+        for ring in _rings:
+            ring.next = ring.count = 0
+
+
+def stats():
+    with _rings_lock:
+        return {'enabled': enabled,
+                'threads': len(_rings),
+                'events': sum(min(ring.count, len(ring.ts)) for ring in _rings),
+                'overwritten': sum(max(0, ring.count - len(ring.ts)) for ring in _rings)}
+
+
+def dump(path) -> int:
+    """ Writes everything recorded as Chrome trace JSON to path and returns the number of events. """
+    pid = os.getpid()
+    with _rings_lock:
+        rings = list(_rings)
+    with _names_lock:
+        names = list(_names)
+
+    trace_events = list()
+    for ring in rings:
+        trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': ring.thread_id,
+                             'args': {'name': ring.thread_name}})
+        for ts, dur, id_, arg in ring.snapshot():
+            entry = {'name': names[id_], 'pid': pid, 'tid': ring.thread_id, 'ts': ts / 1000}
+            if dur == _INSTANT:
+                entry.update(ph='i', s='t')
+            else:
+                entry.update(ph='X', dur=dur / 1000)
+            if arg is not None:
+                entry['args'] = {'arg': str(arg)}
+            trace_events.append(entry)
+
+    with open(path, 'w') as outfile:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, outfile)
+    return len(trace_events) - len(rings)
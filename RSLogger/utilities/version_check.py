@@ -0,0 +1,76 @@
+import json
+import os
+from threading import Thread
+from time import time
+
+
+class VersionCheck:
+    """
+    Looks up the most recent released version on a background thread, so startup never waits for the network.
+
+    The answer is kept in a small JSON file and reused for max_age_hours, so most launches do not go online at all:
+
+        {"latest": "1.3", "checked": 1700000000.0}
+
+    When the lookup fails (e.g. offline) the last answer is used however old it is, or None if there is none.
+    """
+    URL = "https://raw.githubusercontent.com/redscientific/RS_Logger/master/version.txt"
+    DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.rslogger', 'version_check.json')
+
+    def __init__(self, path=None, max_age_hours=24, timeout=5.0, debug=False):
+        self._debug = debug
+
+        self.path = path or self.DEFAULT_PATH
+        self._max_age = max_age_hours * 3600
+        self._timeout = timeout
+
+    def start(self, done_cb):
+        """ Calls done_cb(latest_version or None) once, from the background thread. """
+        Thread(target=lambda: done_cb(self.latest()), name='version_check', daemon=True).start()
+
+    def latest(self):
+        cached = self._load()
+        if cached and time() - cached.get('checked', 0) < self._max_age:
+            return cached.get('latest')
+
+        # Only imported once a lookup is needed
+        import urllib.request
+        from urllib.error import URLError
+        try:
+            with urllib.request.urlopen(self.URL, timeout=self._timeout) as response:
+                latest = response.read().decode('utf-8').strip()
+        except (URLError, OSError, ValueError) as e:
+            if self._debug: print(f"VersionCheck.latest lookup failed: {e}")
+            return cached.get('latest') if cached else None
+
+        self._save({'latest': latest, 'checked': time()})
+        return latest
+
+    @staticmethod
+    def is_newer(version, current):
+        """ Compares dotted version numbers, e.g. '1.10' is newer than '1.9'. """
+        def parts(v):
+            try:
+                return tuple(int(p) for p in v.split('.'))
+            except ValueError:
+                return tuple()
+        return bool(version) and parts(version) > parts(current)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            return cached if isinstance(cached, dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, cached):
+        """ The file is replaced in one step so a crash never leaves half of it. """
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(cached, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Error when saving version check cache {self.path}: {e}")
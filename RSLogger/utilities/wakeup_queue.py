@@ -0,0 +1,46 @@
+from queue import SimpleQueue, Empty
+
+
+class WakeupQueue(SimpleQueue):
+    """
+    SimpleQueue that notifies its consumer when something is put, so the consumer never has to poll empty().
+
+    The consumer registers a waker with set_waker() - e.g. loop.call_soon_threadsafe for an asyncio loop or a TkWaker
+    for the Tk mainloop - and empties the queue with drain(). A wakeup is only requested when none is pending, so a
+    burst of puts costs a single wakeup.
+    """
+    def __init__(self):
+        super().__init__()
+        self._waker = None
+        self._wake_pending = False
+
+    def set_waker(self, waker):
+        self._waker = waker
+        self._wake_pending = False
+        if not self.empty():
+            self._wake()
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item)
+        if self._waker is not None and not self._wake_pending:
+            self._wake()
+
+    def put_nowait(self, item):
+        self.put(item)
+
+    def drain(self):
+        """ Yields everything queued so far. Items put while draining are either yielded or trigger a new wakeup. """
+        self._wake_pending = False
+        while True:
+            try:
+                yield self.get_nowait()
+            except Empty:
+                return
+
+    def _wake(self):
+        self._wake_pending = True
+        try:
+            self._waker()
+        except RuntimeError:
+            # Consumer loop is shutting down
+            self._wake_pending = False
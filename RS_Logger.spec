@@ -9,7 +9,9 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('rs_icon.ico', '.'), ('RSLogger\\img\\questionmark_15.png', 'RSLogger\\img'), ('RSLogger\\img\\record.png', 'RSLogger\\img'), ('RSLogger\\img\\pause.png', 'RSLogger\\img'), ('RSLogger\\img\\rs_icon.ico', 'RSLogger\\img')],
-    hiddenimports=[],
+    # Imported by name when the first device of the type connects, see UIController.DEVICE_UI
+    hiddenimports=['RSLogger.user_interface.sDRT_UI.sDRT_UIController', 'RSLogger.user_interface.wDRT_UI.wDRT_UIController',
+                   'RSLogger.user_interface.wVOG_UI.wVOG_UIController', 'RSLogger.user_interface.sVOG_UI.sVOG_UIController'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,106 @@
+"""
+Round-trip latency between the Tk thread and the HWRoot asyncio loop (needs a display for Tk).
+
+'poll'   reproduces the original bridge: the asyncio side checks SimpleQueue.empty() every 1 ms and the Tk side
+         reschedules itself with win.after(10, ...).
+'wakeup' uses WakeupQueue in both directions: loop.call_soon_threadsafe into the asyncio loop and a TkWaker
+         virtual event into the mainloop.
+
+The Tk side puts a command on q_2_hi, the asyncio side echoes it back on q_2_ui, and the time until the Tk handler
+sees the echo is recorded.
+
+Run from the repository root:
+    python -m benchmarks.bridge_latency_bench --trips 500
+"""
+import argparse
+import asyncio
+import random
+from queue import SimpleQueue
+from threading import Thread
+from time import perf_counter
+from tkinter import Tk
+
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+from RSLogger.user_interface.tk_waker import TkWaker
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _hi_thread(mode, q_2_hi, q_2_ui):
+    async def poll():
+        while True:
+            if not q_2_hi.empty():
+                q_2_ui.put(q_2_hi.get())
+            await asyncio.sleep(0.001)
+
+    async def wakeup():
+        loop = asyncio.get_running_loop()
+
+        def handler():
+            for msg in q_2_hi.drain():
+                q_2_ui.put(msg)
+
+        q_2_hi.set_waker(lambda: loop.call_soon_threadsafe(handler))
+        await asyncio.Event().wait()
+
+    asyncio.run(poll() if mode == 'poll' else wakeup())
+
+
+def run(mode, trips):
+    queue_type = SimpleQueue if mode == 'poll' else WakeupQueue
+    q_2_hi, q_2_ui = queue_type(), queue_type()
+    Thread(target=_hi_thread, args=(mode, q_2_hi, q_2_ui), daemon=True).start()
+
+    win = Tk()
+    win.withdraw()
+    results = list()
+
+    def receive():
+        now = perf_counter()
+        if mode == 'wakeup':
+            messages = list(q_2_ui.drain())
+        else:
+            messages = list()
+            while not q_2_ui.empty():
+                messages.append(q_2_ui.get())
+        for sent in messages:
+            results.append(now - sent)
+        if len(results) >= trips:
+            win.quit()
+
+    def send():
+        q_2_hi.put(perf_counter())
+        if len(results) < trips:
+            win.after(random.randint(5, 15), send)
+
+    if mode == 'poll':
+        def poll_ui():
+            receive()
+            win.after(10, poll_ui)
+        win.after(0, poll_ui)
+    else:
+        win.bind('<<q_2_ui>>', lambda e: receive())
+        win.after(0, lambda: q_2_ui.set_waker(TkWaker(win, '<<q_2_ui>>')))
+
+    win.after(200, send)
+    win.mainloop()
+    win.destroy()
+    return [r * 1000 for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trips', type=int, default=500)
+    args = parser.parse_args()
+
+    for mode in ('poll', 'wakeup'):
+        ms = run(mode, args.trips)
+        print(f'{mode:7s} round trip ms:  p50 {_percentile(ms, 50):7.3f}  p90 {_percentile(ms, 90):7.3f}  '
+              f'p99 {_percentile(ms, 99):7.3f}  max {max(ms):7.3f}')
+
+
+if __name__ == '__main__':
+    main()
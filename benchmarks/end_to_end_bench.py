@@ -0,0 +1,466 @@
+"""
+End-to-end latency and throughput of the host, driven by the simulator's pty backed devices (Linux or macOS).
+
+Three latencies are measured from the host timestamp a device line gets when it arrives on its port:
+    durable   until the CSV row it ends up in is on disk (the LogWriter flush that syncs it has returned)
+    ui        until the UI dispatch hands the message to the device's UI controller (handle_command)
+    plot      until the plotter's animation frame sets the line data that shows it (--tk only)
+
+For every device count the simulated devices are run at each --speeds factor in turn, until a step is no longer
+sustainable: a record was lost, ui p99 went over --max-ms, or durable p99 went over the flush interval plus --max-ms.
+The fastest sustainable step gives the device count's max sustainable message rate (device lines per second). When
+a higher speed no longer makes the devices send more, the ramp stops there and the rate is what the simulator could
+send rather than the host's limit; such steps are marked simulator_limited.
+
+Every step runs in a fresh host process (HWRoot, LogWriter and the UI side, like main.py) with the simulated devices in
+a child process of their own, so the CPU time of the host and of the simulator are reported separately. Without --tk
+the UI side only drains q_2_ui and times the dispatch; with --tk (needs a display) the real device UI controllers and
+plotters run in a Tk window.
+
+sDRT rows are only written when the unit's next trial starts, so sDRT durable latency includes an inter-stimulus
+interval.
+
+The results are written as JSON to --output; --compare prints the changes from an earlier results file.
+
+Run from the repository root:
+    python -m benchmarks.end_to_end_bench --device wDRT --devices 1,2,4,8,16,32,64 --output e2e.json
+    python -m benchmarks.end_to_end_bench --compare e2e_1.3.json --output e2e.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from time import time, sleep, perf_counter
+
+
+RECORD_KEYS = {'sDRT': 'trl', 'wDRT': 'dta', 'sVOG': 'data', 'wVOG': 'dta'}
+LOG_FILES = {'sDRT': 'sDRT.txt', 'wDRT': 'wDRT.txt', 'sVOG': 'sVOG.txt', 'wVOG': 'wVOG.txt'}
+UI_CONTROLLERS = {'sDRT': ('RSLogger.user_interface.sDRT_UI.sDRT_UIController', 'sDRTUIController',
+                           'RSLogger.user_interface.sDRT_UI.sDRT_UIPlotter'),
+                  'wDRT': ('RSLogger.user_interface.wDRT_UI.wDRT_UIController', 'WDRTUIController',
+                           'RSLogger.user_interface.wDRT_UI.wDRT_UIPlotter'),
+                  'sVOG': ('RSLogger.user_interface.sVOG_UI.sVOG_UIController', 'sVOGUIController',
+                           'RSLogger.user_interface.sVOG_UI.sVOG_UIPlotter'),
+                  'wVOG': ('RSLogger.user_interface.wVOG_UI.wVOG_UIController', 'WVOGUIController',
+                           'RSLogger.user_interface.wVOG_UI.wVOG_UIPlotter')}
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _summary(seconds):
+    """ Percentiles in ms, or None when nothing was measured. """
+    if not seconds:
+        return None
+    ms = [s * 1000 for s in seconds]
+    return {'n': len(ms), 'p50': round(_percentile(ms, 50), 3), 'p90': round(_percentile(ms, 90), 3),
+            'p99': round(_percentile(ms, 99), 3), 'max': round(max(ms), 3)}
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system
+
+
+########################################################################################################################
+# Simulator process
+
+def _simulator(device, n, speed, seed, conn):
+    from RSLogger.simulator.fleet import Fleet
+
+    fleet = Fleet(wired={device: n}, seed=seed, speed=speed)
+    fleet.start()
+
+    # Lines each device sends, by key; written on the simulator loop thread only
+    sent = Counter()
+    separator = '|' if device == 'sVOG' else '>'
+    for dev in fleet.wired:
+        def counted(data, write=dev._write):
+            sent[data.decode(errors='replace').partition(separator)[0]] += 1
+            write(data)
+        dev._write = counted
+
+    conn.send(fleet.comports())
+    cpu_0 = lines_0 = 0
+    while (cmd := conn.recv()) != 'stop':
+        if cmd == 'begin':
+            cpu_0, lines_0 = _cpu_seconds(), sum(sent.values())
+        elif cmd == 'end':
+            conn.send({'cpu_s': _cpu_seconds() - cpu_0, 'lines': sum(sent.values()) - lines_0})
+
+    fleet.stop()
+    conn.send({'records': sent[RECORD_KEYS[device]], 'pty_overflows': fleet.stats()['pty_overflows']})
+
+
+########################################################################################################################
+# Host process
+
+class _DurableProbe:
+    """ Offsets of the log file each LogWriter flush made durable, and when that flush returned. """
+    def __init__(self, writer, path):
+        self.path = path
+        self.flushes = list()
+
+        flush = writer._flush
+
+        def timed_flush():
+            offset = writer._offsets.get(path)
+            flush()
+            if offset is not None:
+                self.flushes.append((offset, time()))
+        writer._flush = timed_flush
+
+    def latencies(self, t_begin, t_end):
+        """ Latency of each row whose line arrived in the window. Rows that were never flushed are left out. """
+        if not os.path.exists(self.path):
+            return [], 0
+        offsets = [offset for offset, _ in self.flushes]
+        latencies, rows, end = list(), 0, 0
+        with open(self.path, 'rb') as infile:
+            infile.readline()
+            end = infile.tell()
+            for line in infile:
+                end += len(line)
+                rows += 1
+                try:
+                    arrived = float(line.split(b',', 3)[2])
+                except (IndexError, ValueError):
+                    continue
+                i = bisect_left(offsets, end)
+                if t_begin <= arrived < t_end and i < len(offsets):
+                    latencies.append(self.flushes[i][1] - arrived)
+        return latencies, rows
+
+
+class _PlotProbe:
+    """
+    Times from a message's arrival to the animation frame that sets the plot data it updated. The plotter's update
+    methods note the arrival time of the message being dispatched; a frame is one where _animate moved the plotter's
+    next update tick.
+    """
+    UPDATES = ('rt_update', 'state_update', 'tsot_update', 'tsct_update')
+
+    def __init__(self, plotter_cls):
+        self.arrival = None
+        self.pending = defaultdict(list)
+        self.latencies = list()
+
+        for name in self.UPDATES:
+            if hasattr(plotter_cls, name):
+                setattr(plotter_cls, name, self._update(getattr(plotter_cls, name)))
+        plotter_cls._animate = self._animate(plotter_cls._animate)
+
+    def _update(self, method):
+        def update(plotter, *args):
+            if self.arrival is not None:
+                self.pending[id(plotter)].append(self.arrival)
+            return method(plotter, *args)
+        return update
+
+    def _animate(self, method):
+        def animate(plotter, i):
+            tick = plotter._next_update
+            lines = method(plotter, i)
+            if plotter._next_update != tick and (pending := self.pending.pop(id(plotter), None)):
+                now = time()
+                self.latencies.extend(now - t for t in pending)
+            return lines
+        return animate
+
+
+def _host(device, n, speed, options, conn):
+    from RSLogger.hardware_io.hi_controller import HWRoot
+    from RSLogger.utilities.log_writer import get_log_writer
+    from RSLogger.utilities.message import new_message
+    from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+    ctx = multiprocessing.get_context('spawn')
+    sim_conn, child_conn = ctx.Pipe()
+    simulator = ctx.Process(target=_simulator, args=(device, n, speed, options['seed'], child_conn), daemon=True)
+    simulator.start()
+    ports = sim_conn.recv()
+
+    session = tempfile.mkdtemp(prefix='rs_e2e_')
+    writer = get_log_writer()
+    writer.flush_interval = options['flush_interval']
+    durable = _DurableProbe(writer, f"{session}/{LOG_FILES[device]}")
+
+    queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
+    hw = HWRoot(queues, autostart=False, list_ports=lambda: ports)
+    threading.Thread(target=hw.launch, name='hw_root', daemon=True).start()
+
+    window = {'begin': None, 'end': None}
+    ui_latencies = list()
+    ui_messages = Counter()
+    result = dict()
+
+    # UI side, in the main thread like UIController
+    controllers, plot, win = dict(), None, None
+    if options['tk']:
+        from importlib import import_module
+        from tkinter import Tk
+        from RSLogger.user_interface.tk_waker import TkWaker
+
+        module, cls, plotter_module = UI_CONTROLLERS[device]
+        plot = _PlotProbe(import_module(plotter_module).Plotter)
+        win = Tk()
+        win.title(f'{device} x {n} at speed {speed}')
+        controllers[device] = getattr(import_module(module), cls)(win, queues['q_2_hi'])
+
+    def control(key, val=''):
+        for controller in controllers.values():
+            controller.handle_control_command(key, val)
+
+    def dispatch():
+        for msg in queues['q_2_ui'].drain():
+            if msg.device == 'bench':
+                if msg.key == 'quit':
+                    return False
+                control(msg.key, msg.payload)
+                continue
+
+            measured = window['begin'] is not None and window['begin'] <= msg.timestamp < (window['end'] or 1e18)
+            if measured and msg.port != 'ui':
+                ui_latencies.append(time() - msg.timestamp)
+                ui_messages[msg.key] += 1
+            if controller := controllers.get(msg.device):
+                if plot:
+                    plot.arrival = msg.timestamp if measured and msg.port != 'ui' else None
+                controller.handle_command(msg)
+        return True
+
+    def to_hi(key, payload=''):
+        queues['q_2_hi'].put(new_message('all', 'all', key, payload))
+        queues['q_2_ui'].put(new_message('bench', 'ui', key, payload))
+
+    def drive():
+        t_0 = perf_counter()
+        while len(hw.RS_devices.get(device, {})) < n and perf_counter() - t_0 < options['attach_timeout']:
+            sleep(0.05)
+        result['attached'] = len(hw.RS_devices.get(device, {}))
+        result['attach_s'] = round(perf_counter() - t_0, 3)
+
+        if result['attached'] == n:
+            writer.open_session(session)
+            for key, payload in (('fpath', session), ('init', ''), ('start', '')):
+                to_hi(key, payload)
+                sleep(0.2)
+            sleep(options['warmup'])
+
+            sim_conn.send('begin')
+            cpu_0, window['begin'] = _cpu_seconds(), time()
+            sleep(options['seconds'])
+            window['end'], cpu_1 = time(), _cpu_seconds()
+            sim_conn.send('end')
+            sim = sim_conn.recv()
+            elapsed = window['end'] - window['begin']
+
+            # Rows from the window are made durable by the writer's own flushes, not the one on close
+            sleep(writer.flush_interval + 0.5)
+            to_hi('stop')
+            sleep(0.5)
+            to_hi('close')
+            writer.close_all(wait=True)
+
+            result.update({'seconds': round(elapsed, 3),
+                           'lines_per_s': round(sim['lines'] / elapsed, 1),
+                           'ui_messages_per_s': round(sum(ui_messages.values()) / elapsed, 1),
+                           'cpu_percent': {'host': round((cpu_1 - cpu_0) / elapsed * 100, 1),
+                                           'simulator': round(sim['cpu_s'] / elapsed * 100, 1)}})
+
+        sim_conn.send('stop')
+        totals = sim_conn.recv() if sim_conn.poll(5) else {'records': 0, 'pty_overflows': 0}
+        if window['end']:
+            latencies, rows = durable.latencies(window['begin'], window['end'])
+            result.update({'records_sent': totals['records'],
+                           'records_logged': rows,
+                           'lost': max(0, totals['records'] - rows),
+                           'pty_overflows': totals['pty_overflows'],
+                           'latency_ms': {'durable': _summary(latencies),
+                                          'ui': _summary(ui_latencies),
+                                          'plot': _summary(plot.latencies) if plot else None}})
+        queues['q_2_ui'].put(new_message('bench', 'ui', 'quit'))
+
+    threading.Thread(target=drive, name='bench', daemon=True).start()
+
+    if win:
+        def tk_dispatch():
+            if not dispatch():
+                win.quit()
+        win.bind('<<q_2_ui>>', lambda e: tk_dispatch())
+        win.after(0, lambda: queues['q_2_ui'].set_waker(TkWaker(win, '<<q_2_ui>>')))
+        win.mainloop()
+        win.destroy()
+    else:
+        wake = threading.Event()
+        queues['q_2_ui'].set_waker(wake.set)
+        while True:
+            wake.wait()
+            wake.clear()
+            if not dispatch():
+                break
+
+    simulator.join(5)
+    conn.send(result)
+
+
+########################################################################################################################
+# Steps
+
+def _run_step(device, n, speed, options):
+    ctx = multiprocessing.get_context('spawn')
+    conn, child_conn = ctx.Pipe()
+    host = ctx.Process(target=_host, args=(device, n, speed, options, child_conn))
+    host.start()
+    limit = options['attach_timeout'] + options['warmup'] + options['seconds'] + options['flush_interval'] + 30
+    result = conn.recv() if conn.poll(limit) else {'attached': 0, 'error': 'step timed out'}
+    host.join(5)
+    if host.is_alive():
+        host.terminate()
+
+    result.update({'devices': n, 'speed': speed})
+    if result.get('attached') != n:
+        result.setdefault('error', f"{result.get('attached', 0)} of {n} devices attached")
+    result['sustainable'] = _sustainable(result, options)
+    return result
+
+
+def _sustainable(result, options):
+    if 'error' in result or result.get('lost'):
+        return False
+    latency = result['latency_ms']
+    if not latency['ui'] or latency['ui']['p99'] > options['max_ms']:
+        return False
+    if latency['durable'] and latency['durable']['p99'] > options['flush_interval'] * 1000 + options['max_ms']:
+        return False
+    return True
+
+
+def _print_step(r):
+    if 'error' in r:
+        print(f"{r['devices']:4d} devices  speed {r['speed']:6g}  {r['error']}")
+        return
+    latency = {k: f"{v['p50']:8.2f} /{v['p99']:8.2f}" if v else f"{'-':>18}" for k, v in r['latency_ms'].items()}
+    print(f"{r['devices']:4d} devices  speed {r['speed']:6g}  {r['lines_per_s']:9.0f} lines/s  "
+          f"durable {latency['durable']}  ui {latency['ui']}  plot {latency['plot']}  "
+          f"cpu host {r['cpu_percent']['host']:5.1f}% sim {r['cpu_percent']['simulator']:5.1f}%  "
+          f"lost {r['lost']}{'' if r['sustainable'] else '  NOT SUSTAINABLE'}")
+
+
+def _max_sustainable(steps):
+    best = dict()
+    for r in steps:
+        if r['sustainable'] and r['lines_per_s'] > best.get(r['devices'], {}).get('lines_per_s', -1):
+            best[r['devices']] = {'devices': r['devices'], 'speed': r['speed'], 'lines_per_s': r['lines_per_s']}
+    return [best[n] for n in sorted(best)]
+
+
+def _compare(old, new):
+    print(f"\nCompared with {old.get('version')} ({old.get('commit') or 'unknown commit'}):")
+    old_best = {r['devices']: r['lines_per_s'] for r in old.get('max_sustainable', [])}
+    for r in new['max_sustainable']:
+        if before := old_best.get(r['devices']):
+            print(f"{r['devices']:4d} devices  max sustainable {before:9.0f} -> {r['lines_per_s']:9.0f} lines/s  "
+                  f"({(r['lines_per_s'] - before) / before * 100:+.1f}%)")
+
+    old_steps = {(r['devices'], r['speed']): r for r in old.get('steps', []) if 'latency_ms' in r}
+    for r in new['steps']:
+        if 'latency_ms' not in r or (before := old_steps.get((r['devices'], r['speed']))) is None:
+            continue
+        changes = list()
+        for stage, now in r['latency_ms'].items():
+            if now and (was := before['latency_ms'].get(stage)):
+                changes.append(f"{stage} p99 {was['p99']:.2f} -> {now['p99']:.2f} ms")
+        print(f"{r['devices']:4d} devices  speed {r['speed']:6g}  {'  '.join(changes)}")
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', choices=sorted(RECORD_KEYS), default='wDRT', help='Simulated device type')
+    parser.add_argument('--devices', default='1,2,4,8,16,32,64', help='Device counts, comma separated')
+    parser.add_argument('--speeds', default='4,16,64,256,1024', help='Simulator speed factors tried in turn')
+    parser.add_argument('--seconds', type=float, default=5, help='Measured time of each step')
+    parser.add_argument('--warmup', type=float, default=1, help='Time after start before measuring')
+    parser.add_argument('--flush-interval', type=float, default=1.0, help="LogWriter's flush interval in s")
+    parser.add_argument('--max-ms', type=float, default=100, help='Latency allowed for a sustainable step')
+    parser.add_argument('--attach-timeout', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tk', action='store_true', help='Run the real UI controllers and plotters (needs a display)')
+    parser.add_argument('--output', default='end_to_end_bench.json')
+    parser.add_argument('--compare', help='Earlier results file to compare with')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'openpty'):
+        sys.exit('The simulated devices need pseudo terminals (Linux or macOS)')
+
+    options = {'seconds': args.seconds, 'warmup': args.warmup, 'flush_interval': args.flush_interval,
+               'max_ms': args.max_ms, 'attach_timeout': args.attach_timeout, 'seed': args.seed, 'tk': args.tk}
+    counts = [int(n) for n in args.devices.split(',')]
+    speeds = [float(s) for s in args.speeds.split(',')]
+
+    steps = list()
+    for n in counts:
+        offered = 0
+        for speed in speeds:
+            r = _run_step(args.device, n, speed, options)
+            steps.append(r)
+            _print_step(r)
+            if not r['sustainable']:
+                break
+            if r['lines_per_s'] < offered * 1.1:
+                # Faster devices did not send more lines, the host was not the limit
+                print(f'{n:4d} devices  the simulator cannot send faster, the host kept up with all it sent')
+                r['simulator_limited'] = True
+                break
+            offered = r['lines_per_s']
+
+    try:
+        with open(os.path.join(os.path.dirname(__file__), '..', 'version.txt')) as infile:
+            version = infile.read().strip()
+    except OSError:
+        version = ''
+
+    results = {'benchmark': 'end_to_end',
+               'version': version,
+               'commit': _commit(),
+               'time': time(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'cpus': os.cpu_count(),
+               'device': args.device,
+               'ui': 'tk' if args.tk else 'headless',
+               'options': options,
+               'steps': steps,
+               'max_sustainable': _max_sustainable(steps)}
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+
+    print('\nMax sustainable:')
+    for r in results['max_sustainable']:
+        print(f"{r['devices']:4d} devices  {r['lines_per_s']:9.0f} lines/s  (speed {r['speed']:g})")
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as infile:
+            _compare(json.load(infile), results)
+
+
+if __name__ == '__main__':
+    main()
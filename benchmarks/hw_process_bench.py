@@ -0,0 +1,251 @@
+"""
+Host timestamps under UI load, with the hardware layer in a thread of the UI process (main.py) and in a process of its
+own (main.py --hw-process), driven by the simulator's pty backed devices (Linux or macOS).
+
+While the devices run, the UI side redraws a matplotlib figure (Agg, no display needed) in its main thread as fast as
+it can, like the plots do at their worst, and drains q_2_ui between frames like the Tk mainloop does. For every device
+line two delays are measured:
+    stamp   from the simulator writing the line to the pty until the host timestamp it gets, i.e. how late the line
+            was read and timestamped; this is what UI load should not change
+    ui      from the host timestamp until the UI side takes the message off q_2_ui
+Lines are matched by port and text. --no-load runs the same steps without the plotting, as the baseline.
+
+Every step runs in a fresh host process with the simulated devices in a child process of their own. The results are
+written as JSON to --output.
+
+Run from the repository root:
+    python -m benchmarks.hw_process_bench --device wDRT --devices 8 --speed 10 --seconds 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import threading
+from time import time, sleep, perf_counter
+
+
+RECORD_KEYS = {'sDRT': 'trl', 'wDRT': 'dta', 'sVOG': 'data', 'wVOG': 'dta'}
+SEPARATORS = {'sVOG': '|'}
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _summary(seconds):
+    """ Percentiles in ms, or None when nothing was measured. """
+    if not seconds:
+        return None
+    ms = [s * 1000 for s in seconds]
+    return {'n': len(ms), 'p50': round(_percentile(ms, 50), 3), 'p90': round(_percentile(ms, 90), 3),
+            'p99': round(_percentile(ms, 99), 3), 'max': round(max(ms), 3)}
+
+
+class _ListPorts:
+    """ list_ports for HWRoot; a module level class so it can be passed to the hardware process. """
+    def __init__(self, ports):
+        self._ports = ports
+
+    def __call__(self):
+        return self._ports
+
+
+########################################################################################################################
+# Simulator process
+
+def _simulator(device, n, speed, seed, conn):
+    from RSLogger.simulator.fleet import Fleet
+
+    fleet = Fleet(wired={device: n}, seed=seed, speed=speed)
+    fleet.start()
+
+    # Time every line was written to its pty, by port and text without the wireless sequence number the host strips;
+    # written on the simulator loop thread only
+    sent = dict()
+    for dev, port in zip(fleet.wired, fleet.ports):
+        def timed(data, write=dev._write, path=port.path):
+            sent[(path, data.decode(errors='replace').strip().partition('#')[0])] = time()
+            write(data)
+        dev._write = timed
+
+    conn.send(fleet.comports())
+    conn.recv()
+    fleet.stop()
+    conn.send(sent)
+
+
+########################################################################################################################
+# Host process
+
+def _plot_load():
+    """ A figure like a device tab's, redrawn in full every call. """
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(10, 6), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    axes = [fig.add_subplot(2, 1, i + 1) for i in range(2)]
+    x = np.linspace(0, 60, 6000)
+    lines = [ax.plot(x, np.sin(x + i))[0] for ax in axes for i in range(8)]
+
+    def draw(phase):
+        for i, line in enumerate(lines):
+            line.set_ydata(np.sin(x + i + phase))
+        canvas.draw()
+    return draw
+
+
+def _host(mode, device, n, speed, options, conn):
+    from RSLogger.hardware_io.hi_controller import HWRoot
+    from RSLogger.hardware_io.hw_process import HardwareProcess
+    from RSLogger.utilities.message import new_message
+    from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+    ctx = multiprocessing.get_context('spawn')
+    sim_conn, child_conn = ctx.Pipe()
+    simulator = ctx.Process(target=_simulator, args=(device, n, speed, options['seed'], child_conn), daemon=True)
+    simulator.start()
+    ports = sim_conn.recv()
+
+    queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
+    hw = None
+    if mode == 'process':
+        hw = HardwareProcess(queues, list_ports=_ListPorts(ports))
+        hw.start()
+    else:
+        root = HWRoot(queues, autostart=False, list_ports=_ListPorts(ports))
+        threading.Thread(target=root.launch, name='hw_root', daemon=True).start()
+
+    draw = _plot_load() if options['load'] else None
+    received = list()
+    attached = 0
+
+    def drain():
+        nonlocal attached
+        for msg in queues['q_2_ui'].drain():
+            if msg.key == RECORD_KEYS[device]:
+                received.append((msg.port, f'{msg.key}{SEPARATORS.get(device, ">")}{msg.payload}', msg.timestamp,
+                                 time()))
+            elif msg.key == 'devices' and msg.device == device:
+                attached = len(msg.payload.split(',')) if msg.payload else 0
+
+    def run_for(seconds):
+        """ The UI main thread: a frame, then the queue, until seconds have passed. """
+        frames, t_end = 0, perf_counter() + seconds
+        while perf_counter() < t_end:
+            if draw:
+                draw(frames / 10)
+                frames += 1
+            else:
+                sleep(0.01)
+            drain()
+        return frames
+
+    t_0 = perf_counter()
+    while attached < n and perf_counter() - t_0 < options['attach_timeout']:
+        run_for(0.1)
+    result = {'mode': mode, 'load': options['load'], 'devices': n, 'speed': speed, 'attached': attached}
+
+    if attached == n:
+        session = tempfile.mkdtemp(prefix='rs_hwp_')
+        for key, payload in (('fpath', session), ('init', ''), ('start', '')):
+            queues['q_2_hi'].put(new_message('all', 'all', key, payload))
+            run_for(0.2)
+        run_for(options['warmup'])
+
+        received.clear()
+        t_begin = time()
+        frames = run_for(options['seconds'])
+        elapsed = time() - t_begin
+        queues['q_2_hi'].put(new_message('all', 'all', 'stop'))
+        run_for(0.5)
+        queues['q_2_hi'].put(new_message('all', 'all', 'close'))
+        run_for(0.5)
+
+        sim_conn.send('stop')
+        sent = sim_conn.recv()
+        stamp, ui = list(), list()
+        for port, text, timestamp, t_ui in received:
+            if (t_sent := sent.get((port, text))) is not None and t_begin <= timestamp:
+                stamp.append(timestamp - t_sent)
+                ui.append(t_ui - timestamp)
+        result.update({'seconds': round(elapsed, 3),
+                       'fps': round(frames / elapsed, 1),
+                       'records': len(received),
+                       'matched': len(stamp),
+                       'latency_ms': {'stamp': _summary(stamp), 'ui': _summary(ui)}})
+    else:
+        sim_conn.send('stop')
+        result['error'] = f'{attached} of {n} devices attached'
+
+    if hw:
+        hw.stop()
+    simulator.join(5)
+    conn.send(result)
+
+
+def _run_step(mode, device, n, speed, options):
+    ctx = multiprocessing.get_context('spawn')
+    conn, child_conn = ctx.Pipe()
+    host = ctx.Process(target=_host, args=(mode, device, n, speed, options, child_conn))
+    host.start()
+    limit = options['attach_timeout'] + options['warmup'] + options['seconds'] + 30
+    result = conn.recv() if conn.poll(limit) else {'mode': mode, 'load': options['load'], 'error': 'step timed out'}
+    host.join(5)
+    if host.is_alive():
+        host.terminate()
+    return result
+
+
+def _print_step(r):
+    label = f"{r['mode']:>7} {'plotting' if r['load'] else 'idle':>8}"
+    if 'error' in r:
+        print(f"{label}  {r['error']}")
+        return
+    latency = '  '.join(f"{name} p50 {s['p50']:7.2f} p99 {s['p99']:7.2f} max {s['max']:7.2f} ms"
+                        for name, s in r['latency_ms'].items() if s)
+    fps = f"{r['fps']:5.1f} fps" if r['load'] else '         '
+    print(f"{label}  {fps}  {r['matched']:5d} lines  {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--device', default='wDRT', choices=list(RECORD_KEYS))
+    parser.add_argument('--devices', type=int, default=8, help='Number of simulated units')
+    parser.add_argument('--speed', type=float, default=10.0, help='Run trials this many times as fast')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Measured seconds per step')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--attach-timeout', type=float, default=20.0)
+    parser.add_argument('--no-load', action='store_true', help='Also run the steps without plotting')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='hw_process_bench.json')
+    args = parser.parse_args()
+
+    steps = list()
+    for load in ([False, True] if args.no_load else [True]):
+        for mode in ('thread', 'process'):
+            options = {'load': load, 'seconds': args.seconds, 'warmup': args.warmup,
+                       'attach_timeout': args.attach_timeout, 'seed': args.seed}
+            steps.append(_run_step(mode, args.device, args.devices, args.speed, options))
+            _print_step(steps[-1])
+
+    results = {'benchmark': 'hw_process',
+               'time': time(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'cpus': os.cpu_count(),
+               'device': args.device,
+               'steps': steps}
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Throughput benchmark for the message path from a raw device line to the UI controller dispatch.
+
+Every iteration takes one line per simulated device through:
+    parse_device_line -> HWRoot.handle_device_message -> *_HIController -> q_2_ui -> UI dispatch
+
+HWRoot is built without starting its event loop or the port scanners, and the UI dispatch is a stub that does the
+same lookup as UIController._q_2_ui_messages_listener. No log file is set, so nothing is written to disk. With --trace the run is traced, which shows the cost of tracing,
+and the trace is written to the given file.
+
+Run from the repository root:
+    python -m benchmarks.message_path_bench --devices 50
+"""
+import argparse
+from itertools import cycle
+from time import perf_counter
+
+from RSLogger.hardware_io.hi_controller import HWRoot
+from RSLogger.utilities import trace
+from RSLogger.utilities.message import parse_device_line
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+
+# Representative lines for each device type
+DEVICE_LINES = {
+    'sDRT': [b'stm>1\r\n', b'clk>1\r\n', b'stm>0\r\n', b'trl>183420,12,412\r\n'],
+    'wDRT': [b'stm>1\r\n', b'rt>412000\r\n', b'stm>0\r\n', b'dta>183420,12,1,412000,87,1700000000\r\n'],
+    'sVOG': [b'stm|1\r\n', b'stm|0\r\n', b'data|12,1500,1500\r\n'],
+    'wVOG': [b'stm>1\r\n', b'stm>0\r\n', b'dta>12,1500,1500,3000,1,87,1700000000\r\n'],
+}
+
+
+class _Port:
+    """ Stand-in for an open serial.Serial; controllers only read .port on the receive path. """
+    def __init__(self, port):
+        self.port = port
+
+
+class _UIStub:
+    def __init__(self):
+        self.count = 0
+
+    def handle_command(self, msg):
+        self.count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=2000, help='Lines sent by each device')
+    parser.add_argument('--batch', type=int, default=50, help='Messages queued before the UI side drains')
+    parser.add_argument('--trace', help='Trace the run and write the Chrome trace here')
+    args = parser.parse_args()
+
+    queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
+    hw_root = HWRoot(queues, autostart=False)
+
+    devices = list()
+    for i, device in zip(range(args.devices), cycle(DEVICE_LINES)):
+        port = f'COM{i + 1}'
+        hw_root.RS_devices.setdefault(device, {})[port] = _Port(port)
+        devices.append((device, port, cycle(DEVICE_LINES[device])))
+
+    ui_controllers = {device: _UIStub() for device in DEVICE_LINES}
+    q_2_ui = queues['q_2_ui']
+
+    def ui_dispatch():
+        for msg in q_2_ui.drain():
+            if controller := ui_controllers.get(msg.device):
+                controller.handle_command(msg)
+
+    if args.trace:
+        trace.enable(capacity=1 << 20)
+
+    sent = 0
+    t_0 = perf_counter()
+    for _ in range(args.rounds):
+        for device, port, lines in devices:
+            hw_root.handle_device_message(parse_device_line(device, port, next(lines), perf_counter()))
+            sent += 1
+            if sent % args.batch == 0:
+                ui_dispatch()
+    ui_dispatch()
+    elapsed = perf_counter() - t_0
+
+    received = sum(c.count for c in ui_controllers.values())
+    print(f'devices:          {args.devices}')
+    print(f'messages:         {sent} sent, {received} dispatched')
+    print(f'elapsed:          {elapsed:.3f} s')
+    print(f'throughput:       {sent / elapsed:,.0f} msgs/s')
+    print(f'per message:      {elapsed / sent * 1e6:.2f} us')
+
+    if args.trace:
+        print(f'trace:            {trace.dump(args.trace)} events written to {args.trace}, {trace.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Cost of one plot animation tick of every device plotter (sDRT, wDRT, sVOG, wVOG, SFT) with many units on it: the
+work done every 100 ms to append each unit's new samples and hand the lines their data, without drawing.
+
+Every plotter runs in a fresh interpreter on an Agg canvas, so no display is needed. Each tick feeds every unit a new
+reaction time or shutter time and state, then calls _animate once. Reported per tick:
+    cpu_us    CPU time, median over the ticks
+    peak_kb   most memory allocated at once during the tick above what was allocated before it (tracemalloc),
+              median over the ticks
+
+--repo runs the plotters of another checkout, e.g. a git worktree of an older version, for comparison. The results
+are written as JSON to --output; --compare prints the changes from an earlier results file.
+
+Run from the repository root:
+    python -m benchmarks.plot_tick_bench --units 32
+    git worktree add ../rs_old HEAD~1 && python -m benchmarks.plot_tick_bench --repo ../rs_old --output ticks_old.json
+    python -m benchmarks.plot_tick_bench --compare ticks_old.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from time import time
+
+
+PLOTTERS = {'sDRT': ('RSLogger.user_interface.sDRT_UI.sDRT_UIPlotter', 'set_rt_and_state_lines'),
+            'wDRT': ('RSLogger.user_interface.wDRT_UI.wDRT_UIPlotter', 'set_rt_and_state_lines'),
+            'sVOG': ('RSLogger.user_interface.sVOG_UI.sVOG_UIPlotter', 'set_tsot_and_state_lines'),
+            'wVOG': ('RSLogger.user_interface.wVOG_UI.wVOG_UIPlotter', 'set_tsot_and_state_lines'),
+            'SFT': ('RSLogger.user_interface.SFT_UI.SFT_UIPlotter', 'set_rt_and_state_lines')}
+
+# Runs in the child. argv: repo, device, units, ticks
+_CHILD = r'''
+import json, sys, time, tracemalloc
+from importlib import import_module
+from statistics import median
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+repo, device, units, ticks = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+sys.path.insert(0, repo)
+module, set_lines = PLOTTERS[device]
+module = import_module(module)
+
+class Canvas(FigureCanvasAgg):
+    """ FigureCanvasTkAgg without Tk. """
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+
+    def get_tk_widget(self):
+        return self
+
+    def grid(self, **kwargs):
+        pass
+
+    def lift(self):
+        pass
+
+class Scheduler:
+    def add(self, plotter):
+        pass
+
+module.FigureCanvasTkAgg = Canvas
+if hasattr(module, 'get_render_scheduler'):
+    module.get_render_scheduler = Scheduler
+plotter = module.Plotter(None)
+for unit in range(units):
+    getattr(plotter, set_lines)(f'unit_{unit}')
+if hasattr(plotter, 'attach'):
+    # Since the figure pool, a plotter only gets a figure when its tab is shown
+    figure = Figure(figsize=(4, 2), dpi=100)
+    plotter.attach(figure, Canvas(figure))
+plotter.run = True
+plotter.recording = True
+if hasattr(plotter, '_init_animation'):
+    plotter._init_animation('unit_0')
+
+def feed(i):
+    for unit in range(units):
+        unit_id = f'unit_{unit}'
+        if hasattr(plotter, 'rt_update'):
+            if (i + unit) % 7 == 0:
+                plotter.rt_update(unit_id, 0.3 + (i % 5) / 10)
+            plotter.state_update(unit_id, 'H' if device == 'SFT' and i % 2 else (i // 10) % 2)
+        else:
+            if (i + unit) % 7 == 0:
+                plotter.tsot_update(unit_id, 1500 + i % 500)
+                plotter.tsct_update(unit_id, 1500 - i % 500)
+            plotter.state_update(unit_id, (i // 10) % 2)
+
+def tick(i):
+    feed(i)
+    plotter._next_update = 0
+    plotter._animate(i)
+    # Since the render scheduler, the lines get their data when they are drawn
+    if hasattr(plotter, 'update_lines'):
+        plotter.update_lines()
+
+# Past the first rescales and a full window of samples
+for i in range(700):
+    tick(i)
+
+cpu = list()
+for i in range(ticks):
+    t_0 = time.process_time()
+    tick(i)
+    cpu.append(time.process_time() - t_0)
+
+tracemalloc.start()
+peaks = list()
+for i in range(ticks):
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    tick(i)
+    peaks.append(tracemalloc.get_traced_memory()[1] - before)
+tracemalloc.stop()
+
+print('TICK ' + json.dumps({'cpu_us': median(cpu) * 1e6, 'peak_kb': median(peaks) / 1024}), flush=True)
+'''
+
+
+def _run(repo, device, units, ticks, timeout):
+    code = f'PLOTTERS = {PLOTTERS!r}\n{_CHILD}'
+    proc = subprocess.run([sys.executable, '-c', code, repo, device, str(units), str(ticks)], cwd=repo,
+                          capture_output=True, text=True, timeout=timeout)
+    for line in proc.stdout.splitlines():
+        if line.startswith('TICK '):
+            return json.loads(line[len('TICK '):])
+    raise RuntimeError(f'{device} plotter did not report:\n{proc.stderr[-2000:]}')
+
+
+def _commit(repo):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo, capture_output=True, text=True,
+                              timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def _compare(before, after):
+    print(f"\nChanges from {before['repo']} ({before['commit']}) to {after['repo']} ({after['commit']}):")
+    for device, r in after['plotters'].items():
+        if b := before['plotters'].get(device):
+            changes = '  '.join(f"{key} {b[key]:8.1f} -> {r[key]:8.1f} ({(r[key] - b[key]) / b[key] * 100:+4.0f}%)"
+                                for key in ('cpu_us', 'peak_kb') if b[key])
+            print(f"  {device:5} {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, default=32, help='Units on every plotter')
+    parser.add_argument('--ticks', type=int, default=500, help='Measured ticks')
+    parser.add_argument('--device', action='append', choices=list(PLOTTERS), help='Only these plotters')
+    parser.add_argument('--repo', default='.', help='Checkout whose plotters are run')
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds a plotter may take')
+    parser.add_argument('--output', default='plot_tick_bench.json')
+    parser.add_argument('--compare', help='Earlier results file to compare with')
+    args = parser.parse_args()
+    repo = os.path.abspath(args.repo)
+
+    results = {'benchmark': 'plot_tick',
+               'repo': repo,
+               'commit': _commit(repo),
+               'time': time(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'units': args.units,
+               'plotters': dict()}
+    print(f'{args.units} units per plotter, per tick:')
+    for device in args.device or PLOTTERS:
+        r = results['plotters'][device] = _run(repo, device, args.units, args.ticks, args.timeout)
+        print(f"  {device:5} cpu {r['cpu_us']:8.1f} us  peak {r['peak_kb']:7.1f} KB")
+
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as infile:
+            _compare(json.load(infile), results)
+
+
+if __name__ == '__main__':
+    main()
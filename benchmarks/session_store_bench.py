@@ -0,0 +1,79 @@
+"""
+Read-time comparison between a session text log and its binary copy.
+
+Writes N wVOG trial records through LogWriter with binary=True, then times:
+    1. parsing the text log with the csv module into typed rows
+    2. parsing the text log with numpy.loadtxt
+    3. session_store.read_session on the .rsb file
+and checks that session_store.to_csv reproduces the text log byte for byte.
+
+Run from the repository root:
+    python -m benchmarks.session_store_bench --records 200000
+"""
+import argparse
+import csv
+import os
+import tempfile
+from time import perf_counter, time
+
+import numpy as np
+
+from RSLogger.utilities.log_writer import LogWriter
+from RSLogger.utilities.session_store import read_session, to_csv, binary_path
+
+HEADER = ("Device ID, Label, Unix time in UTC, Trial Number, Shutter Open, Shutter Closed, "
+          "Shutter Total, Transition 0 1 or X,Battery SOC, Device Unix time in UTC")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--devices', type=int, default=8)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='rs_store_')
+    text_path = os.path.join(folder, 'wVOG.txt')
+
+    writer = LogWriter(binary=True)
+    writer.start()
+    t_0 = time()
+    for n in range(args.records):
+        unit = f'wVOG_{n % args.devices:03d}'
+        label = 'block_a' if n < args.records // 2 else 'block_b'
+        trial = n // args.devices + 1
+        writer.write(text_path, f'{unit},{label},{t_0 + n * 0.01},{trial},1500,1500,3000,{"01X"[n % 3]},'
+                                f'{90 - n % 50},{1700000000 + n}', HEADER)
+    writer.close_all(wait=True)
+
+    t = perf_counter()
+    with open(text_path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        rows = [(r[0], r[1], float(r[2]), int(r[3]), int(r[4]), int(r[5]), int(r[6]), r[7], int(r[8]), int(r[9]))
+                for r in reader]
+    t_csv = perf_counter() - t
+
+    t = perf_counter()
+    np.loadtxt(text_path, delimiter=',', skiprows=1, usecols=(2, 3, 4, 5, 6, 8, 9))
+    t_loadtxt = perf_counter() - t
+
+    t = perf_counter()
+    records = read_session(binary_path(text_path))
+    t_binary = perf_counter() - t
+
+    converted = to_csv(binary_path(text_path))
+    with open(text_path, 'rb') as a, open(converted, 'rb') as b:
+        identical = a.read() == b.read()
+
+    print(f'records:          {len(rows)} text, {len(records)} binary')
+    print(f'file size:        {os.path.getsize(text_path) / 1e6:.1f} MB text, '
+          f'{os.path.getsize(binary_path(text_path)) / 1e6:.1f} MB binary')
+    print(f'csv module:       {t_csv * 1000:.1f} ms')
+    print(f'numpy.loadtxt:    {t_loadtxt * 1000:.1f} ms')
+    print(f'read_session:     {t_binary * 1000:.1f} ms  ({t_csv / t_binary:.0f}x csv, {t_loadtxt / t_binary:.0f}x loadtxt)')
+    print(f'to_csv identical: {identical}')
+    print(f'files in:         {folder}')
+
+
+if __name__ == '__main__':
+    main()
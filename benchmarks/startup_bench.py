@@ -0,0 +1,177 @@
+"""
+Startup time of the RS Logger window: from launching python main.py until the main window is mapped on screen.
+
+Every run starts main.py in a fresh interpreter, with tkinter patched so the child reports when:
+    imports   Tk() is first called, i.e. main.py and the modules it needs for the window are imported
+    built     the mainloop is entered, i.e. the widgets are built
+    window    the main window is mapped (time to first window)
+and which of the heavy libraries (matplotlib, numpy, OpenCV, PIL, the XBee library, ...) were loaded by then. The
+window is closed right after it appears, so the version check, port scans and cameras only count as far as they
+delay the window. Without a display Tk() fails; the runs then only report the imports phase.
+
+The first run also pays for compiling any stale .pyc files and is reported on its own; the others are summarized.
+--repo runs main.py of another checkout, e.g. a git worktree of an older version, for comparison. The results are
+written as JSON to --output; --compare prints the changes from an earlier results file.
+
+Run from the repository root:
+    python -m benchmarks.startup_bench --runs 10
+    git worktree add ../rs_1.3 v1.3 && python -m benchmarks.startup_bench --repo ../rs_1.3 --output startup_1.3.json
+    python -m benchmarks.startup_bench --compare startup_1.3.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from statistics import median
+from time import time
+
+
+HEAVY_MODULES = ('matplotlib', 'numpy', 'cv2', 'PIL', 'win32com', 'digi.xbee', 'serial', 'urllib.request')
+PHASES = ('interpreter', 'imports', 'built', 'window')
+
+# Runs in the child, before main.py. argv: launch time, main.py arguments...
+_CHILD = r'''
+import json, sys, time, tkinter
+t_launch = float(sys.argv[1])
+marks = {'interpreter': time.time()}
+
+def report(**extra):
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    print('STARTUP ' + json.dumps({'launch': t_launch, 'marks': marks, 'loaded': loaded, **extra}), flush=True)
+
+_tk_init = tkinter.Tk.__init__
+def tk_init(self, *args, **kwargs):
+    marks.setdefault('imports', time.time())
+    try:
+        _tk_init(self, *args, **kwargs)
+    except tkinter.TclError as e:
+        report(error=str(e))
+        raise SystemExit(0)
+tkinter.Tk.__init__ = tk_init
+
+_mainloop = tkinter.Misc.mainloop
+def mainloop(self, n=0):
+    marks['built'] = time.time()
+    def mapped(e):
+        if e.widget is self and 'window' not in marks:
+            self.update_idletasks()
+            marks['window'] = time.time()
+            report()
+            self.after(100, self.destroy)
+    self.bind('<Map>', mapped, add='+')
+    _mainloop(self, n)
+tkinter.Misc.mainloop = mainloop
+
+sys.argv = ['main.py'] + sys.argv[2:]
+import runpy
+runpy.run_path('main.py', run_name='__main__')
+'''
+
+
+def _run(repo, main_args, timeout):
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\n{_CHILD}'
+    t_launch = time()
+    proc = subprocess.run([sys.executable, '-c', code, repr(t_launch), *main_args], cwd=repo, capture_output=True,
+                          text=True, timeout=timeout)
+    for line in proc.stdout.splitlines():
+        if line.startswith('STARTUP '):
+            report = json.loads(line[len('STARTUP '):])
+            break
+    else:
+        raise RuntimeError(f'main.py did not report its startup:\n{proc.stderr[-2000:]}')
+
+    # Seconds from the launch to the end of every phase, and the length of each
+    marks = report['marks']
+    result = {'loaded': report['loaded'], 'error': report.get('error')}
+    previous = report['launch']
+    for phase in PHASES:
+        if phase in marks:
+            result[f'{phase}_s'] = marks[phase] - previous
+            previous = marks[phase]
+    if 'window' in marks:
+        result['time_to_window_s'] = marks['window'] - report['launch']
+    return result
+
+
+def _summarize(runs):
+    summary = dict()
+    for key in [f'{phase}_s' for phase in PHASES] + ['time_to_window_s']:
+        values = [r[key] for r in runs if key in r]
+        if values:
+            summary[key] = {'median': median(values), 'min': min(values), 'max': max(values)}
+    return summary
+
+
+def _print_run(label, r):
+    phases = '  '.join(f"{phase} {r[f'{phase}_s'] * 1000:6.0f} ms" for phase in PHASES if f'{phase}_s' in r)
+    total = f"  -> window {r['time_to_window_s'] * 1000:6.0f} ms" if 'time_to_window_s' in r else ''
+    print(f"{label:>8}  {phases}{total}")
+
+
+def _compare(before, after):
+    print(f"\nChanges from {before.get('commit') or before.get('repo')} to {after.get('commit') or after.get('repo')}"
+          f" (medians):")
+    for key, value in after['summary'].items():
+        if key in before.get('summary', {}):
+            b, a = before['summary'][key]['median'], value['median']
+            print(f"  {key:18} {b * 1000:7.0f} ms -> {a * 1000:7.0f} ms  ({(a - b) / b * 100:+.0f}%)")
+    print(f"  loaded at first window: {before.get('loaded')} -> {after.get('loaded')}")
+
+
+def _commit(repo):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo, capture_output=True, text=True,
+                              timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Launches after the first one')
+    parser.add_argument('--repo', default='.', help='Checkout whose main.py is started')
+    parser.add_argument('--timeout', type=float, default=60, help='Seconds a launch may take')
+    parser.add_argument('--output', default='startup_bench.json')
+    parser.add_argument('--compare', help='Earlier results file to compare with')
+    args, main_args = parser.parse_known_args()
+    repo = os.path.abspath(args.repo)
+
+    first = _run(repo, main_args, args.timeout)
+    _print_run('first', first)
+    runs = list()
+    for i in range(args.runs):
+        runs.append(_run(repo, main_args, args.timeout))
+        _print_run(f'run {i + 1}', runs[-1])
+
+    if first['error']:
+        print(f"\nNo window: {first['error']}")
+    results = {'benchmark': 'startup',
+               'repo': repo,
+               'commit': _commit(repo),
+               'time': time(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'main_args': main_args,
+               'first': first,
+               'runs': runs,
+               'summary': _summarize(runs),
+               'loaded': runs[-1]['loaded'] if runs else first['loaded']}
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+
+    print('\nMedians:')
+    for key, value in results['summary'].items():
+        print(f"  {key:18} {value['median'] * 1000:7.0f} ms  (min {value['min'] * 1000:.0f}, "
+              f"max {value['max'] * 1000:.0f})")
+    print(f"  loaded at first window: {', '.join(results['loaded']) or 'none'}")
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as infile:
+            _compare(json.load(infile), results)
+
+
+if __name__ == '__main__':
+    main()
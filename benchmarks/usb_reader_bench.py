@@ -0,0 +1,92 @@
+"""
+Loopback benchmark for the per-port serial readers (Linux/macOS only - uses ptys as simulated devices).
+
+Opens N pseudo terminals, attaches a SerialLineReader to the slave end of each one and then:
+    1. measures process CPU while every port is idle
+    2. writes timestamped lines into every master end and reports the arrival latency percentiles
+
+Run from the repository root:
+    python -m benchmarks.usb_reader_bench --ports 16
+"""
+import argparse
+import os
+import statistics
+import tty
+from threading import Lock
+from time import time, sleep, process_time
+
+import serial
+
+from RSLogger.hardware_io.serial_io import SerialLineReader
+
+
+def _open_ptys(n):
+    ptys = list()
+    for _ in range(n):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        ptys.append((master, slave, os.ttyname(slave)))
+    return ptys
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ports', type=int, default=16)
+    parser.add_argument('--idle', type=float, default=3.0, help='Seconds to sample idle CPU')
+    parser.add_argument('--lines', type=int, default=500, help='Lines written to each port')
+    parser.add_argument('--rate', type=float, default=200.0, help='Lines per second per port')
+    args = parser.parse_args()
+
+    latencies = list()
+    lock = Lock()
+
+    def deliver(msg):
+        sent = float(msg.payload)
+        with lock:
+            latencies.append(msg.timestamp - sent)
+
+    ptys = _open_ptys(args.ports)
+    readers = list()
+    for i, (master, slave, name) in enumerate(ptys):
+        conn = serial.Serial(name, 921600)
+        reader = SerialLineReader('sim', f'pty{i}', conn, deliver)
+        reader.start()
+        readers.append((reader, conn))
+
+    # Idle CPU
+    sleep(.5)
+    wall_0, cpu_0 = time(), process_time()
+    sleep(args.idle)
+    idle_cpu = (process_time() - cpu_0) / (time() - wall_0) * 100
+
+    # Latency under load
+    period = 1 / args.rate
+    for _ in range(args.lines):
+        for master, _, _ in ptys:
+            os.write(master, f'trl>{time():.6f}\n'.encode())
+        sleep(period)
+    sleep(.5)
+
+    for reader, conn in readers:
+        reader.stop()
+        conn.close()
+    for master, slave, _ in ptys:
+        os.close(master)
+        os.close(slave)
+
+    expected = args.ports * args.lines
+    ms = [v * 1000 for v in latencies]
+    print(f'ports:            {args.ports}')
+    print(f'idle cpu:         {idle_cpu:.2f} % of one core')
+    print(f'lines received:   {len(ms)} / {expected}')
+    print(f'latency ms:       p50 {_percentile(ms, 50):.3f}  p99 {_percentile(ms, 99):.3f}  '
+          f'max {max(ms):.3f}  mean {statistics.fmean(ms):.3f}')
+
+
+if __name__ == '__main__':
+    main()
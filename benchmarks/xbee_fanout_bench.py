@@ -0,0 +1,121 @@
+"""
+Fan-out time for one command sent to N remote XBees: blocking send_data per device vs XBeeTransmitter.
+
+No dongle is needed. A simulated dongle sends frames one at a time, each taking --airtime ms. The transmit status
+for a frame arrives --latency ms after the frame has gone out, on a separate thread like the Digi reader. Every
+--drop-th frame gets no status, so the transmitter has to retry it.
+
+Run from the repository root:
+    python -m benchmarks.xbee_fanout_bench --devices 20
+"""
+import argparse
+import threading
+from time import perf_counter, sleep
+
+from digi.xbee.models.address import XBee64BitAddress
+from digi.xbee.models.protocol import XBeeProtocol
+from digi.xbee.models.status import TransmitStatus
+from digi.xbee.packets.aft import ApiFrameType
+
+from RSLogger.hardware_io.xbee_tx import XBeeTransmitter
+
+
+class _Remote:
+    def __init__(self, i):
+        self._addr = XBee64BitAddress.from_hex_string(f'0013A200{0x41B20000 + i:08X}')
+
+    def get_64bit_addr(self):
+        return self._addr
+
+
+class _Status:
+    def __init__(self, frame_id):
+        self.frame_id = frame_id
+        self.transmit_status = TransmitStatus.SUCCESS
+
+    def get_frame_type(self):
+        return ApiFrameType.TX_STATUS
+
+
+class _SimulatedDongle:
+    def __init__(self, airtime, latency, drop):
+        self._airtime = airtime
+        self._latency = latency
+        self._drop = drop
+        self._frame_id = 0
+        self._frames = 0
+        self._radio_free = perf_counter()
+        self._lock = threading.Lock()
+        self._callbacks = list()
+
+    def get_protocol(self):
+        return XBeeProtocol.RAW_802_15_4
+
+    def get_next_frame_id(self):
+        self._frame_id = self._frame_id % 255 + 1
+        return self._frame_id
+
+    def add_packet_received_callback(self, cb):
+        self._callbacks.append(cb)
+
+    def del_packet_received_callback(self, cb):
+        self._callbacks.remove(cb)
+
+    def send_packet(self, packet):
+        # Frames queue up in the radio and go out one after another
+        with self._lock:
+            self._frames += 1
+            start = max(perf_counter(), self._radio_free)
+            self._radio_free = start + self._airtime
+            status_at = self._radio_free + self._latency
+            dropped = self._drop and self._frames % self._drop == 0
+        if not dropped:
+            threading.Timer(max(0.0, status_at - perf_counter()), self._status, (packet.frame_id,)).start()
+        return status_at
+
+    def _status(self, frame_id):
+        for cb in self._callbacks:
+            cb(_Status(frame_id))
+
+    def send_data(self, remote, data):
+        """ Blocking send, waits for its own transmit status like XBeeDevice.send_data. """
+        status_at = self.send_packet(type('P', (), {'frame_id': 0})())
+        sleep(max(0.0, status_at - perf_counter()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=20)
+    parser.add_argument('--airtime', type=float, default=1.0, help='ms per frame on air')
+    parser.add_argument('--latency', type=float, default=15.0, help='ms from frame sent to its transmit status')
+    parser.add_argument('--drop', type=int, default=0, help='Lose the status of every n-th frame')
+    args = parser.parse_args()
+
+    remotes = [_Remote(i) for i in range(args.devices)]
+
+    dongle = _SimulatedDongle(args.airtime / 1000, args.latency / 1000, 0)
+    t_0 = perf_counter()
+    for remote in remotes:
+        dongle.send_data(remote, 'trl>1')
+    blocking = perf_counter() - t_0
+
+    dongle = _SimulatedDongle(args.airtime / 1000, args.latency / 1000, args.drop)
+    tx = XBeeTransmitter(dongle, status_timeout=0.1)
+    tx.start()
+    t_0 = perf_counter()
+    for remote in remotes:
+        tx.send(remote, 'trl>1')
+    while tx.stats()['acked'] + tx.stats()['failed'] < args.devices:
+        sleep(0.0005)
+    queued = perf_counter() - t_0
+    stats = tx.stats()
+    tx.stop()
+
+    print(f'devices:          {args.devices}  (airtime {args.airtime} ms, status latency {args.latency} ms)')
+    print(f'blocking send:    {blocking * 1000:.1f} ms')
+    print(f'XBeeTransmitter:  {queued * 1000:.1f} ms  ({blocking / queued:.1f}x)')
+    print(f'transmitter:      {stats}')
+
+
+if __name__ == '__main__':
+    main()
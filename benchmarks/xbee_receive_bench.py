@@ -0,0 +1,106 @@
+"""
+Throughput benchmark for RemoteConnectionManager._msg_received, the Digi callback every XBee packet goes through.
+
+Packets from N remote wDRT/wVOG units are fed straight into the callback, round robin, and compared with the
+previous implementation that parsed the node ID of every packet. Received messages go to a counter, or with
+--hwroot on through HWRoot.handle_device_message and the device controllers to q_2_ui (no log file is set).
+
+No dongle is needed: the local XBee is never opened and the remote devices are built from fixed 64-bit addresses.
+
+Run from the repository root:
+    python -m benchmarks.xbee_receive_bench --devices 20
+"""
+import argparse
+import os
+import re
+import tempfile
+from itertools import cycle
+from time import perf_counter
+
+from digi.xbee.devices import XBeeDevice, RemoteXBeeDevice, XBeeMessage
+from digi.xbee.models.address import XBee64BitAddress
+
+from RSLogger.hardware_io.hi_controller import HWRoot
+from RSLogger.hardware_io.remote_connect import RemoteConnectionManager
+from RSLogger.hardware_io.xbee_node_cache import XBeeNodeCache
+from RSLogger.utilities.message import parse_device_line
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+
+
+DEVICE_LINES = {
+    'wDRT': [b'stm>1', b'rt>412000', b'stm>0', b'dta>183420,12,1,412000,87,1700000000'],
+    'wVOG': [b'stm>1', b'stm>0', b'dta>12,1500,1500,3000,1,87,1700000000'],
+}
+
+
+def uncached_msg_received(manager, msg):
+    """ _msg_received before the routing cache. """
+    if manager.xcvr:
+        try:
+            id_raw = msg.remote_device.get_node_id()
+            id_clean = re.sub(r'[_\s]', '', id_raw)
+            dev, num = re.match(r"([a-z]+)([0-9]+)", id_clean, re.I).groups()
+
+            manager._received(parse_device_line(dev, id_raw, msg.data, msg.timestamp))
+        except TypeError:
+            pass
+
+
+def run(callback, packets, n_packets):
+    t_0 = perf_counter()
+    for _, msg in zip(range(n_packets), packets):
+        callback(msg)
+    return n_packets / (perf_counter() - t_0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=20)
+    parser.add_argument('--packets', type=int, default=200000)
+    parser.add_argument('--hwroot', action='store_true', help='Route received messages through HWRoot')
+    args = parser.parse_args()
+
+    local = XBeeDevice('BENCH', 921600)
+    remotes = list()
+    for i, device in zip(range(args.devices), cycle(DEVICE_LINES)):
+        addr = XBee64BitAddress.from_hex_string(f'0013A200{0x41B20000 + i:08X}')
+        remotes.append((RemoteXBeeDevice(local, addr, node_id=f'{device}_{i + 1}'), cycle(DEVICE_LINES[device])))
+
+    def packets():
+        while True:
+            for remote, lines in remotes:
+                yield XBeeMessage(bytearray(next(lines)), remote, 1700000000.0)
+
+    received = [0]
+    if args.hwroot:
+        queues = {'q_2_ui': WakeupQueue(), 'q_2_hi': WakeupQueue()}
+        hw_root = HWRoot(queues, autostart=False)
+
+        def deliver(msg):
+            hw_root.handle_device_message(msg)
+            if queues['q_2_ui'].qsize() > 1000:
+                list(queues['q_2_ui'].drain())
+    else:
+        def deliver(msg):
+            received[0] += 1
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix='rs_xbee_'), 'xbee_nodes.json')
+    manager = RemoteConnectionManager(dict(), lambda m: None, deliver, node_cache=XBeeNodeCache(cache_path))
+    manager.xcvr = local
+    manager._discovery_complete_callback([remote for remote, _ in remotes])
+
+    # Warm up both paths
+    run(manager._msg_received, packets(), 1000)
+    run(lambda m: uncached_msg_received(manager, m), packets(), 1000)
+
+    uncached = run(lambda m: uncached_msg_received(manager, m), packets(), args.packets)
+    cached = run(manager._msg_received, packets(), args.packets)
+
+    print(f'devices:        {args.devices}')
+    print(f'packets:        {args.packets}{" through HWRoot" if args.hwroot else ""}')
+    print(f'uncached:       {uncached:,.0f} packets/s')
+    print(f'routing cache:  {cached:,.0f} packets/s  ({cached / uncached:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
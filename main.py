@@ -1,24 +1,82 @@
+import argparse
 from threading import Thread
-from queue import SimpleQueue
+from time import strftime
 from multiprocessing import freeze_support
 
-from RSLogger.hardware_io import hi_controller
-from RSLogger.user_interface import ui_controller
+from RSLogger.utilities.wakeup_queue import WakeupQueue
+from RSLogger.utilities.log_writer import get_log_writer
+from RSLogger.utilities import trace, metrics
 
 __version__ = '1.3'
 
-# Inter-thread communication queue dictionary
-queues = {'q_2_hi': SimpleQueue(),
-          'q_2_ui': SimpleQueue()
+# Inter-thread communication queue dictionary. Each consumer registers a waker, so neither side polls.
+queues = {'q_2_hi': WakeupQueue(),
+          'q_2_ui': WakeupQueue()
           }
 
 
+def run_hardware(queues):
+    # Imported on the hardware thread, so the window does not wait for the port and XBee libraries
+    from RSLogger.hardware_io import hi_controller
+    hi_controller.HWRoot(queues)
+
+
 def main():
-    # Controller Thread - This is a newly spawned thread where an asyncio loop is used
-    t = Thread(target=hi_controller.HWRoot, args=(queues, ), daemon=True)
-    t.start()
+    parser = argparse.ArgumentParser(description='RS Logger')
+    parser.add_argument('--binary-logs', action='store_true',
+                        help='Also write device trial data to binary .rsb session files')
+    parser.add_argument('--trace', action='store_true',
+                        help='Trace from startup; Ctrl+Shift+T in the main window stops and writes the trace')
+    parser.add_argument('--metrics', metavar='ADDRESS',
+                        help='Serve runtime metrics on this [host:]port or Unix socket path, e.g. 9464')
+    parser.add_argument('--headless', action='store_true',
+                        help='Record without the window; see python -m RSLogger.headless.session --help')
+    parser.add_argument('--plot-fps', type=float, default=10,
+                        help='Most frames per second the live plots are drawn at')
+    parser.add_argument('--plot-canvases', type=int, default=4,
+                        help='Plot canvases kept for the device tabs; tabs not shown give theirs up beyond that')
+    parser.add_argument('--plot-backend', choices=['matplotlib', 'tk'], default='matplotlib',
+                        help='Draw the live plots with matplotlib, or as lighter strip charts on a Tk canvas')
+    parser.add_argument('--hw-process', action='store_true',
+                        help='Run the device I/O in a separate process, so the window cannot delay timestamps')
+    args, rest = parser.parse_known_args()
+
+    if args.binary_logs and not args.hw_process:
+        get_log_writer().binary = True
+    if args.trace:
+        trace.enable()
+    if args.metrics:
+        server = metrics.serve(args.metrics)
+        print(f"Metrics served on {server.server_address}")
+
+    if args.headless:
+        # Neither Tk nor the plots are imported
+        from RSLogger.headless import session
+        session.main(rest, queues)
+    else:
+        from RSLogger.user_interface import ui_controller
+        from RSLogger.user_interface.render_scheduler import get_render_scheduler
+
+        get_render_scheduler().fps = args.plot_fps
+        get_render_scheduler().pool.size = args.plot_canvases
+        get_render_scheduler().backend = args.plot_backend
+
+        if args.hw_process:
+            from RSLogger.hardware_io.hw_process import HardwareProcess
+            hw = HardwareProcess(queues, binary_logs=args.binary_logs, trace_hw=args.trace)
+            hw.start()
+            ui_controller.UIController(queues)
+            hw.stop()
+        else:
+            # Controller Thread - This is a newly spawned thread where an asyncio loop is used
+            t = Thread(target=run_hardware, args=(queues, ), daemon=True)
+            t.start()
+
+            ui_controller.UIController(queues)
 
-    ui_controller.UIController(queues)
+    # Still tracing when the window was closed or the headless session ended
+    if trace.enabled:
+        trace.dump(f"rs_trace_{strftime('%Y%m%d_%H%M%S')}.json")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import threading
+
+from RSLogger.hardware_io.clock_sync import ClockSync
+from RSLogger.utilities.message import new_message
+
+
+def _reply(t1, offset_ms, delay_ms):
+    """ A 'tsr' reply from a device offset_ms ahead of the host, delay_ms round trip. """
+    t2 = t3 = t1 + delay_ms // 2 + offset_ms
+    return new_message('wDRT', 'wDRT_1', 'tsr', f'{t1},{t2},{t3}')._replace(timestamp=(t1 + delay_ms) / 1000)
+
+
+def test_offset_from_replies():
+    clock = ClockSync(dict(), dict())
+    for i in range(5):
+        clock.report(_reply(1_700_000_000_000 + i * 2000, 250, 10))
+
+    estimate = clock.estimate('wDRT', 'wDRT_1')
+    assert abs(estimate.offset_ms - 250) < 1e-6
+    host_s, unc_s = clock.to_host_time('wDRT', 'wDRT_1', 1_700_000_010.250)
+    assert abs(host_s - 1_700_000_010) < 1e-6 and unc_s < 0.01
+
+
+def test_replies_from_another_thread_while_forgetting():
+    clock = ClockSync(dict(), dict(), window=8)
+    errors = list()
+
+    def replies():
+        try:
+            for i in range(2000):
+                clock.report(_reply(1_700_000_000_000 + i * 100, 250, 10))
+        except Exception as e:
+            errors.append(e)
+
+    digi = threading.Thread(target=replies)
+    digi.start()
+    while digi.is_alive():
+        clock.forget('wDRT', 'wDRT_1')
+        clock.to_host_time('wDRT', 'wDRT_1', 1_700_000_000.0)
+    digi.join()
+    clock.report(_reply(1_700_000_300_000, 250, 10))
+
+    assert not errors
+    assert clock.estimate('wDRT', 'wDRT_1').samples <= 8
@@ -0,0 +1,42 @@
+from RSLogger.hardware_io.data_sequencer import DataSequencer
+from RSLogger.utilities.message import new_message
+
+
+class _Controller:
+    def __init__(self):
+        self.requested = list()
+
+    def parse_command(self, socket, msg, tx=None):
+        self.requested.extend(int(seq) for seq in msg.payload.split(','))
+
+
+def _sequencer():
+    controller = _Controller()
+    return DataSequencer({'wDRT': controller}, {'wDRT': {'wDRT_1': object()}}, max_request=1000), controller
+
+
+def _receive(sequencer, seq):
+    return sequencer.receive(new_message('wDRT', 'wDRT_1', 'dta', f'record {seq}#{seq}'))
+
+
+def test_history_defaults_to_the_firmware_ring():
+    assert _sequencer()[0].history == 64
+
+
+def test_gap_within_the_ring_is_requested():
+    sequencer, controller = _sequencer()
+    _receive(sequencer, 1)
+    _receive(sequencer, 5)
+
+    assert controller.requested == [2, 3, 4]
+    assert sequencer.stats()['lost'] == 0
+
+
+def test_gap_beyond_the_ring_is_lost_without_a_request():
+    sequencer, controller = _sequencer()
+    _receive(sequencer, 1)
+    _receive(sequencer, 101)
+
+    # The firmware still has 38..100; 2..37 were overwritten
+    assert controller.requested == list(range(38, 101))
+    assert sequencer.stats()['lost'] == 36
@@ -0,0 +1,18 @@
+from time import sleep
+
+from RSLogger.utilities.log_writer import LogWriter
+
+
+def test_checkpoint_runs_while_idle(tmp_path):
+    writer = LogWriter(flush_interval=0.05, checkpoint_interval=0.3)
+    writer.start()
+    writer.open_session(str(tmp_path))
+    writer.write(str(tmp_path / 'sDRT.txt'), 'line', 'header')
+
+    # Flushed right away, then nothing more is written; the checkpoint is still due
+    sleep(1.0)
+    stats = writer.stats()
+    writer.close_all(wait=True)
+
+    assert stats['flushes'] >= 1
+    assert stats['checkpoints'] == 1
@@ -0,0 +1,49 @@
+import asyncio
+from time import time
+
+import pytest
+
+from RSLogger.hardware_io.mmc_offload import MMCOffload
+from RSLogger.utilities import log_writer
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = list()
+
+    def write(self, path, line, header=None):
+        self.lines.append(line)
+
+    def flush(self, wait=False):
+        pass
+
+
+class _Controller:
+    LOG_FILE_PATH_TEMPLATE = 'wDRT.txt'
+    LOG_HEADER = 'header'
+
+
+@pytest.fixture
+def writer():
+    previous = log_writer._log_writer
+    log_writer.use_log_writer(writer := _Writer())
+    yield writer
+    log_writer.use_log_writer(previous)
+
+
+def test_records_logged_over_xbee_are_not_filled_again(tmp_path, writer):
+    mmc = MMCOffload({'wDRT': _Controller()}, dict())
+    mmc.file_path = str(tmp_path)
+    now = int(time())
+    records = [f'{ms},{trial},1,300,80,{now + trial}' for trial, ms in ((1, 1000), (2, 2000), (3, 3000))]
+
+    # Trial 1 arrived over XBee under the node ID, trial 2 over USB, trial 3 not at all
+    (tmp_path / 'wDRT.txt').write_text(f'header\nwDRT_1,cond,{now}.1,{records[0]}\n'
+                                       f'wDRT_COM3,cond,{now}.2,{records[1]}\n')
+    folder = tmp_path / 'mmc' / 'wDRT_COM3'
+    folder.mkdir(parents=True)
+    (folder / 'wDRT_1.txt').write_text(''.join(f'wDRT_1,,,{r}\n' for r in records))
+
+    asyncio.run(mmc._reconcile('wDRT', 'wDRT_COM3', str(folder), ['wDRT_1.txt']))
+
+    assert [line for line in writer.lines if ',mmc,' in line] == [f'wDRT_COM3,mmc,,{records[2]}']
@@ -0,0 +1,81 @@
+from time import time
+
+from digi.xbee.devices import XBeeMessage
+
+from RSLogger.hardware_io.remote_connect import RemoteConnectionManager
+from RSLogger.hardware_io.xbee_node_cache import XBeeNodeCache
+
+ADDRS = {'0013A20041B20001': 'wDRT_1', '0013A20041B20002': 'wVOG_2'}
+
+
+class _Remote:
+    def __init__(self, addr, node_id):
+        self._addr, self._node_id = addr, node_id
+
+    def get_64bit_addr(self):
+        return self._addr
+
+    def get_node_id(self):
+        return self._node_id
+
+
+class _Network:
+    def __init__(self):
+        self.devices = dict()
+
+    def add_if_not_exist(self, addr, node_id=None):
+        return self.devices.setdefault(str(addr), _Remote(str(addr), node_id))
+
+    def get_devices(self):
+        return list(self.devices.values())
+
+    def remove_device(self, remote):
+        del self.devices[remote.get_64bit_addr()]
+
+
+class _Tx:
+    def __init__(self):
+        self.sent = list()
+
+    def send(self, remote, data):
+        self.sent.append((remote.get_node_id(), data))
+
+
+def _manager(tmp_path):
+    cache = XBeeNodeCache(str(tmp_path / 'nodes.json'))
+    for addr, node_id in ADDRS.items():
+        cache.seen(addr, node_id)
+
+    messages, remote_devices = list(), dict()
+    manager = RemoteConnectionManager(remote_devices, messages.append, lambda m: None, node_cache=cache)
+    manager.xcvr = object()
+    manager.tx = _Tx()
+    manager._network = _Network()
+    return manager, messages, remote_devices
+
+
+def test_cached_nodes_are_announced_only_once_heard_from(tmp_path):
+    manager, messages, remote_devices = _manager(tmp_path)
+    manager._restore_cached_nodes()
+
+    assert not [m for m in messages if m.key == 'devices']
+    assert sorted(manager.tx.sent) == [('wDRT_1', 'get_bat>'), ('wVOG_2', 'get_bat>')]
+
+    remote = manager._network.devices['0013A20041B20001']
+    manager._msg_received(XBeeMessage(b'bty>80', remote, time()))
+    assert [(m.device, m.payload) for m in messages if m.key == 'devices'] == [('wDRT', 'wDRT_1')]
+    assert remote_devices == {'wDRT': {'wDRT_1': remote}}
+
+
+def test_silent_cached_nodes_are_dropped(tmp_path):
+    manager, messages, remote_devices = _manager(tmp_path)
+    manager._restore_cached_nodes()
+    manager._provisional = {addr: (remote, 0) for addr, (remote, _) in manager._provisional.items()}
+
+    # Discovery lists them too, that is not an answer
+    manager._discovery_complete_callback(manager._network.get_devices())
+    manager._expire_provisional()
+
+    assert not remote_devices
+    assert not manager._network.devices
+    assert not [m for m in messages if m.key == 'devices']
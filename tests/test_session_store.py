@@ -0,0 +1,93 @@
+import struct
+
+from RSLogger.utilities import session_store
+from RSLogger.utilities.session_store import SessionStoreWriter, read_session
+
+LINE = 'sDRT_COM3,cond_a,{t},{ms},{trial},1,{rt}'
+
+
+def _write(path, trials, label='cond_a'):
+    store = SessionStoreWriter(path, 'sDRT', 'header')
+    for trial in trials:
+        store.append_line(LINE.format(t=1000.0 + trial, ms=trial * 10, trial=trial, rt=300 + trial)
+                          .replace('cond_a', label))
+    store.close()
+
+
+def _torn_segment():
+    """ A segment header and part of its records, as a crash during a flush leaves it. """
+    header = session_store._SEGMENT_HEADER.pack(session_store.SEGMENT_MAGIC, 9, 6, 5,
+                                                session_store.SCHEMAS['sDRT'].struct.size)
+    return header + b'sDRT_COM3cond_a' + b'\x01' * 20
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'sDRT.rsb')
+    _write(path, range(3))
+    assert list(read_session(path)['trial']) == [0, 1, 2]
+
+
+def test_append_after_crash_truncates_torn_segment(tmp_path):
+    path = str(tmp_path / 'sDRT.rsb')
+    _write(path, range(3))
+    size = (tmp_path / 'sDRT.rsb').stat().st_size
+    with open(path, 'ab') as f:
+        f.write(_torn_segment())
+
+    _write(path, range(3, 6), label='cond_b')
+
+    out = read_session(path)
+    assert list(out['trial']) == [0, 1, 2, 3, 4, 5]
+    assert list(out['label']) == ['cond_a'] * 3 + ['cond_b'] * 3
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data.find(session_store.SEGMENT_MAGIC, size) == size
+
+
+def test_torn_file_header_is_rewritten(tmp_path):
+    path = str(tmp_path / 'sDRT.rsb')
+    with open(path, 'wb') as f:
+        f.write(b'RSLB\x01')
+
+    _write(path, range(2))
+    assert list(read_session(path)['trial']) == [0, 1]
+
+
+def test_reader_skips_torn_segment_written_before(tmp_path):
+    # Files appended to past a torn segment, before the writer cut torn tails off
+    path = str(tmp_path / 'sDRT.rsb')
+    _write(path, range(2))
+    with open(path, 'ab') as f:
+        f.write(_torn_segment()[:10])
+    tail = tmp_path / 'tail.rsb'
+    _write(str(tail), range(2, 4))
+    data = tail.read_bytes()
+    header_len = struct.unpack_from('<H', data, 22)[0]
+    with open(path, 'ab') as f:
+        f.write(data[session_store._FILE_HEADER.size + header_len:])
+
+    assert list(read_session(path)['trial']) == [0, 1, 2, 3]
+
+
+def _segments_of(tmp_path, name, trials, label='cond_a'):
+    """ The segment bytes of a file written with trials, without its file header. """
+    other = tmp_path / name
+    _write(str(other), trials, label)
+    data = other.read_bytes()
+    header_len = struct.unpack_from('<H', data, 22)[0]
+    return data[session_store._FILE_HEADER.size + header_len:]
+
+
+def test_reader_skips_segment_torn_in_its_records(tmp_path):
+    # Full segment header, records cut short, then further segments appended by an older writer
+    path = str(tmp_path / 'sDRT.rsb')
+    _write(path, range(2))
+    torn = _segments_of(tmp_path, 'torn.rsb', range(10, 15))
+    with open(path, 'ab') as f:
+        f.write(torn[:len(torn) - 3 * session_store.SCHEMAS['sDRT'].struct.size])
+        f.write(_segments_of(tmp_path, 'b.rsb', range(2, 4), label='cond_b'))
+        f.write(_segments_of(tmp_path, 'c.rsb', range(4, 6), label='cond_c'))
+
+    out = read_session(path)
+    assert list(out['trial']) == [0, 1, 2, 3, 4, 5]
+    assert list(out['label']) == ['cond_a'] * 2 + ['cond_b'] * 2 + ['cond_c'] * 2
@@ -0,0 +1,49 @@
+import multiprocessing
+import threading
+from time import sleep
+
+from RSLogger.utilities.message import new_message
+from RSLogger.utilities.shm_ring import ShmRing, RingReader, RingWriter
+
+
+def _ring():
+    ring = ShmRing.create(1024)
+    wake_recv, wake_send = multiprocessing.Pipe(duplex=False)
+    return ring, RingWriter(ring, wake_send), RingReader(ring, wake_recv)
+
+
+def _fill(writer):
+    n = 0
+    while writer.put_nowait(new_message('wDRT', 'wDRT_1', 'dta', 'x' * 40)):
+        n += 1
+    return n
+
+
+def test_full_ring_drops_and_reports(capsys):
+    ring, writer, reader = _ring()
+    try:
+        n = _fill(writer)
+        assert not writer.put(new_message('wDRT', 'wDRT_1', 'dta', 'late'), timeout=0.01)
+
+        assert writer.dropped == 2
+        assert 'records dropped' in capsys.readouterr().out
+        assert len(list(reader.drain())) == n
+    finally:
+        ring.close()
+
+
+def test_put_waits_for_the_reader_to_make_room():
+    ring, writer, reader = _ring()
+    try:
+        n = _fill(writer)
+        writer.dropped = 0
+        drained = list()
+        threading.Timer(0.02, lambda: drained.extend(reader.drain())).start()
+
+        assert writer.put(new_message('wDRT', 'wDRT_1', 'dta', 'late'), timeout=1.0)
+        sleep(0.05)
+        assert writer.dropped == 0
+        assert len(drained) == n
+        assert [m.payload for m in reader.drain()] == ['late']
+    finally:
+        ring.close()
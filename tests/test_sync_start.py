@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from time import time
+
+from RSLogger.hardware_io.sync_start import SyncStart
+from RSLogger.utilities.message import new_message
+
+
+class _Controller:
+    def __init__(self):
+        self.sent = list()
+
+    def parse_command(self, socket, msg, tx=None):
+        self.sent.append(msg.key)
+
+
+def _run(replies):
+    """ Starts two wireless units and feeds them replies; returns their results. """
+    async def main():
+        sync = SyncStart({'wDRT': _Controller()}, lead_s=0.05, grace_s=10)
+        sync.start({'wDRT': {'a': object(), 'b': object()}})
+        results = dict()
+        finish = sync._finish
+        sync._finish = lambda: (results.update(sync._results), finish())
+        for port, key, payload, after_s in replies:
+            msg = new_message('wDRT', port, key, payload(sync._start_ms) if callable(payload) else payload)
+            if key == 'syn':
+                msg = msg._replace(timestamp=sync._syn_sent[('wDRT', port)] + after_s)
+            sync.report(msg)
+        return results
+    return asyncio.run(main())
+
+
+def test_skew_is_measured_from_the_syn_round_trip():
+    results = _run([('a', 'syn', '0', .010),
+                    ('b', 'syn', '0', .030),
+                    ('a', 'sst', lambda ms: ms, 0),
+                    ('b', 'sst', lambda ms: ms, 0)])
+    start_ms = results[('wDRT', 'a')][2]
+
+    # Each clock is behind by half its round trip, so the same reported time is a later host time
+    method, _, _, actual_a, unc_a = results[('wDRT', 'a')]
+    _, _, _, actual_b, unc_b = results[('wDRT', 'b')]
+    assert method == 'device'
+    assert abs(actual_a - start_ms - 5) < 1e-6
+    assert abs(actual_b - start_ms - 15) < 1e-6
+    assert 5 < unc_a < 7 and 15 < unc_b < 17
+
+
+def test_start_without_syn_reply_is_unmeasured():
+    results = _run([('a', 'sst', lambda ms: ms, 0), ('b', 'sst', 'nosync', 0)])
+
+    assert results[('wDRT', 'a')][3:] == (None, None)
+    method, sent, reported, actual, _ = results[('wDRT', 'b')]
+    assert method == 'fallback' and sent is not None and reported is None and actual is None
+
+
+def test_xbee_reply_is_handled_on_the_loop_while_the_fallback_is_pending(tmp_path):
+    from digi.xbee.devices import XBeeMessage
+    from RSLogger.hardware_io.remote_connect import RemoteConnectionManager
+    from RSLogger.hardware_io.xbee_node_cache import XBeeNodeCache
+
+    class Remote:
+        def get_64bit_addr(self):
+            return '0013A20041B20001'
+
+        def get_node_id(self):
+            return 'wDRT_1'
+
+    async def main():
+        loop_thread = threading.current_thread()
+        sync = SyncStart({'wDRT': _Controller()}, lead_s=0.01, grace_s=0.05)
+        threads, finished = list(), list()
+        report = sync.report
+        sync.report = lambda msg, tx=None: (threads.append(threading.current_thread()), report(msg, tx))
+        finish = sync._finish
+        sync._finish = lambda: (finished.append(dict(sync._results)), finish())
+
+        manager = RemoteConnectionManager(dict(), lambda m: None, lambda m: sync.report(m),
+                                          node_cache=XBeeNodeCache(str(tmp_path / 'nodes.json')))
+        manager._loop = asyncio.get_running_loop()
+        manager.xcvr = object()
+
+        sync.start({'wDRT': {'wDRT_1': Remote()}})
+        # The reply comes in on another thread just as the grace period runs out
+        await asyncio.sleep(0.055)
+        reply = XBeeMessage(f'sst>{sync._start_ms}'.encode(), Remote(), time())
+        digi = threading.Thread(target=manager._msg_received, args=(reply, ))
+        digi.start()
+        digi.join()
+        await asyncio.sleep(0.1)
+        return loop_thread, threads, finished
+
+    loop_thread, threads, finished = asyncio.run(main())
+
+    assert threads and all(t is loop_thread for t in threads)
+    # Either the reply or the fallback started it, once
+    assert len(finished) == 1 and len(finished[0]) == 1
+
+
+def test_unit_without_experiment_is_logged_as_failed():
+    results = _run([('a', 'sst', 'noexp', 0), ('b', 'sst', 'nosync', 0)])
+
+    assert results[('wDRT', 'a')] == ('failed', None, None, None, None)
+    assert results[('wDRT', 'b')][0] == 'fallback'
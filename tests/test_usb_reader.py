@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+from time import time, sleep, process_time
+
+import pytest
+from serial.tools.list_ports_common import ListPortInfo
+
+from RSLogger.hardware_io.usb_connect import UsbPortScanner
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'openpty') or sys.platform == 'win32', reason='needs ptys')
+
+PORTS = 16
+LINES = 50
+
+
+def _ptys(n):
+    import tty
+    ptys = list()
+    for _ in range(n):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        info = ListPortInfo(os.ttyname(slave), skip_link_detection=True)
+        info.name = info.device
+        info.pid = UsbPortScanner.DEVICE_IDS['sDRT']['pid']
+        info.vid = UsbPortScanner.DEVICE_IDS['sDRT']['vid']
+        ptys.append((master, slave, info))
+    return ptys
+
+
+def _loopback(reader):
+    """ Opens PORTS ptys through the scanner; returns (idle CPU %, latencies ms, lines expected). """
+    ptys = _ptys(PORTS)
+    devices, latencies = dict(), list()
+
+    def received(msg):
+        if msg.key == 'trl':
+            latencies.append((time() - float(msg.payload)) * 1000)
+
+    async def main():
+        scanner = UsbPortScanner(devices, lambda m: None, received, reader=reader,
+                                 list_ports=lambda: [info for _, _, info in ptys])
+        task = asyncio.create_task(scanner.run())
+        while len(devices.get('sDRT', {})) < PORTS:
+            await asyncio.sleep(0.1)
+
+        await asyncio.sleep(0.5)
+        wall_0, cpu_0 = time(), process_time()
+        await asyncio.sleep(2)
+        idle = (process_time() - cpu_0) / (time() - wall_0) * 100
+
+        for _ in range(LINES):
+            for master, _, _ in ptys:
+                os.write(master, f'trl>{time():.6f}\n'.encode())
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.5)
+
+        task.cancel()
+        scanner._remove_devices([info for _, _, info in ptys])
+        return idle
+
+    try:
+        idle = asyncio.run(main())
+    finally:
+        for conn in [c for ports in devices.values() for c in ports.values()]:
+            conn.close()
+        sleep(0.1)
+        for master, slave, _ in ptys:
+            os.close(master)
+            os.close(slave)
+    return idle, latencies, PORTS * LINES
+
+
+def test_event_readers_idle_cheaply_and_deliver_promptly():
+    idle, latencies, expected = _loopback('event')
+
+    # Blocked reader threads cost nothing; what is left is the scanner's port listing every 0.5 s
+    assert idle < 5
+    assert len(latencies) == expected
+    latencies.sort()
+    assert latencies[int(len(latencies) * .99)] < 50
+    assert latencies[-1] < 250
+
+
+def test_poll_reader_reads_non_windows_ports():
+    _, latencies, expected = _loopback('poll')
+
+    assert len(latencies) == expected